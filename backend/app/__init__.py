@@ -6,6 +6,7 @@ from flask_marshmallow import Marshmallow
 from dotenv import load_dotenv
 from pathlib import Path
 from app.config import *
+from app.utils.cache import cache
 import os
 
 # -----------------------------
@@ -62,6 +63,10 @@ def create_app(config_name='development'):
         # Server / Flask
         'PORT': os.environ.get('PORT')  or app.config.get('PORT'),
 
+        # Response cache (memory | redis | none)
+        'CACHE_BACKEND': os.environ.get('CACHE_BACKEND') or app.config.get('CACHE_BACKEND'),
+        'CACHE_REDIS_URL': os.environ.get('REDIS_URL') or app.config.get('CACHE_REDIS_URL'),
+
         # Database (most important on Heroku!)
         'DATABASE_URL': os.environ.get('DATABASE_URL') or app.config.get('DATABASE_URL'),
         # Very important: Heroku forces SSL on Postgres
@@ -93,10 +98,11 @@ def create_app(config_name='development'):
     db.init_app(app)
     migrate.init_app(app, db)
     ma.init_app(app)
+    cache.init_app(app)
     CORS(app)
     
     with app.app_context():
-        from app.routes import claims, members, drugs, pharmacies, analytics, reports
+        from app.routes import claims, members, drugs, pharmacies, analytics, reports, formulary
         
         app.register_blueprint(claims.bp)
         app.register_blueprint(members.bp)
@@ -104,6 +110,7 @@ def create_app(config_name='development'):
         app.register_blueprint(pharmacies.bp)
         app.register_blueprint(analytics.bp)
         app.register_blueprint(reports.bp)
+        app.register_blueprint(formulary.bp)
     
     @app.route('/health')
     def health():
@@ -120,6 +127,7 @@ def create_app(config_name='development'):
                 'members': '/api/members',
                 'drugs': '/api/drugs',
                 'pharmacies': '/api/pharmacies',
+                'formulary': '/api/formulary',
                 'analytics': '/api/analytics',
                 'reports': '/api/reports'
             }
@@ -9,6 +9,30 @@ class BaseConfig:
     UPLOAD_FOLDER = 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     ALLOWED_EXTENSIONS = {'.txt', '.pdf', '.jpg', '.jpeg', '.png'}    
+    BULK_MAX_CONTENT_LENGTH = 2 * 1024 * 1024 * 1024  # 2GB switch files for /api/claims/bulk
+    BULK_CHUNK_SIZE = 5000
+    CACHE_BACKEND = 'memory'  # per process; 'redis' shares entries and invalidations, 'none' disables
+    CACHE_REDIS_URL = None
+    CACHE_DEFAULT_TTL = 60  # seconds
+    CACHE_MAX_ENTRIES = 1024
+    ANALYTICS_SNAPSHOT_MAX_AGE = 900  # seconds before risk score / duplicate snapshots are refreshed
+    ANALYTICS_SNAPSHOT_BACKGROUND = True  # refresh stale snapshots in a background thread
+    ANALYTICS_MAX_LOOKBACK_DAYS = 730
+    ANALYTICS_ENGINE = 'sql'  # default aggregation engine; 'memory' uses the NumPy columnar store
+    ANALYTICS_ENGINE_REFRESH_INTERVAL = 5  # seconds between incremental refreshes of the columnar store
+    ANALYTICS_ENGINE_RELOAD_INTERVAL = 3600  # seconds between full reloads (picks up hard deletes)
+    AUTOCOMPLETE_REFRESH_INTERVAL = 30  # seconds between drug catalog version checks
+    FORMULARY_REFRESH_INTERVAL = 30  # seconds between formulary version checks
+    COVERAGE_CHECK_MAX_ITEMS = 5000
+    ADJUDICATION_BATCH_SIZE = 500  # pending claims locked per worker transaction
+    ADJUDICATION_POLL_INTERVAL = 2  # seconds a worker sleeps when the queue is empty
+    BULK_STATUS_MAX_IDS = 50000
+    CLAIM_PARTITION_MONTHS_AHEAD = 3  # monthly claims partitions kept ready past the current month
+    CLAIM_PARTITION_MAINTENANCE_INTERVAL = 3600  # seconds between partition checks in worker 0
+    DUPLICATE_CLAIM_POLICY = 'flag'  # 'flag' stores duplicates marked, 'reject' denies them with NCPDP 83
+    REFILL_TOO_SOON_THRESHOLD = 0.75  # share of the previous fill's supply that must be used before a refill
+    REFILL_LOOKBACK_DAYS = 180  # earlier fills loaded to find the supply on hand
+    ADHERENCE_PDC_THRESHOLD = 0.8  # proportion of days covered at which a member counts as adherent
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
@@ -1,7 +1,19 @@
+from app import db
+from sqlalchemy import event, DDL
 from app.models.member import Member
 from app.models.drug import Drug
 from app.models.pharmacy import Pharmacy
 from app.models.claim import Claim
+from app.models.claim_number import ClaimNumber
 from app.models.formulary import Formulary
+from app.models.claim_daily_stat import ClaimDailyStat
+from app.models.member_accumulator import MemberAccumulator
+from app.models.analytics_snapshot import AnalyticsSnapshot, MemberRiskScore, DuplicateClaimGroup
 
-__all__ = ['Member', 'Drug', 'Pharmacy', 'Claim', 'Formulary']
+__all__ = ['Member', 'Drug', 'Pharmacy', 'Claim', 'ClaimNumber', 'Formulary', 'ClaimDailyStat',
+           'MemberAccumulator', 'AnalyticsSnapshot', 'MemberRiskScore', 'DuplicateClaimGroup']
+
+# Trigram (pg_trgm) and geospatial (cube + earthdistance) indexes need their
+# extensions installed before create_all builds them
+for extension in ('pg_trgm', 'cube', 'earthdistance'):
+    event.listen(db.metadata, 'before_create', DDL(f'CREATE EXTENSION IF NOT EXISTS {extension}'))
@@ -0,0 +1,92 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import Index
+from sqlalchemy.dialects.postgresql import ARRAY
+
+
+# One materialization run of an AnalyticsSnapshotService report
+class AnalyticsSnapshot(db.Model):
+    __tablename__ = 'analytics_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)  # risk_scores, duplicates
+    lookback_days = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, ready, failed
+    row_count = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    
+    started_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    computed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        Index('idx_analytics_snapshot_lookup', 'kind', 'lookback_days', 'status', 'computed_at'),
+    )
+    
+    def __repr__(self):
+        return f'<AnalyticsSnapshot {self.kind} {self.lookback_days}d {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'lookback_days': self.lookback_days,
+            'status': self.status,
+            'row_count': self.row_count,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'computed_at': self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class MemberRiskScore(db.Model):
+    __tablename__ = 'member_risk_scores'
+    
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('analytics_snapshots.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    
+    member_id = db.Column(db.Integer, nullable=False)
+    member_name = db.Column(db.String(201))
+    claim_count = db.Column(db.Integer, nullable=False)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False)
+    unique_drugs = db.Column(db.Integer, nullable=False)
+    avg_days_supply = db.Column(db.Numeric(10, 2))
+    risk_score = db.Column(db.Integer, nullable=False)
+    
+    def to_dict(self):
+        return {
+            'rank': self.rank,
+            'member_id': self.member_id,
+            'member_name': self.member_name,
+            'claim_count': self.claim_count,
+            'total_cost': float(self.total_cost),
+            'unique_drugs': self.unique_drugs,
+            'avg_days_supply': float(self.avg_days_supply) if self.avg_days_supply is not None else None,
+            'risk_score': self.risk_score,
+            'risk_level': 'High' if self.risk_score >= 4 else 'Medium' if self.risk_score >= 2 else 'Low'
+        }
+
+
+class DuplicateClaimGroup(db.Model):
+    __tablename__ = 'duplicate_claim_groups'
+    
+    snapshot_id = db.Column(db.Integer, db.ForeignKey('analytics_snapshots.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    
+    member_id = db.Column(db.Integer, nullable=False)
+    member_name = db.Column(db.String(201))
+    drug_name = db.Column(db.String(255))
+    fill_date = db.Column(db.Date, nullable=False)
+    claim_count = db.Column(db.Integer, nullable=False)
+    claim_numbers = db.Column(ARRAY(db.String(50)), nullable=False)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False)
+    
+    def to_dict(self):
+        return {
+            'rank': self.rank,
+            'member_id': self.member_id,
+            'member_name': self.member_name,
+            'drug_name': self.drug_name,
+            'fill_date': self.fill_date.isoformat(),
+            'duplicate_count': self.claim_count,
+            'claim_numbers': self.claim_numbers,
+            'total_cost': float(self.total_cost)
+        }
@@ -1,20 +1,37 @@
 from app import db
-from datetime import datetime
-from sqlalchemy import Index, CheckConstraint
+from app.models.member import Member
+from app.models.drug import Drug
+from app.utils.partitions import add_months, create_default_partition, ensure_partitions
+from datetime import datetime, date
+from sqlalchemy import Index, CheckConstraint, UniqueConstraint, event, text
+from sqlalchemy.orm import joinedload
 
 
+CLAIM_STATUSES = ('pending', 'approved', 'paid', 'denied', 'reversed')
+
+# Monthly partitions create_all builds around today; anything older lands in claims_default
+CLAIM_PARTITION_MONTHS_BACK = 12
+CLAIM_PARTITION_MONTHS_AHEAD = 3
+
+# The writing transaction's id (pg_current_xact_id) as a bigint
+CHANGE_XID_SQL = 'CAST(CAST(pg_current_xact_id() AS text) AS bigint)'
+
+
+# Range-partitioned by month on fill_date. Postgres requires the partition key in
+# every unique constraint, so the table key is (id, fill_date); the ORM still
+# identifies a claim by id alone.
 class Claim(db.Model):
     __tablename__ = 'claims'
     
-    id = db.Column(db.Integer, primary_key=True)
-    claim_number = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    claim_number = db.Column(db.String(50), nullable=False)
     rx_number = db.Column(db.String(50))
     
-    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=False, index=True)
-    drug_id = db.Column(db.Integer, db.ForeignKey('drugs.id'), nullable=False, index=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id'), nullable=False)
+    drug_id = db.Column(db.Integer, db.ForeignKey('drugs.id'), nullable=False)
     pharmacy_id = db.Column(db.Integer, db.ForeignKey('pharmacies.id'), nullable=False, index=True)
     
-    fill_date = db.Column(db.Date, nullable=False, index=True)
+    fill_date = db.Column(db.Date, primary_key=True, nullable=False)
     service_date = db.Column(db.Date)
     
     quantity = db.Column(db.Numeric(10, 2), nullable=False)
@@ -37,7 +54,7 @@ class Claim(db.Model):
     
     total_cost = db.Column(db.Numeric(10, 2), nullable=False)
     
-    status = db.Column(db.String(20), nullable=False, default='pending', index=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')
     rejection_code = db.Column(db.String(10))
     rejection_reason = db.Column(db.Text)
     
@@ -45,31 +62,65 @@ class Claim(db.Model):
     requires_prior_auth = db.Column(db.Boolean, default=False)
     is_compound = db.Column(db.Boolean, default=False)
     is_specialty = db.Column(db.Boolean, default=False)
+    # Set at write time when an active claim for the same member, drug, pharmacy
+    # and fill date is already on file (DuplicateClaimService)
+    is_duplicate = db.Column(db.Boolean, default=False, nullable=False, server_default=text('false'))
     
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     processed_at = db.Column(db.DateTime)
     paid_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Transaction that last wrote the row: the column default on insert and
+    # onupdate on ORM / Core updates (raw SQL UPDATEs set it themselves). The
+    # in-memory analytics engine finds changes by it (ColumnarClaimStore)
+    change_xid = db.Column(db.BigInteger, nullable=False, server_default=text(CHANGE_XID_SQL),
+                           onupdate=text(CHANGE_XID_SQL))
     
     member = db.relationship('Member', back_populates='claims')
     drug = db.relationship('Drug', back_populates='claims')
     pharmacy = db.relationship('Pharmacy', back_populates='claims')
     
+    __mapper_args__ = {'primary_key': [id]}
+    
     __table_args__ = (
+        # claim_number is unique per partition only; the claim_numbers primary
+        # key (ClaimNumberService.reserve) keeps it unique across months
+        UniqueConstraint('claim_number', 'fill_date', name='uq_claim_number_fill_date'),
         CheckConstraint('quantity > 0', name='check_quantity_positive'),
         CheckConstraint('days_supply > 0', name='check_days_supply_positive'),
         CheckConstraint('total_cost >= 0', name='check_total_cost_non_negative'),
         CheckConstraint("status IN ('pending', 'approved', 'paid', 'denied', 'reversed')", name='check_status_valid'),
-        Index('idx_claim_dates', 'fill_date', 'status'),
+        # Analytics scans over a fill_date range read only these columns, so they
+        # can be answered by an index-only scan without touching the heap
+        Index('idx_claim_date_covering', 'fill_date', 'status',
+              postgresql_include=['total_cost', 'drug_id', 'member_id', 'pharmacy_id', 'days_supply']),
+        # fill_date mostly arrives in order, so a tiny BRIN index narrows wide range scans
+        Index('idx_claim_fill_date_brin', 'fill_date', postgresql_using='brin',
+              postgresql_with={'pages_per_range': 32}),
         Index('idx_claim_member_date', 'member_id', 'fill_date'),
         Index('idx_claim_drug_date', 'drug_id', 'fill_date'),
         Index('idx_claim_status_date', 'status', 'fill_date'),
+        Index('idx_claim_duplicate_key', 'member_id', 'drug_id', 'fill_date', 'pharmacy_id'),
+        Index('idx_claim_flagged_duplicates', 'id', postgresql_where=text('is_duplicate')),
+        # Incremental refreshes of the in-memory analytics engine read rows changed since a watermark
+        Index('idx_claim_change_xid', 'change_xid'),
+        # Adjudication queue: only pending rows, in the order workers claim them
+        Index('idx_claim_pending_queue', 'submitted_at', 'id', postgresql_where=text("status = 'pending'")),
+        {'postgresql_partition_by': 'RANGE (fill_date)'}
     )
     
     def __repr__(self):
         return f'<Claim {self.claim_number}: ${self.total_cost}>'
     
+    @classmethod
+    def query_for_list(cls):
+        """Claim query that joins in the member and drug columns read by to_dict (no N+1)"""
+        return cls.query.options(
+            joinedload(cls.member).load_only(Member.first_name, Member.last_name),
+            joinedload(cls.drug).load_only(Drug.name, Drug.generic_name, Drug.is_generic)
+        )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -113,9 +164,19 @@ class Claim(db.Model):
                 'is_generic_substitution': self.is_generic_substitution,
                 'requires_prior_auth': self.requires_prior_auth,
                 'is_compound': self.is_compound,
-                'is_specialty': self.is_specialty
+                'is_specialty': self.is_specialty,
+                'is_duplicate': self.is_duplicate
             },
             'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
             'processed_at': self.processed_at.isoformat() if self.processed_at else None,
             'paid_at': self.paid_at.isoformat() if self.paid_at else None
         }
+
+
+@event.listens_for(Claim.__table__, 'after_create')
+def create_claim_partitions(target, connection, **kw):
+    """create_all builds an empty parent table; give it somewhere to put rows"""
+    today = date.today()
+    create_default_partition(connection, target.name)
+    ensure_partitions(connection, target.name, add_months(today, -CLAIM_PARTITION_MONTHS_BACK),
+                      add_months(today, CLAIM_PARTITION_MONTHS_AHEAD))
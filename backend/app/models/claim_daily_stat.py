@@ -0,0 +1,28 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import Index
+
+
+# Per-day claim rollup, kept current by ClaimStatsService on every claim write
+class ClaimDailyStat(db.Model):
+    __tablename__ = 'claim_daily_stats'
+    
+    fill_date = db.Column(db.Date, primary_key=True)
+    drug_id = db.Column(db.Integer, db.ForeignKey('drugs.id'), primary_key=True)
+    pharmacy_id = db.Column(db.Integer, db.ForeignKey('pharmacies.id'), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    
+    claim_count = db.Column(db.Integer, nullable=False, default=0)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    plan_paid_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    member_copay = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index('idx_claim_daily_stats_drug', 'drug_id', 'fill_date'),
+        Index('idx_claim_daily_stats_pharmacy', 'pharmacy_id', 'fill_date'),
+    )
+    
+    def __repr__(self):
+        return f'<ClaimDailyStat {self.fill_date} drug={self.drug_id} pharmacy={self.pharmacy_id} {self.status}>'
@@ -0,0 +1,15 @@
+from app import db
+
+
+# Every claim number on file. claims is partitioned by fill_date, so its own
+# unique key can only be (claim_number, fill_date); this unpartitioned table
+# carries the key that keeps a number unique across months.
+class ClaimNumber(db.Model):
+    __tablename__ = 'claim_numbers'
+    
+    claim_number = db.Column(db.String(50), primary_key=True)
+    # With claim_number, locates the claim through uq_claim_number_fill_date
+    fill_date = db.Column(db.Date, nullable=False)
+    
+    def __repr__(self):
+        return f'<ClaimNumber {self.claim_number} {self.fill_date}>'
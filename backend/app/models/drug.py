@@ -4,6 +4,14 @@ from sqlalchemy import Index
 from sqlalchemy.dialects.postgresql import TSVECTOR
 
 
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(generic_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(brand_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(therapeutic_class, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(manufacturer, '')), 'D')"
+)
+
 class Drug(db.Model):
     __tablename__ = 'drugs'
     
@@ -25,7 +33,8 @@ class Drug(db.Model):
     awp = db.Column(db.Numeric(10, 2))
     package_size = db.Column(db.Integer)
     
-    search_vector = db.Column(TSVECTOR)
+    # Maintained by PostgreSQL; 'simple' config so drug names are not stemmed
+    search_vector = db.Column(TSVECTOR, db.Computed(SEARCH_VECTOR_SQL, persisted=True))
     
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     
@@ -40,6 +49,8 @@ class Drug(db.Model):
         Index('idx_drug_class', 'therapeutic_class'),
         Index('idx_drug_active', 'is_active'),
         Index('idx_drug_search', 'search_vector', postgresql_using='gin'),
+        Index('idx_drug_name', 'name', 'id'),
+        Index('idx_drug_ndc_prefix', 'ndc', postgresql_ops={'ndc': 'varchar_pattern_ops'}),
     )
     
     def __repr__(self):
@@ -1,6 +1,9 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Index
+from sqlalchemy import Index, literal_column, text
+
+
+MEMBER_FULL_NAME_SQL = "first_name || ' ' || last_name"
 
 
 class Member(db.Model):
@@ -37,8 +40,24 @@ class Member(db.Model):
         Index('idx_member_name', 'last_name', 'first_name'),
         Index('idx_member_dob', 'date_of_birth'),
         Index('idx_member_active', 'is_active'),
+        # pg_trgm GIN indexes: serve ILIKE '%x%' search and the fuzzy (%) mode
+        Index('idx_member_first_name_trgm', 'first_name', postgresql_using='gin',
+              postgresql_ops={'first_name': 'gin_trgm_ops'}),
+        Index('idx_member_last_name_trgm', 'last_name', postgresql_using='gin',
+              postgresql_ops={'last_name': 'gin_trgm_ops'}),
+        Index('idx_member_member_id_trgm', 'member_id', postgresql_using='gin',
+              postgresql_ops={'member_id': 'gin_trgm_ops'}),
+        Index('idx_member_email_trgm', 'email', postgresql_using='gin',
+              postgresql_ops={'email': 'gin_trgm_ops'}),
+        Index('idx_member_full_name_trgm', text(f'({MEMBER_FULL_NAME_SQL}) gin_trgm_ops'),
+              postgresql_using='gin'),
     )
     
+    @classmethod
+    def full_name_expression(cls):
+        """first_name || ' ' || last_name, matching idx_member_full_name_trgm"""
+        return cls.first_name.op('||')(literal_column("' '")).op('||')(cls.last_name)
+    
     def __repr__(self):
         return f'<Member {self.member_id}: {self.first_name} {self.last_name}>'
     
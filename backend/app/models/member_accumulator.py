@@ -0,0 +1,37 @@
+from app import db
+from datetime import datetime
+
+
+# Year-to-date member cost sharing, kept current by AccumulatorService on every claim write
+class MemberAccumulator(db.Model):
+    __tablename__ = 'member_accumulators'
+    
+    member_id = db.Column(db.Integer, db.ForeignKey('members.id', ondelete='CASCADE'), primary_key=True)
+    plan_year = db.Column(db.Integer, primary_key=True)
+    
+    claim_count = db.Column(db.Integer, nullable=False, default=0)
+    deductible_applied = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    member_copay = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    member_coinsurance = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    plan_paid_amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    total_cost = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<MemberAccumulator member={self.member_id} {self.plan_year}>'
+    
+    def to_dict(self):
+        out_of_pocket = self.deductible_applied + self.member_copay + self.member_coinsurance
+        return {
+            'member_id': self.member_id,
+            'plan_year': self.plan_year,
+            'claim_count': self.claim_count,
+            'deductible_applied': float(self.deductible_applied),
+            'member_copay': float(self.member_copay),
+            'member_coinsurance': float(self.member_coinsurance),
+            'out_of_pocket': float(out_of_pocket),
+            'plan_paid_amount': float(self.plan_paid_amount),
+            'total_cost': float(self.total_cost),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -1,6 +1,9 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Index
+from sqlalchemy import Index, Float, cast, func, text
+
+
+EARTH_POINT_SQL = 'll_to_earth(CAST(latitude AS FLOAT), CAST(longitude AS FLOAT))'
 
 
 class Pharmacy(db.Model):
@@ -44,8 +47,25 @@ class Pharmacy(db.Model):
         Index('idx_pharmacy_network', 'in_network', 'network_tier'),
         Index('idx_pharmacy_type', 'pharmacy_type'),
         Index('idx_pharmacy_coords', 'latitude', 'longitude'),
+        Index('idx_pharmacy_name', 'name', 'id'),
+        # pg_trgm GIN indexes: serve ILIKE '%x%' search and the fuzzy (%) mode
+        Index('idx_pharmacy_name_trgm', 'name', postgresql_using='gin',
+              postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('idx_pharmacy_chain_name_trgm', 'chain_name', postgresql_using='gin',
+              postgresql_ops={'chain_name': 'gin_trgm_ops'}),
+        Index('idx_pharmacy_ncpdp_id_trgm', 'ncpdp_id', postgresql_using='gin',
+              postgresql_ops={'ncpdp_id': 'gin_trgm_ops'}),
+        Index('idx_pharmacy_city_trgm', 'city', postgresql_using='gin',
+              postgresql_ops={'city': 'gin_trgm_ops'}),
+        # earthdistance GiST index for radius / nearest searches
+        Index('idx_pharmacy_earth', text(EARTH_POINT_SQL), postgresql_using='gist'),
     )
     
+    @classmethod
+    def earth_point(cls):
+        """ll_to_earth() of the pharmacy's coordinates, matching idx_pharmacy_earth"""
+        return func.ll_to_earth(cast(cls.latitude, Float), cast(cls.longitude, Float))
+    
     def __repr__(self):
         return f'<Pharmacy {self.ncpdp_id}: {self.name}>'
     
@@ -1,225 +1,265 @@
-from flask import Blueprint, request, jsonify
-from app import db
-from app.models import Claim, Drug, Member, Pharmacy
-from sqlalchemy import func, extract, case, and_
-from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, current_app
+from app.utils.cache import cache
+from app.services.analytics_service import AnalyticsService
+from app.services.analytics_snapshot_service import AnalyticsSnapshotService, SNAPSHOT_REPORTS
+from app.services.columnar_engine import claim_store
+from app.services.refill_service import RefillService
+from app.services.adherence_service import AdherenceService
+from datetime import date, datetime, timedelta
 
 bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
 
+def _analytics_engine():
+    """Pick the aggregation engine for this request: ?engine=sql|memory"""
+    engine = request.args.get('engine') or current_app.config.get('ANALYTICS_ENGINE', 'sql')
+    if engine == 'sql':
+        return AnalyticsService
+    if engine == 'memory':
+        if not claim_store.available:
+            raise ValueError('The memory engine is not available on this server')
+        return claim_store
+    raise ValueError('engine must be one of sql, memory')
+
+
 @bp.route('/dashboard', methods=['GET'])
+@cache.cached('claims', 'drugs')
 def get_dashboard():
     """Get dashboard overview statistics"""
     days = request.args.get('days', 30, type=int)
     start_date = datetime.utcnow().date() - timedelta(days=days)
     
-    # Total claims and cost
-    total_stats = db.session.query(
-        func.count(Claim.id).label('total_claims'),
-        func.sum(Claim.total_cost).label('total_cost'),
-        func.avg(Claim.total_cost).label('avg_cost')
-    ).filter(Claim.fill_date >= start_date).first()
-    
-    # Generic vs Brand utilization
-    generic_stats = db.session.query(
-        Drug.is_generic,
-        func.count(Claim.id).label('claim_count'),
-        func.sum(Claim.total_cost).label('total_cost')
-    ).join(Drug).filter(Claim.fill_date >= start_date).group_by(Drug.is_generic).all()
-    
-    # Top drugs by cost
-    top_drugs = db.session.query(
-        Drug.name,
-        Drug.is_generic,
-        func.count(Claim.id).label('claim_count'),
-        func.sum(Claim.total_cost).label('total_cost')
-    ).join(Drug).filter(
-        Claim.fill_date >= start_date
-    ).group_by(Drug.id, Drug.name, Drug.is_generic).order_by(
-        func.sum(Claim.total_cost).desc()
-    ).limit(10).all()
-    
-    # Claims by status
-    status_breakdown = db.session.query(
-        Claim.status,
-        func.count(Claim.id).label('count')
-    ).filter(Claim.fill_date >= start_date).group_by(Claim.status).all()
+    try:
+        summary = _analytics_engine().get_dashboard_summary(start_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'period_days': days,
         'start_date': start_date.isoformat(),
-        'summary': {
-            'total_claims': total_stats.total_claims or 0,
-            'total_cost': float(total_stats.total_cost) if total_stats.total_cost else 0,
-            'average_cost': float(total_stats.avg_cost) if total_stats.avg_cost else 0
-        },
-        'generic_vs_brand': [
-            {
-                'type': 'Generic' if row.is_generic else 'Brand',
-                'claims': row.claim_count,
-                'cost': float(row.total_cost)
-            } for row in generic_stats
-        ],
-        'top_drugs': [
-            {
-                'name': row.name,
-                'is_generic': row.is_generic,
-                'claims': row.claim_count,
-                'total_cost': float(row.total_cost)
-            } for row in top_drugs
-        ],
-        'status_breakdown': [
-            {'status': row.status, 'count': row.count} 
-            for row in status_breakdown
-        ]
+        **summary
     }), 200
 
 
 @bp.route('/trends', methods=['GET'])
+@cache.cached('claims')
 def get_trends():
     """Get cost trends over time using window functions"""
     days = request.args.get('days', 90, type=int)
-    start_date = datetime.utcnow().date() - timedelta(days=days)
+    window = request.args.get('window', 7, type=int)
+    granularity = request.args.get('granularity', 'day')
     
-    # Daily aggregation with running total
-    daily_stats = db.session.query(
-        Claim.fill_date,
-        func.count(Claim.id).label('daily_claims'),
-        func.sum(Claim.total_cost).label('daily_cost')
-    ).filter(
-        Claim.fill_date >= start_date
-    ).group_by(Claim.fill_date).order_by(Claim.fill_date).all()
-    
-    # Calculate 7-day moving average
-    trends = []
-    for i, row in enumerate(daily_stats):
-        window_start = max(0, i - 6)
-        window_data = daily_stats[window_start:i+1]
-        
-        avg_claims = sum(r.daily_claims for r in window_data) / len(window_data)
-        avg_cost = sum(float(r.daily_cost or 0) for r in window_data) / len(window_data)
-        
-        trends.append({
-            'date': row.fill_date.isoformat(),
-            'claims': row.daily_claims,
-            'cost': float(row.daily_cost or 0),
-            'moving_avg_claims': round(avg_claims, 2),
-            'moving_avg_cost': round(avg_cost, 2)
-        })
+    if not 1 <= days <= 3660 or not 1 <= window <= 366:
+        return jsonify({'error': 'days must be 1-3660 and window 1-366'}), 400
+    
+    try:
+        trends = _analytics_engine().get_cost_trends_with_window_functions(
+            days=days, window=window, granularity=granularity
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'period_days': days,
+        'granularity': granularity,
+        'window': window,
         'trends': trends
     }), 200
 
 
 @bp.route('/high-utilizers', methods=['GET'])
+@cache.cached('claims', 'members')
 def get_high_utilizers():
     """Find members with high utilization using CTEs concept"""
     days = request.args.get('days', 90, type=int)
     min_claims = request.args.get('min_claims', 5, type=int)
     start_date = datetime.utcnow().date() - timedelta(days=days)
     
-    # Aggregate by member
-    high_utilizers = db.session.query(
-        Member.id,
-        Member.member_id,
-        Member.first_name,
-        Member.last_name,
-        func.count(Claim.id).label('claim_count'),
-        func.sum(Claim.total_cost).label('total_cost'),
-        func.avg(Claim.total_cost).label('avg_cost_per_claim')
-    ).join(Claim).filter(
-        Claim.fill_date >= start_date
-    ).group_by(
-        Member.id, Member.member_id, Member.first_name, Member.last_name
-    ).having(
-        func.count(Claim.id) >= min_claims
-    ).order_by(
-        func.sum(Claim.total_cost).desc()
-    ).limit(20).all()
+    try:
+        high_utilizers = _analytics_engine().get_high_utilizers(start_date, min_claims=min_claims)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'period_days': days,
         'min_claims': min_claims,
-        'high_utilizers': [
-            {
-                'member_id': row.member_id,
-                'name': f"{row.first_name} {row.last_name}",
-                'claim_count': row.claim_count,
-                'total_cost': float(row.total_cost),
-                'avg_cost_per_claim': float(row.avg_cost_per_claim)
-            } for row in high_utilizers
-        ]
+        'high_utilizers': high_utilizers
     }), 200
 
 
 @bp.route('/pharmacy-performance', methods=['GET'])
+@cache.cached('claims', 'pharmacies')
 def get_pharmacy_performance():
     """Analyze pharmacy network performance"""
     days = request.args.get('days', 90, type=int)
     start_date = datetime.utcnow().date() - timedelta(days=days)
     
-    pharmacy_stats = db.session.query(
-        Pharmacy.name,
-        Pharmacy.chain_name,
-        Pharmacy.network_tier,
-        func.count(Claim.id).label('claim_count'),
-        func.sum(Claim.total_cost).label('total_cost'),
-        func.avg(Claim.total_cost).label('avg_cost'),
-        func.count(case((Claim.status == 'denied', 1))).label('denied_count')
-    ).join(Claim).filter(
-        Claim.fill_date >= start_date
-    ).group_by(
-        Pharmacy.id, Pharmacy.name, Pharmacy.chain_name, Pharmacy.network_tier
-    ).order_by(
-        func.count(Claim.id).desc()
-    ).limit(20).all()
+    try:
+        pharmacies = _analytics_engine().get_pharmacy_performance(start_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'period_days': days,
-        'pharmacies': [
-            {
-                'name': row.name,
-                'chain': row.chain_name,
-                'network_tier': row.network_tier,
-                'claims': row.claim_count,
-                'total_cost': float(row.total_cost),
-                'avg_cost': float(row.avg_cost),
-                'denied_claims': row.denied_count,
-                'denial_rate': round((row.denied_count / row.claim_count * 100), 2) if row.claim_count > 0 else 0
-            } for row in pharmacy_stats
-        ]
+        'pharmacies': pharmacies
     }), 200
 
 
 @bp.route('/therapeutic-class', methods=['GET'])
+@cache.cached('claims', 'drugs')
 def get_therapeutic_class_breakdown():
     """Breakdown by therapeutic class"""
     days = request.args.get('days', 90, type=int)
     start_date = datetime.utcnow().date() - timedelta(days=days)
     
-    class_stats = db.session.query(
-        Drug.therapeutic_class,
-        func.count(Claim.id).label('claim_count'),
-        func.sum(Claim.total_cost).label('total_cost'),
-        func.count(func.distinct(Claim.member_id)).label('unique_members')
-    ).join(Drug).filter(
-        Claim.fill_date >= start_date,
-        Drug.therapeutic_class.isnot(None)
-    ).group_by(Drug.therapeutic_class).order_by(
-        func.sum(Claim.total_cost).desc()
-    ).all()
+    try:
+        therapeutic_classes = _analytics_engine().get_therapeutic_class_breakdown(start_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'period_days': days,
+        'therapeutic_classes': therapeutic_classes
+    }), 200
+
+
+@bp.route('/refill-too-soon', methods=['GET'])
+@cache.cached('claims')
+def get_refill_too_soon():
+    """Fills made while earlier supply of the same drug was still on hand"""
+    days = request.args.get('days', 365, type=int)
+    limit = request.args.get('limit', 100, type=int)
+    
+    if not 1 <= days <= 3660 or not 1 <= limit <= 1000:
+        return jsonify({'error': 'days must be 1-3660 and limit 1-1000'}), 400
+    
+    if not RefillService.available():
+        return jsonify({'error': 'Refill analysis is not available on this server'}), 400
+    
+    end_date = datetime.utcnow().date()
+    start_date = end_date - timedelta(days=days)
+    report = RefillService.report(start_date, end_date, limit=limit)
     
     return jsonify({
         'period_days': days,
-        'therapeutic_classes': [
+        'start_date': start_date.isoformat(),
+        **report
+    }), 200
+
+
+@bp.route('/adherence', methods=['GET'])
+@cache.cached('claims', 'drugs')
+def get_adherence():
+    """Proportion of days covered per member and therapeutic class"""
+    year = request.args.get('year', type=int)
+    days = request.args.get('days', 365, type=int)
+    therapeutic_class = request.args.get('therapeutic_class')
+    limit = request.args.get('limit', 100, type=int)
+    
+    if not 1 <= days <= 3660 or not 0 <= limit <= 1000:
+        return jsonify({'error': 'days must be 1-3660 and limit 0-1000'}), 400
+    if year is not None and not 1900 <= year <= 9999:
+        return jsonify({'error': 'year is out of range'}), 400
+    
+    if not AdherenceService.available():
+        return jsonify({'error': 'Adherence analysis is not available on this server'}), 400
+    
+    # A calendar measurement year, or the trailing window ending today
+    if year is not None:
+        start_date, end_date = date(year, 1, 1), date(year, 12, 31)
+    else:
+        end_date = datetime.utcnow().date()
+        start_date = end_date - timedelta(days=days - 1)
+    report = AdherenceService.report(start_date, end_date, therapeutic_class=therapeutic_class, limit=limit)
+    
+    return jsonify({
+        'measurement_start': start_date.isoformat(),
+        'measurement_end': end_date.isoformat(),
+        **report
+    }), 200
+
+
+def _snapshot_response(kind, collection):
+    """Serve one page of a materialized analytics snapshot"""
+    report = SNAPSHOT_REPORTS[kind]
+    lookback_days = request.args.get('lookback_days', report['default_lookback'], type=int)
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 500)
+    force = request.args.get('refresh', 'false').lower() == 'true'
+    
+    if not 1 <= lookback_days <= current_app.config.get('ANALYTICS_MAX_LOOKBACK_DAYS', 730):
+        return jsonify({'error': 'lookback_days is out of range'}), 400
+    
+    snapshot, refreshing = AnalyticsSnapshotService.get(kind, lookback_days, force=force)
+    
+    if snapshot is None:
+        # First request for this lookback window; the result is being computed
+        return jsonify({
+            'status': 'refreshing',
+            'lookback_days': lookback_days
+        }), 202
+    
+    model = report['model']
+    paginated = model.query.filter_by(snapshot_id=snapshot.id).order_by(model.rank).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    
+    return jsonify({
+        collection: [row.to_dict() for row in paginated.items],
+        'total': paginated.total,
+        'pages': paginated.pages,
+        'current_page': page,
+        'lookback_days': lookback_days,
+        'computed_at': snapshot.computed_at.isoformat(),
+        'stale': refreshing
+    }), 200
+
+
+@bp.route('/risk-scores', methods=['GET'])
+def get_member_risk_scores():
+    """Member risk scores from the latest precomputed snapshot"""
+    return _snapshot_response('risk_scores', 'members')
+
+
+@bp.route('/duplicates', methods=['GET'])
+def get_duplicate_claims():
+    """Potential duplicate claim groups from the latest precomputed snapshot"""
+    return _snapshot_response('duplicates', 'duplicates')
+
+
+@bp.route('/running-totals', methods=['GET'])
+@cache.cached('claims')
+def get_running_totals():
+    """Cumulative cost over time, computed from the daily rollup"""
+    days = request.args.get('days', 365, type=int)
+    granularity = request.args.get('granularity', 'month')
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 100, type=int), 1000)
+    
+    if not 1 <= days <= 3660 or page < 1 or per_page < 1:
+        return jsonify({'error': 'days must be 1-3660 and page/per_page positive'}), 400
+    
+    try:
+        series = AnalyticsService.get_cost_trends_with_window_functions(
+            days=days, window=1, granularity=granularity
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    start = (page - 1) * per_page
+    
+    return jsonify({
+        'period_days': days,
+        'granularity': granularity,
+        'running_totals': [
             {
-                'class': row.therapeutic_class,
-                'claims': row.claim_count,
-                'total_cost': float(row.total_cost),
-                'unique_members': row.unique_members,
-                'avg_cost_per_claim': float(row.total_cost / row.claim_count) if row.claim_count > 0 else 0
-            } for row in class_stats
-        ]
+                'date': point['date'],
+                'claims': point['claims'],
+                'cost': point['cost'],
+                'running_total': point['running_total']
+            } for point in series[start:start + per_page]
+        ],
+        'total': len(series),
+        'pages': -(-len(series) // per_page),
+        'current_page': page
     }), 200
@@ -1,24 +1,29 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from werkzeug.wsgi import get_input_stream
 from app import db
 from app.models import Claim, Member, Drug, Pharmacy
+from app.services.claim_ingest_service import ClaimIngestService
+from app.services.claim_number_service import ClaimNumberService
+from app.services.claim_export_service import ClaimExportService, FORMATS as EXPORT_FORMATS
+from app.services.claim_stats_service import ClaimStatsService
+from app.services.accumulator_service import AccumulatorService
+from app.services.claim_transition_service import ClaimTransitionService, ALLOWED_TRANSITIONS
+from app.services.duplicate_claim_service import DuplicateClaimService
+from app.utils.pagination import keyset_paginate
+from app.utils.cache import cache
 from datetime import datetime
 from sqlalchemy import or_, and_, func
 
 bp = Blueprint('claims', __name__, url_prefix='/api/claims')
 
 
-@bp.route('', methods=['GET'])
-def get_claims():
-    """Get all claims with filtering and pagination"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
+def _apply_claim_filters(query):
+    """Apply the shared claim list filters from the query string (ORM query or Core select)"""
     status = request.args.get('status', '')
     member_id = request.args.get('member_id', type=int)
     start_date = request.args.get('start_date', '')
     end_date = request.args.get('end_date', '')
     
-    query = Claim.query
-    
     if status:
         query = query.filter(Claim.status == status)
     
@@ -31,6 +36,38 @@ def get_claims():
     if end_date:
         query = query.filter(Claim.fill_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
     
+    return query
+
+
+@bp.route('', methods=['GET'])
+def get_claims():
+    """Get all claims with filtering and pagination"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    
+    query = _apply_claim_filters(Claim.query_for_list())
+    
+    # Cursor mode: ?cursor= (empty for the first page) seeks on (fill_date, id)
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                query, [Claim.fill_date, Claim.id],
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', per_page, type=int),
+                descending=True,
+                count=request.args.get('count', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'claims': [claim.to_dict() for claim in result['items']],
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+            'limit': result['limit'],
+            'total': result['total']
+        }), 200
+    
     query = query.order_by(Claim.fill_date.desc())
     
     paginated = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -43,6 +80,54 @@ def get_claims():
     }), 200
 
 
+@bp.route('/export', methods=['GET'])
+def export_claims():
+    """Stream all claims matching the get_claims filters as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    batch_size = max(100, min(request.args.get('batch_size', 5000, type=int), 50000))
+    
+    query = _apply_claim_filters(ClaimExportService.base_query()).order_by(Claim.fill_date, Claim.id)
+    
+    filename = f'claims-export.{fmt}'
+    headers = {'Content-Disposition': f'attachment; filename={filename}'}
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+    
+    return Response(
+        stream_with_context(ClaimExportService.stream(query, fmt, batch_size, compress)),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers=headers
+    )
+
+
+@bp.route('/duplicates', methods=['GET'])
+def get_duplicate_claims():
+    """List claims flagged as duplicates at write time, newest first"""
+    limit = max(1, min(request.args.get('limit', 100, type=int), 1000))
+    before_id = request.args.get('before_id', type=int)
+    member_id = request.args.get('member_id', type=int)
+    
+    try:
+        start_date = request.args.get('start_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = request.args.get('end_date')
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return jsonify({'error': 'start_date and end_date must be YYYY-MM-DD'}), 400
+    
+    duplicates = DuplicateClaimService.list_flagged(start_date, end_date, member_id, limit, before_id)
+    
+    return jsonify({
+        'duplicates': duplicates,
+        'count': len(duplicates),
+        'next_before_id': duplicates[-1]['id'] if len(duplicates) == limit else None
+    }), 200
+
+
 @bp.route('/<int:claim_id>', methods=['GET'])
 def get_claim(claim_id):
     """Get a specific claim by ID"""
@@ -84,9 +169,6 @@ def create_claim():
     if not pharmacy:
         return jsonify({'error': 'Pharmacy not found'}), 404
     
-    if Claim.query.filter_by(claim_number=data['claim_number']).first():
-        return jsonify({'error': 'Claim number already exists'}), 409
-    
     try:
         claim = Claim(
             claim_number=data['claim_number'],
@@ -118,8 +200,18 @@ def create_claim():
             is_specialty=data.get('is_specialty', False)
         )
         
+        # The claim_numbers key decides, so two concurrent requests cannot both
+        # write the same number even with fill dates in different months
+        if not ClaimNumberService.reserve([{'claim_number': claim.claim_number, 'fill_date': claim.fill_date}]):
+            db.session.rollback()
+            return jsonify({'error': 'Claim number already exists'}), 409
+        
+        DuplicateClaimService.mark_claim(claim)
         db.session.add(claim)
+        ClaimStatsService.record_change(after=ClaimStatsService.snapshot(claim))
+        AccumulatorService.record_change(after=AccumulatorService.snapshot(claim))
         db.session.commit()
+        cache.invalidate('claims')
         
         return jsonify(claim.to_dict()), 201
     
@@ -128,6 +220,88 @@ def create_claim():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/bulk', methods=['POST'])
+def bulk_create_claims():
+    """Bulk-load claims from a streamed CSV or NDJSON request body"""
+    fmt = ClaimIngestService.detect_format(request.mimetype, request.args.get('format'))
+    if not fmt:
+        return jsonify({'error': 'Unsupported format, send text/csv or application/x-ndjson'}), 415
+    
+    chunk_size = request.args.get('chunk_size', current_app.config.get('BULK_CHUNK_SIZE', 5000), type=int)
+    chunk_size = max(1, min(chunk_size, 50000))
+    
+    # Read the raw WSGI input so the upload is not held to MAX_CONTENT_LENGTH or buffered in memory
+    stream = get_input_stream(
+        request.environ,
+        max_content_length=current_app.config.get('BULK_MAX_CONTENT_LENGTH')
+    )
+    
+    report = ClaimIngestService.ingest(stream, fmt, chunk_size=chunk_size)
+    if report['loaded']:
+        cache.invalidate('claims')
+    status_code = 201 if report['loaded'] else 400
+    return jsonify(report), status_code
+
+
+@bp.route('/bulk-status', methods=['POST'])
+def bulk_update_claim_status():
+    """Move a list of claims to a new status in one set-based statement"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    status = data.get('status')
+    claim_ids = data.get('claim_ids')
+    
+    if status not in ALLOWED_TRANSITIONS:
+        return jsonify({'error': f"status must be one of: {', '.join(ALLOWED_TRANSITIONS)}"}), 400
+    
+    if not isinstance(claim_ids, list) or not claim_ids or not all(isinstance(i, int) for i in claim_ids):
+        return jsonify({'error': 'claim_ids must be a non-empty list of claim IDs'}), 400
+    
+    max_ids = current_app.config.get('BULK_STATUS_MAX_IDS', 50000)
+    if len(claim_ids) > max_ids:
+        return jsonify({'error': f'At most {max_ids} claim_ids per request'}), 413
+    
+    try:
+        result = ClaimTransitionService.transition(status, claim_ids=claim_ids)
+        db.session.commit()
+        cache.invalidate('claims')
+        result['requested'] = len(set(claim_ids))
+        return jsonify(result), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/payment-runs', methods=['POST'])
+def create_payment_run():
+    """Mark approved claims paid in bulk and return a per-pharmacy remittance summary"""
+    data = request.get_json(silent=True) or {}
+    
+    pharmacy_ids = data.get('pharmacy_ids')
+    if pharmacy_ids is not None and (not isinstance(pharmacy_ids, list)
+                                     or not all(isinstance(i, int) for i in pharmacy_ids)):
+        return jsonify({'error': 'pharmacy_ids must be a list of pharmacy IDs'}), 400
+    
+    try:
+        through_date = datetime.strptime(data['through_date'], '%Y-%m-%d').date() if data.get('through_date') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'through_date must be YYYY-MM-DD'}), 400
+    
+    try:
+        result = ClaimTransitionService.transition('paid', pharmacy_ids=pharmacy_ids, through_date=through_date)
+        db.session.commit()
+        cache.invalidate('claims')
+        return jsonify(result), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/<int:claim_id>', methods=['PUT'])
 def update_claim(claim_id):
     """Update an existing claim"""
@@ -137,6 +311,9 @@ def update_claim(claim_id):
     if not data:
         return jsonify({'error': 'No data provided'}), 400
     
+    before = ClaimStatsService.snapshot(claim)
+    accumulated_before = AccumulatorService.snapshot(claim)
+    
     try:
         # Update status and timestamps
         if 'status' in data:
@@ -160,7 +337,10 @@ def update_claim(claim_id):
             if field in data:
                 setattr(claim, field, data[field])
         
+        ClaimStatsService.record_change(before, ClaimStatsService.snapshot(claim))
+        AccumulatorService.record_change(accumulated_before, AccumulatorService.snapshot(claim))
         db.session.commit()
+        cache.invalidate('claims')
         return jsonify(claim.to_dict()), 200
     
     except Exception as e:
@@ -173,9 +353,15 @@ def delete_claim(claim_id):
     """Delete a claim (reverse it)"""
     claim = Claim.query.get_or_404(claim_id)
     
+    before = ClaimStatsService.snapshot(claim)
+    accumulated_before = AccumulatorService.snapshot(claim)
+    
     try:
         claim.status = 'reversed'
+        ClaimStatsService.record_change(before, ClaimStatsService.snapshot(claim))
+        AccumulatorService.record_change(accumulated_before, AccumulatorService.snapshot(claim))
         db.session.commit()
+        cache.invalidate('claims')
         return jsonify({'message': 'Claim reversed successfully'}), 200
     
     except Exception as e:
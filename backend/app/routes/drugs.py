@@ -1,7 +1,11 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Drug
-from sqlalchemy import or_, func
+from app.utils.cache import cache
+from app.utils.pagination import keyset_paginate
+from app.utils.search import prefix_tsquery, looks_like_ndc
+from app.services.drug_autocomplete import drug_autocomplete
+from sqlalchemy import func
 
 bp = Blueprint('drugs', __name__, url_prefix='/api/drugs')
 
@@ -17,16 +21,16 @@ def get_drugs():
     
     query = Drug.query
     
+    rank = None
     if search:
-        search_filter = f'%{search}%'
-        query = query.filter(
-            or_(
-                Drug.name.ilike(search_filter),
-                Drug.generic_name.ilike(search_filter),
-                Drug.brand_name.ilike(search_filter),
-                Drug.ndc.ilike(search_filter)
-            )
-        )
+        if looks_like_ndc(search):
+            query = query.filter(Drug.ndc.like(f'{search.strip()}%'))
+        else:
+            tsquery = prefix_tsquery(search)
+            if tsquery is None:
+                return jsonify({'error': 'Search text must contain letters or digits'}), 400
+            query = query.filter(Drug.search_vector.bool_op('@@')(tsquery))
+            rank = func.ts_rank(Drug.search_vector, tsquery)
     
     if is_generic is not None:
         query = query.filter(Drug.is_generic == is_generic)
@@ -34,7 +38,31 @@ def get_drugs():
     if therapeutic_class:
         query = query.filter(Drug.therapeutic_class.ilike(f'%{therapeutic_class}%'))
     
-    query = query.filter(Drug.is_active == True).order_by(Drug.name)
+    query = query.filter(Drug.is_active == True)
+    
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                query, [Drug.name, Drug.id],
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', per_page, type=int),
+                count=request.args.get('count', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'drugs': [drug.to_dict() for drug in result['items']],
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+            'limit': result['limit'],
+            'total': result['total']
+        }), 200
+    
+    if rank is not None:
+        query = query.order_by(rank.desc(), Drug.name, Drug.id)
+    else:
+        query = query.order_by(Drug.name)
     
     paginated = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -57,21 +85,28 @@ def get_drug(drug_id):
 def search_drugs():
     """Full-text search for drugs"""
     query_text = request.args.get('q', '')
-    limit = request.args.get('limit', 10, type=int)
+    limit = min(request.args.get('limit', 10, type=int), 100)
     
     if not query_text:
         return jsonify({'error': 'Search query required'}), 400
     
-    # Simple ILIKE search (full-text search would use search_vector)
-    search_filter = f'%{query_text}%'
-    drugs = Drug.query.filter(
-        or_(
-            Drug.name.ilike(search_filter),
-            Drug.generic_name.ilike(search_filter),
-            Drug.brand_name.ilike(search_filter)
-        ),
-        Drug.is_active == True
-    ).limit(limit).all()
+    if looks_like_ndc(query_text):
+        drugs = Drug.query.filter(
+            Drug.ndc.like(f'{query_text.strip()}%'),
+            Drug.is_active == True
+        ).order_by(Drug.ndc).limit(limit).all()
+    else:
+        tsquery = prefix_tsquery(query_text)
+        if tsquery is None:
+            return jsonify({'error': 'Search text must contain letters or digits'}), 400
+        
+        # Prefix match on the GIN-indexed search_vector, best matches first
+        drugs = Drug.query.filter(
+            Drug.search_vector.bool_op('@@')(tsquery),
+            Drug.is_active == True
+        ).order_by(
+            func.ts_rank(Drug.search_vector, tsquery).desc(), Drug.name, Drug.id
+        ).limit(limit).all()
     
     return jsonify({
         'query': query_text,
@@ -79,6 +114,21 @@ def search_drugs():
     }), 200
 
 
+@bp.route('/autocomplete', methods=['GET'])
+def autocomplete_drugs():
+    """Type-ahead suggestions from the in-process prefix index (no database round trip)"""
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', 10, type=int)
+    
+    if not prefix.strip():
+        return jsonify({'error': 'prefix is required'}), 400
+    
+    return jsonify({
+        'prefix': prefix,
+        'suggestions': drug_autocomplete.suggest(prefix, limit)
+    }), 200
+
+
 @bp.route('', methods=['POST'])
 def create_drug():
     """Create a new drug"""
@@ -115,6 +165,7 @@ def create_drug():
         
         db.session.add(drug)
         db.session.commit()
+        drug_autocomplete.invalidate()
         
         return jsonify(drug.to_dict()), 201
     
@@ -144,6 +195,8 @@ def update_drug(drug_id):
                 setattr(drug, field, data[field])
         
         db.session.commit()
+        drug_autocomplete.invalidate()
+        cache.invalidate('drugs')
         return jsonify(drug.to_dict()), 200
     
     except Exception as e:
@@ -159,6 +212,8 @@ def delete_drug(drug_id):
     try:
         drug.is_active = False
         db.session.commit()
+        drug_autocomplete.invalidate()
+        cache.invalidate('drugs')
         return jsonify({'message': 'Drug deactivated successfully'}), 200
     
     except Exception as e:
@@ -0,0 +1,237 @@
+from flask import Blueprint, request, jsonify, current_app
+from app import db
+from app.models import Formulary, Drug
+from app.services.formulary_index import formulary_index
+from app.services.coverage_service import CoverageService
+from sqlalchemy import or_
+from datetime import datetime, date
+
+bp = Blueprint('formulary', __name__, url_prefix='/api/formulary')
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def _overlapping(drug_id, effective_date, termination_date, exclude_id=None):
+    """An existing entry for the drug whose coverage window intersects the given one"""
+    query = Formulary.query.filter(
+        Formulary.drug_id == drug_id,
+        or_(Formulary.termination_date == None, Formulary.termination_date >= effective_date)
+    )
+    if termination_date is not None:
+        query = query.filter(Formulary.effective_date <= termination_date)
+    if exclude_id is not None:
+        query = query.filter(Formulary.id != exclude_id)
+    return query.first()
+
+
+@bp.route('', methods=['GET'])
+def get_formulary():
+    """List formulary entries, optionally only those in effect on a date"""
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+    drug_id = request.args.get('drug_id', type=int)
+    tier = request.args.get('tier', type=int)
+    
+    try:
+        on_date = _parse_date(request.args.get('date'))
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    
+    query = Formulary.query
+    
+    if drug_id:
+        query = query.filter(Formulary.drug_id == drug_id)
+    
+    if tier:
+        query = query.filter(Formulary.tier == tier)
+    
+    if on_date:
+        query = query.filter(
+            Formulary.effective_date <= on_date,
+            or_(Formulary.termination_date == None, Formulary.termination_date >= on_date)
+        )
+    
+    query = query.order_by(Formulary.drug_id, Formulary.effective_date.desc(), Formulary.id)
+    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    
+    return jsonify({
+        'entries': [entry.to_dict() for entry in paginated.items],
+        'total': paginated.total,
+        'pages': paginated.pages,
+        'current_page': page
+    }), 200
+
+
+@bp.route('/lookup', methods=['GET'])
+def lookup_formulary():
+    """The formulary entry in effect for a drug on a date (default today)"""
+    drug_id = request.args.get('drug_id', type=int)
+    
+    if not drug_id:
+        return jsonify({'error': 'drug_id is required'}), 400
+    
+    try:
+        on_date = _parse_date(request.args.get('date')) or date.today()
+    except ValueError:
+        return jsonify({'error': 'date must be YYYY-MM-DD'}), 400
+    
+    entry = formulary_index.lookup(drug_id, on_date)
+    if entry is None:
+        return jsonify({'error': 'No formulary entry in effect', 'drug_id': drug_id,
+                        'date': on_date.isoformat()}), 404
+    
+    return jsonify(entry), 200
+
+
+@bp.route('/coverage-check', methods=['POST'])
+def coverage_check():
+    """
+    Coverage, tier and cost sharing for many (ndc, fill_date, pharmacy_id,
+    member_id) items in one call
+    """
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Provide a non-empty items list'}), 400
+    
+    max_items = current_app.config.get('COVERAGE_CHECK_MAX_ITEMS', 5000)
+    if len(items) > max_items:
+        return jsonify({'error': f'At most {max_items} items per request'}), 413
+    
+    results = CoverageService.check(items)
+    
+    return jsonify({
+        'results': results,
+        'count': len(results),
+        'covered': sum(1 for result in results if result['covered'])
+    }), 200
+
+
+@bp.route('/<int:entry_id>', methods=['GET'])
+def get_formulary_entry(entry_id):
+    """Get a specific formulary entry by ID"""
+    entry = Formulary.query.get_or_404(entry_id)
+    return jsonify(entry.to_dict()), 200
+
+
+@bp.route('', methods=['POST'])
+def create_formulary_entry():
+    """Create a formulary entry; coverage windows for a drug may not overlap"""
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    required_fields = ['drug_id', 'tier', 'effective_date']
+    for field in required_fields:
+        if field not in data:
+            return jsonify({'error': f'Missing required field: {field}'}), 400
+    
+    if not Drug.query.get(data['drug_id']):
+        return jsonify({'error': 'Drug not found'}), 404
+    
+    try:
+        effective_date = _parse_date(data['effective_date'])
+        termination_date = _parse_date(data.get('termination_date'))
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    if termination_date is not None and termination_date < effective_date:
+        return jsonify({'error': 'termination_date must not be before effective_date'}), 400
+    
+    conflict = _overlapping(data['drug_id'], effective_date, termination_date)
+    if conflict:
+        return jsonify({'error': 'Overlaps an existing formulary entry', 'conflict': conflict.to_dict()}), 409
+    
+    try:
+        entry = Formulary(
+            drug_id=data['drug_id'],
+            tier=data['tier'],
+            tier_name=data.get('tier_name'),
+            is_covered=data.get('is_covered', True),
+            requires_prior_auth=data.get('requires_prior_auth', False),
+            requires_step_therapy=data.get('requires_step_therapy', False),
+            quantity_limit=data.get('quantity_limit'),
+            copay_retail=data.get('copay_retail'),
+            copay_mail_order=data.get('copay_mail_order'),
+            coinsurance_rate=data.get('coinsurance_rate'),
+            effective_date=effective_date,
+            termination_date=termination_date,
+            coverage_notes=data.get('coverage_notes')
+        )
+        
+        db.session.add(entry)
+        db.session.commit()
+        formulary_index.invalidate()
+        
+        return jsonify(entry.to_dict()), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:entry_id>', methods=['PUT'])
+def update_formulary_entry(entry_id):
+    """Update an existing formulary entry"""
+    entry = Formulary.query.get_or_404(entry_id)
+    data = request.get_json()
+    
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    try:
+        effective_date = _parse_date(data['effective_date']) if 'effective_date' in data else entry.effective_date
+        termination_date = _parse_date(data['termination_date']) if 'termination_date' in data else entry.termination_date
+    except ValueError:
+        return jsonify({'error': 'Dates must be YYYY-MM-DD'}), 400
+    
+    if effective_date is None:
+        return jsonify({'error': 'effective_date is required'}), 400
+    
+    if termination_date is not None and termination_date < effective_date:
+        return jsonify({'error': 'termination_date must not be before effective_date'}), 400
+    
+    conflict = _overlapping(entry.drug_id, effective_date, termination_date, exclude_id=entry.id)
+    if conflict:
+        return jsonify({'error': 'Overlaps an existing formulary entry', 'conflict': conflict.to_dict()}), 409
+    
+    try:
+        updatable_fields = [
+            'tier', 'tier_name', 'is_covered', 'requires_prior_auth', 'requires_step_therapy',
+            'quantity_limit', 'copay_retail', 'copay_mail_order', 'coinsurance_rate', 'coverage_notes'
+        ]
+        
+        for field in updatable_fields:
+            if field in data:
+                setattr(entry, field, data[field])
+        
+        entry.effective_date = effective_date
+        entry.termination_date = termination_date
+        
+        db.session.commit()
+        formulary_index.invalidate()
+        return jsonify(entry.to_dict()), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/<int:entry_id>', methods=['DELETE'])
+def delete_formulary_entry(entry_id):
+    """Delete a formulary entry"""
+    entry = Formulary.query.get_or_404(entry_id)
+    
+    try:
+        db.session.delete(entry)
+        db.session.commit()
+        formulary_index.invalidate()
+        return jsonify({'message': 'Formulary entry deleted successfully'}), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,12 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import Member
-from datetime import datetime
+from app.models import Member, Claim, MemberAccumulator
+from app.utils.pagination import keyset_paginate
+from app.utils.cache import cache
+from app.utils.search import trigram_search
+from app.services.columnar_engine import claim_store
+from app.services.accumulator_service import AccumulatorService
+from datetime import datetime, date
 from sqlalchemy import or_
 
 bp = Blueprint('members', __name__, url_prefix='/api/members')
@@ -14,10 +19,18 @@ def get_members():
     per_page = request.args.get('per_page', 20, type=int)
     search = request.args.get('search', '')
     is_active = request.args.get('is_active', type=lambda v: v.lower() == 'true')
+    fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
     
     query = Member.query
     
-    if search:
+    rank = None
+    if search and fuzzy:
+        # Similarity-ranked, typo-tolerant name lookup ('Jon Smtih')
+        condition, rank = trigram_search(
+            [Member.full_name_expression(), Member.last_name, Member.first_name], search
+        )
+        query = query.filter(condition)
+    elif search:
         search_filter = f'%{search}%'
         query = query.filter(
             or_(
@@ -31,7 +44,29 @@ def get_members():
     if is_active is not None:
         query = query.filter(Member.is_active == is_active)
     
-    query = query.order_by(Member.last_name, Member.first_name)
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                query, [Member.last_name, Member.first_name, Member.id],
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', per_page, type=int),
+                count=request.args.get('count', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'members': [member.to_dict() for member in result['items']],
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+            'limit': result['limit'],
+            'total': result['total']
+        }), 200
+    
+    if rank is not None:
+        query = query.order_by(rank.desc(), Member.id)
+    else:
+        query = query.order_by(Member.last_name, Member.first_name)
     
     paginated = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -138,6 +173,7 @@ def update_member(member_id):
             member.is_active = data['is_active']
         
         db.session.commit()
+        cache.invalidate('members')
         return jsonify(member.to_dict()), 200
     
     except Exception as e:
@@ -153,6 +189,9 @@ def delete_member(member_id):
     try:
         db.session.delete(member)
         db.session.commit()
+        cache.invalidate('members', 'claims')
+        # Claims were hard-deleted with the member; incremental refresh cannot see that
+        claim_store.invalidate()
         return jsonify({'message': 'Member deleted successfully'}), 200
     
     except Exception as e:
@@ -167,7 +206,31 @@ def get_member_claims(member_id):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    paginated = member.claims.order_by('fill_date DESC').paginate(
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                Claim.query_for_list().filter(Claim.member_id == member.id),
+                [Claim.fill_date, Claim.id],
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', per_page, type=int),
+                descending=True,
+                count=request.args.get('count', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'member_id': member.id,
+            'claims': [claim.to_dict() for claim in result['items']],
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+            'limit': result['limit'],
+            'total': result['total']
+        }), 200
+    
+    paginated = Claim.query_for_list().filter(
+        Claim.member_id == member.id
+    ).order_by(Claim.fill_date.desc()).paginate(
         page=page, per_page=per_page, error_out=False
     )
     
@@ -178,3 +241,21 @@ def get_member_claims(member_id):
         'pages': paginated.pages,
         'current_page': page
     }), 200
+
+
+@bp.route('/<int:member_id>/accumulators', methods=['GET'])
+def get_member_accumulators(member_id):
+    """Year-to-date deductible and out-of-pocket totals for a member"""
+    plan_year = request.args.get('plan_year', date.today().year, type=int)
+    
+    accumulator = AccumulatorService.get(member_id, plan_year)
+    if accumulator is None:
+        # No adjudicated claims yet this year; report zeros for a known member
+        Member.query.get_or_404(member_id)
+        accumulator = MemberAccumulator(
+            member_id=member_id, plan_year=plan_year, claim_count=0,
+            deductible_applied=0, member_copay=0, member_coinsurance=0,
+            plan_paid_amount=0, total_cost=0
+        )
+    
+    return jsonify(accumulator.to_dict()), 200
@@ -1,6 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models import Pharmacy
+from app.utils.cache import cache
+from app.utils.pagination import keyset_paginate
+from app.utils.search import trigram_search
 from sqlalchemy import or_, func
 
 bp = Blueprint('pharmacies', __name__, url_prefix='/api/pharmacies')
@@ -15,10 +18,15 @@ def get_pharmacies():
     city = request.args.get('city', '')
     state = request.args.get('state', '')
     in_network = request.args.get('in_network', type=lambda v: v.lower() == 'true')
+    fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
     
     query = Pharmacy.query
     
-    if search:
+    rank = None
+    if search and fuzzy:
+        condition, rank = trigram_search([Pharmacy.name, Pharmacy.chain_name, Pharmacy.city], search)
+        query = query.filter(condition)
+    elif search:
         search_filter = f'%{search}%'
         query = query.filter(
             or_(
@@ -37,7 +45,31 @@ def get_pharmacies():
     if in_network is not None:
         query = query.filter(Pharmacy.in_network == in_network)
     
-    query = query.filter(Pharmacy.is_active == True).order_by(Pharmacy.name)
+    query = query.filter(Pharmacy.is_active == True)
+    
+    if 'cursor' in request.args:
+        try:
+            result = keyset_paginate(
+                query, [Pharmacy.name, Pharmacy.id],
+                cursor=request.args.get('cursor'),
+                limit=request.args.get('limit', per_page, type=int),
+                count=request.args.get('count', 'none')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'pharmacies': [pharmacy.to_dict() for pharmacy in result['items']],
+            'next_cursor': result['next_cursor'],
+            'has_more': result['has_more'],
+            'limit': result['limit'],
+            'total': result['total']
+        }), 200
+    
+    if rank is not None:
+        query = query.order_by(rank.desc(), Pharmacy.id)
+    else:
+        query = query.order_by(Pharmacy.name)
     
     paginated = query.paginate(page=page, per_page=per_page, error_out=False)
     
@@ -49,6 +81,60 @@ def get_pharmacies():
     }), 200
 
 
+@bp.route('/nearby', methods=['GET'])
+def get_nearby_pharmacies():
+    """Active pharmacies within radius_km of a point, nearest first"""
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radius_km = request.args.get('radius_km', 10, type=float)
+    limit = request.args.get('limit', 20, type=int)
+    in_network = request.args.get('in_network', type=lambda v: v.lower() == 'true')
+    is_24_hours = request.args.get('is_24_hours', type=lambda v: v.lower() == 'true')
+    
+    if lat is None or lon is None:
+        return jsonify({'error': 'lat and lon are required'}), 400
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({'error': 'lat must be between -90 and 90 and lon between -180 and 180'}), 400
+    if not 0 < radius_km <= 500:
+        return jsonify({'error': 'radius_km must be between 0 and 500'}), 400
+    if not 1 <= limit <= 100:
+        return jsonify({'error': 'limit must be between 1 and 100'}), 400
+    
+    radius_m = radius_km * 1000
+    origin = func.ll_to_earth(lat, lon)
+    point = Pharmacy.earth_point()
+    distance = func.earth_distance(origin, point)
+    
+    # earth_box() is the indexable bounding-cube test (idx_pharmacy_earth); it
+    # over-selects slightly, so the exact great-circle distance is checked too
+    query = db.session.query(Pharmacy, distance.label('distance')).filter(
+        Pharmacy.is_active == True,
+        func.earth_box(origin, radius_m).op('@>')(point),
+        distance <= radius_m
+    )
+    
+    if in_network is not None:
+        query = query.filter(Pharmacy.in_network == in_network)
+    
+    if is_24_hours is not None:
+        query = query.filter(Pharmacy.is_24_hours == is_24_hours)
+    
+    results = query.order_by(distance, Pharmacy.id).limit(limit).all()
+    
+    pharmacies = []
+    for pharmacy, distance_m in results:
+        item = pharmacy.to_dict()
+        item['distance_km'] = round(distance_m / 1000, 3)
+        pharmacies.append(item)
+    
+    return jsonify({
+        'pharmacies': pharmacies,
+        'origin': {'lat': lat, 'lon': lon},
+        'radius_km': radius_km,
+        'count': len(pharmacies)
+    }), 200
+
+
 @bp.route('/<int:pharmacy_id>', methods=['GET'])
 def get_pharmacy(pharmacy_id):
     """Get a specific pharmacy by ID"""
@@ -128,6 +214,7 @@ def update_pharmacy(pharmacy_id):
                 setattr(pharmacy, field, data[field])
         
         db.session.commit()
+        cache.invalidate('pharmacies')
         return jsonify(pharmacy.to_dict()), 200
     
     except Exception as e:
@@ -1,70 +1,46 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models import Claim, Drug, Member
-from sqlalchemy import func, and_, case
+from app.utils.cache import cache
+from app.services.analytics_service import AnalyticsService
+from app.models import Claim, ClaimDailyStat, Drug, Member
+from sqlalchemy import func, and_, case, extract
 from datetime import datetime, timedelta
 
 bp = Blueprint('reports', __name__, url_prefix='/api/reports')
 
 
 @bp.route('/generic-savings', methods=['GET'])
+@cache.cached('claims', 'drugs')
 def generic_savings_opportunity():
     """Calculate potential savings from generic substitution"""
     days = request.args.get('days', 90, type=int)
+    min_savings = request.args.get('min_savings', 0, type=float)
+    therapeutic_class = request.args.get('therapeutic_class') or None
+    limit = request.args.get('limit', 20, type=int)
     start_date = datetime.utcnow().date() - timedelta(days=days)
     
-    # Find brand claims where generic alternative exists
-    brand_claims = db.session.query(
-        Drug.name.label('brand_name'),
-        Drug.generic_name,
-        func.count(Claim.id).label('brand_claims'),
-        func.sum(Claim.total_cost).label('brand_cost'),
-        func.avg(Claim.total_cost).label('avg_brand_cost')
-    ).join(Drug).filter(
-        Claim.fill_date >= start_date,
-        Drug.is_generic == False,
-        Drug.generic_name.isnot(None)
-    ).group_by(Drug.name, Drug.generic_name).all()
-    
-    savings_opportunities = []
-    
-    for brand in brand_claims:
-        # Find average cost of generic equivalent
-        generic_avg = db.session.query(
-            func.avg(Claim.total_cost)
-        ).join(Drug).filter(
-            Drug.generic_name == brand.generic_name,
-            Drug.is_generic == True,
-            Claim.fill_date >= start_date
-        ).scalar()
-        
-        if generic_avg:
-            potential_savings = (float(brand.avg_brand_cost) - float(generic_avg)) * brand.brand_claims
-            
-            if potential_savings > 0:
-                savings_opportunities.append({
-                    'brand_name': brand.brand_name,
-                    'generic_name': brand.generic_name,
-                    'brand_claims': brand.brand_claims,
-                    'avg_brand_cost': float(brand.avg_brand_cost),
-                    'avg_generic_cost': float(generic_avg),
-                    'potential_savings': round(potential_savings, 2),
-                    'savings_per_claim': round(float(brand.avg_brand_cost) - float(generic_avg), 2)
-                })
-    
-    # Sort by potential savings
-    savings_opportunities.sort(key=lambda x: x['potential_savings'], reverse=True)
+    if min_savings < 0 or not 1 <= limit <= 500:
+        return jsonify({'error': 'min_savings must be >= 0 and limit 1-500'}), 400
     
-    total_potential_savings = sum(opp['potential_savings'] for opp in savings_opportunities)
+    savings = AnalyticsService.get_generic_savings(
+        start_date,
+        min_savings=min_savings,
+        therapeutic_class=therapeutic_class,
+        limit=limit
+    )
     
     return jsonify({
         'period_days': days,
-        'total_potential_savings': round(total_potential_savings, 2),
-        'opportunities': savings_opportunities[:20]  # Top 20
+        'min_savings': min_savings,
+        'therapeutic_class': therapeutic_class,
+        'total_potential_savings': savings['total_potential_savings'],
+        'opportunity_count': savings['opportunity_count'],
+        'opportunities': savings['opportunities']
     }), 200
 
 
 @bp.route('/cost-summary', methods=['GET'])
+@cache.cached('claims')
 def cost_summary_report():
     """Comprehensive cost summary report"""
     start_date_str = request.args.get('start_date', '')
@@ -77,35 +53,36 @@ def cost_summary_report():
         start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end_date = datetime.strptime(end_date_str, '%Y-%m-%d').date()
     
-    # Overall statistics
+    in_period = and_(ClaimDailyStat.fill_date >= start_date, ClaimDailyStat.fill_date <= end_date)
+    
+    # Overall statistics (from the claim_daily_stats rollup)
     overall = db.session.query(
-        func.count(Claim.id).label('total_claims'),
-        func.sum(Claim.total_cost).label('total_cost'),
-        func.sum(Claim.plan_paid_amount).label('plan_paid'),
-        func.sum(Claim.member_copay).label('member_paid'),
-        func.avg(Claim.total_cost).label('avg_cost')
-    ).filter(
-        and_(Claim.fill_date >= start_date, Claim.fill_date <= end_date)
-    ).first()
+        func.sum(ClaimDailyStat.claim_count).label('total_claims'),
+        func.sum(ClaimDailyStat.total_cost).label('total_cost'),
+        func.sum(ClaimDailyStat.plan_paid_amount).label('plan_paid'),
+        func.sum(ClaimDailyStat.member_copay).label('member_paid')
+    ).filter(in_period).first()
     
     # By status
     by_status = db.session.query(
-        Claim.status,
-        func.count(Claim.id).label('count'),
-        func.sum(Claim.total_cost).label('cost')
-    ).filter(
-        and_(Claim.fill_date >= start_date, Claim.fill_date <= end_date)
-    ).group_by(Claim.status).all()
+        ClaimDailyStat.status,
+        func.sum(ClaimDailyStat.claim_count).label('count'),
+        func.sum(ClaimDailyStat.total_cost).label('cost')
+    ).filter(in_period).group_by(ClaimDailyStat.status).having(
+        func.sum(ClaimDailyStat.claim_count) > 0
+    ).all()
     
     # Monthly breakdown
     monthly = db.session.query(
-        extract('year', Claim.fill_date).label('year'),
-        extract('month', Claim.fill_date).label('month'),
-        func.count(Claim.id).label('claims'),
-        func.sum(Claim.total_cost).label('cost')
-    ).filter(
-        and_(Claim.fill_date >= start_date, Claim.fill_date <= end_date)
-    ).group_by('year', 'month').order_by('year', 'month').all()
+        extract('year', ClaimDailyStat.fill_date).label('year'),
+        extract('month', ClaimDailyStat.fill_date).label('month'),
+        func.sum(ClaimDailyStat.claim_count).label('claims'),
+        func.sum(ClaimDailyStat.total_cost).label('cost')
+    ).filter(in_period).group_by('year', 'month').having(
+        func.sum(ClaimDailyStat.claim_count) > 0
+    ).order_by('year', 'month').all()
+    
+    total_claims = int(overall.total_claims or 0)
     
     return jsonify({
         'report_period': {
@@ -113,16 +90,16 @@ def cost_summary_report():
             'end_date': end_date.isoformat()
         },
         'overall_summary': {
-            'total_claims': overall.total_claims or 0,
+            'total_claims': total_claims,
             'total_cost': float(overall.total_cost) if overall.total_cost else 0,
             'plan_paid': float(overall.plan_paid) if overall.plan_paid else 0,
             'member_paid': float(overall.member_paid) if overall.member_paid else 0,
-            'average_cost': float(overall.avg_cost) if overall.avg_cost else 0
+            'average_cost': float(overall.total_cost / total_claims) if total_claims else 0
         },
         'by_status': [
             {
                 'status': row.status,
-                'claims': row.count,
+                'claims': int(row.count),
                 'cost': float(row.cost) if row.cost else 0
             } for row in by_status
         ],
@@ -130,7 +107,7 @@ def cost_summary_report():
             {
                 'year': int(row.year),
                 'month': int(row.month),
-                'claims': row.claims,
+                'claims': int(row.claims),
                 'cost': float(row.cost)
             } for row in monthly
         ]
@@ -138,6 +115,7 @@ def cost_summary_report():
 
 
 @bp.route('/member-summary/<int:member_id>', methods=['GET'])
+@cache.cached('claims', 'members', 'drugs')
 def member_summary_report(member_id):
     """Detailed report for a specific member"""
     member = Member.query.get_or_404(member_id)
@@ -169,7 +147,7 @@ def member_summary_report(member_id):
     ).limit(10).all()
     
     # Recent claims
-    recent_claims = Claim.query.filter(
+    recent_claims = Claim.query_for_list().filter(
         Claim.member_id == member_id,
         Claim.fill_date >= start_date
     ).order_by(Claim.fill_date.desc()).limit(10).all()
@@ -0,0 +1,208 @@
+from app import db
+from app.models import MemberAccumulator
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from decimal import Decimal
+
+
+# Only adjudicated claims count toward a member's deductible / out-of-pocket
+ACCUMULATING_STATUSES = ('approved', 'paid')
+ACCUMULATOR_AMOUNTS = ('deductible_applied', 'member_copay', 'member_coinsurance',
+                       'plan_paid_amount', 'total_cost')
+
+EXPECTED_ACCUMULATORS_SQL = """
+    SELECT
+        member_id,
+        CAST(EXTRACT(YEAR FROM fill_date) AS integer) AS plan_year,
+        COUNT(*) AS claim_count,
+        COALESCE(SUM(deductible_applied), 0) AS deductible_applied,
+        COALESCE(SUM(member_copay), 0) AS member_copay,
+        COALESCE(SUM(member_coinsurance), 0) AS member_coinsurance,
+        COALESCE(SUM(plan_paid_amount), 0) AS plan_paid_amount,
+        COALESCE(SUM(total_cost), 0) AS total_cost
+    FROM claims
+    WHERE status IN ('approved', 'paid') {claims_filter}
+    GROUP BY member_id, CAST(EXTRACT(YEAR FROM fill_date) AS integer)
+"""
+
+
+def _money(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class AccumulatorService:
+    """Incremental maintenance of member_accumulators, keyed by (member_id, plan_year)"""
+    
+    @staticmethod
+    def snapshot(claim):
+        """Capture the accumulator-relevant values of a claim before or after a change"""
+        if claim is None:
+            return None
+        values = {'member_id': claim.member_id, 'fill_date': claim.fill_date, 'status': claim.status}
+        for amount in ACCUMULATOR_AMOUNTS:
+            values[amount] = _money(getattr(claim, amount))
+        return values
+    
+    @staticmethod
+    def record_change(before=None, after=None):
+        """
+        Apply the difference between two claim snapshots to the accumulators inside
+        the caller's transaction. Pass before=None for a new claim.
+        """
+        AccumulatorService.record_changes([(before, after)])
+    
+    @staticmethod
+    def record_changes(changes):
+        """Apply many (before, after) snapshot pairs to the accumulators in one upsert"""
+        deltas = {}
+        for before, after in changes:
+            AccumulatorService._accumulate(deltas, before, -1)
+            AccumulatorService._accumulate(deltas, after, 1)
+        AccumulatorService._apply(deltas)
+    
+    @staticmethod
+    def record_rows(rows):
+        """Add a batch of newly inserted claim rows (dicts) to the accumulators in one upsert"""
+        deltas = {}
+        for row in rows:
+            AccumulatorService._accumulate(deltas, {
+                'member_id': row['member_id'],
+                'fill_date': row['fill_date'],
+                'status': row['status'],
+                **{amount: _money(row.get(amount)) for amount in ACCUMULATOR_AMOUNTS}
+            }, 1)
+        AccumulatorService._apply(deltas)
+    
+    @staticmethod
+    def remove_range(start_date, end_date):
+        """
+        Subtract the adjudicated claims with start_date <= fill_date < end_date
+        from their members' accumulators inside the caller's transaction, e.g.
+        before their partition is detached. Keys are upserted in order, like
+        every other accumulator write, so concurrent writers cannot deadlock.
+        """
+        expected_sql = EXPECTED_ACCUMULATORS_SQL.format(
+            claims_filter='AND fill_date >= :start_date AND fill_date < :end_date'
+        )
+        db.session.execute(text(f"""
+            INSERT INTO member_accumulators (
+                member_id, plan_year, claim_count, {', '.join(ACCUMULATOR_AMOUNTS)}, updated_at
+            )
+            SELECT member_id, plan_year, -claim_count, {', '.join(f'-{a}' for a in ACCUMULATOR_AMOUNTS)}, NOW()
+            FROM ({expected_sql}) removed
+            ORDER BY 1, 2
+            ON CONFLICT (member_id, plan_year) DO UPDATE SET
+                claim_count = member_accumulators.claim_count + EXCLUDED.claim_count,
+                {', '.join(f'{a} = member_accumulators.{a} + EXCLUDED.{a}' for a in ACCUMULATOR_AMOUNTS)},
+                updated_at = EXCLUDED.updated_at
+        """), {'start_date': start_date, 'end_date': end_date})
+    
+    @staticmethod
+    def get(member_id, plan_year):
+        """Primary-key read of one member's year-to-date totals"""
+        return db.session.get(MemberAccumulator, (member_id, plan_year))
+    
+    @staticmethod
+    def _accumulate(deltas, values, sign):
+        if values is None or values['status'] not in ACCUMULATING_STATUSES:
+            return
+        key = (values['member_id'], values['fill_date'].year)
+        entry = deltas.setdefault(key, {'claim_count': 0, **{a: Decimal('0') for a in ACCUMULATOR_AMOUNTS}})
+        entry['claim_count'] += sign
+        for amount in ACCUMULATOR_AMOUNTS:
+            entry[amount] += sign * values[amount]
+    
+    @staticmethod
+    def _apply(deltas):
+        now = datetime.utcnow()
+        rows = []
+        # Sorted keys give concurrent writers a consistent lock order
+        for key in sorted(deltas):
+            entry = deltas[key]
+            if entry['claim_count'] == 0 and not any(entry[a] for a in ACCUMULATOR_AMOUNTS):
+                continue
+            rows.append({'member_id': key[0], 'plan_year': key[1], **entry, 'updated_at': now})
+        
+        if not rows:
+            return
+        
+        table = MemberAccumulator.__table__
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['member_id', 'plan_year'],
+            set_={
+                'claim_count': table.c.claim_count + stmt.excluded.claim_count,
+                **{amount: table.c[amount] + stmt.excluded[amount] for amount in ACCUMULATOR_AMOUNTS},
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+    
+    @staticmethod
+    def reconcile(plan_year=None, apply=True, sample_size=20):
+        """
+        Compare stored accumulators with totals recomputed from claims in bulk
+        and, unless apply=False, rebuild them. Concurrent claim writes block on
+        the table lock until the rebuild commits, so the drift report and the
+        rebuilt rows describe the same state.
+        """
+        params = {}
+        claims_filter = ''
+        accumulators_filter = ''
+        if plan_year is not None:
+            claims_filter = 'AND fill_date >= make_date(:plan_year, 1, 1) AND fill_date < make_date(:plan_year + 1, 1, 1)'
+            accumulators_filter = 'WHERE plan_year = :plan_year'
+            params['plan_year'] = plan_year
+        expected_sql = EXPECTED_ACCUMULATORS_SQL.format(claims_filter=claims_filter)
+        
+        if apply:
+            db.session.execute(text('LOCK TABLE member_accumulators IN EXCLUSIVE MODE'))
+        
+        compared = ('claim_count',) + ACCUMULATOR_AMOUNTS
+        drifted = db.session.execute(text(f"""
+            WITH expected AS ({expected_sql}),
+            stored AS (SELECT * FROM member_accumulators {accumulators_filter})
+            SELECT
+                COALESCE(e.member_id, s.member_id) AS member_id,
+                COALESCE(e.plan_year, s.plan_year) AS plan_year,
+                {', '.join(f'COALESCE(s.{c}, 0) AS stored_{c}, COALESCE(e.{c}, 0) AS expected_{c}' for c in compared)}
+            FROM expected e
+            FULL OUTER JOIN stored s ON s.member_id = e.member_id AND s.plan_year = e.plan_year
+            WHERE {' OR '.join(f'COALESCE(s.{c}, 0) <> COALESCE(e.{c}, 0)' for c in compared)}
+            ORDER BY 1, 2
+        """), params).mappings().all()
+        
+        report = {
+            'plan_year': plan_year,
+            'drifted': len(drifted),
+            'applied': apply,
+            'rebuilt': 0,
+            'sample': [
+                {
+                    'member_id': row['member_id'],
+                    'plan_year': row['plan_year'],
+                    **{c: {'stored': float(row[f'stored_{c}']), 'expected': float(row[f'expected_{c}'])}
+                       for c in compared if row[f'stored_{c}'] != row[f'expected_{c}']}
+                }
+                for row in drifted[:sample_size]
+            ]
+        }
+        
+        if not apply:
+            db.session.rollback()
+            return report
+        
+        db.session.execute(text(f'DELETE FROM member_accumulators {accumulators_filter}'), params)
+        result = db.session.execute(text(f"""
+            INSERT INTO member_accumulators (
+                member_id, plan_year, claim_count, {', '.join(ACCUMULATOR_AMOUNTS)}, updated_at
+            )
+            SELECT member_id, plan_year, claim_count, {', '.join(ACCUMULATOR_AMOUNTS)}, NOW()
+            FROM ({expected_sql}) expected
+        """), params)
+        db.session.commit()
+        report['rebuilt'] = result.rowcount
+        return report
@@ -0,0 +1,211 @@
+from app import db
+from app.services.columnar_engine import to_day
+from app.services.refill_service import SupplyTimeline, SUPPLY_STATUSES, sort_order, to_date
+from flask import current_app
+from sqlalchemy import text
+
+try:
+    import numpy as np
+except ImportError:  # optional, like the in-memory analytics engine
+    np = None
+
+
+ADHERENCE_COLUMNS_SQL = """
+    SELECT
+        c.member_id,
+        c.drug_id,
+        d.therapeutic_class,
+        c.fill_date - DATE '1970-01-01' as fill_day,
+        c.days_supply
+    FROM claims c
+    JOIN drugs d ON d.id = c.drug_id
+    WHERE c.status = ANY(:statuses)
+      AND c.fill_date >= :start_date
+      AND c.fill_date <= :end_date
+      AND d.therapeutic_class IS NOT NULL
+"""
+
+PDC_BUCKETS = ((0.0, 0.2), (0.2, 0.4), (0.4, 0.6), (0.6, 0.8), (0.8, 0.9), (0.9, None))
+
+
+def _running_max_by_group(values, group):
+    """Running maximum of values that restarts at each group (group must be sorted)"""
+    if len(values) == 0:
+        return values
+    low = values.min()
+    span = values.max() - low + 1
+    offset = group * span
+    return np.maximum.accumulate(values - low + offset) - offset + low
+
+
+def proportion_of_days_covered(member_id, class_code, drug_id, fill_day, days_supply, period_start, period_end):
+    """
+    PDC per (member, therapeutic class) over the days period_start..period_end.
+
+    Fills of the same drug that overlap are shifted forward to start when the
+    previous supply runs out; supply of different drugs in the class overlaps
+    rather than stacking, so the shifted intervals are merged and each day is
+    counted once. The treatment period runs from the member's first fill of
+    the class in the period to period_end, and only members who filled the
+    class on two or more dates are measured.
+
+    Returns (member_id, class_code, fills, index_day, covered_days,
+    period_days) arrays, one entry per measured member and class.
+    """
+    in_period = (fill_day >= period_start) & (fill_day <= period_end)
+    member_id, class_code, drug_id = member_id[in_period], class_code[in_period], drug_id[in_period]
+    fill_day, days_supply = fill_day[in_period], days_supply[in_period]
+
+    # A drug belongs to one class, so the per-drug shift never crosses classes
+    timeline = SupplyTimeline(np.arange(len(fill_day), dtype=np.int64), member_id, drug_id, fill_day, days_supply)
+    if len(timeline) == 0:
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(6))
+    starts = np.minimum(timeline.supply_end - timeline.days_supply, period_end + 1)
+    ends = np.minimum(timeline.supply_end, period_end + 1)
+
+    # Union of the intervals per (member, class): sorted by start, a fill only
+    # adds the days past the furthest end seen before it in its group
+    order = sort_order((timeline.member_id, class_code[timeline.order], starts))
+    member_id = timeline.member_id[order]
+    class_code = class_code[timeline.order][order]
+    fill_day, starts, ends = timeline.fill_day[order], starts[order], ends[order]
+
+    first_of_group = np.ones(len(order), dtype=bool)
+    first_of_group[1:] = (member_id[1:] != member_id[:-1]) | (class_code[1:] != class_code[:-1])
+    group_starts = np.flatnonzero(first_of_group)
+    group = np.cumsum(first_of_group) - 1
+
+    furthest = np.empty_like(ends)
+    furthest[1:] = _running_max_by_group(ends, group)[:-1]
+    furthest = np.where(first_of_group, starts, furthest)
+    added = np.clip(ends - np.maximum(starts, furthest), 0, None)
+
+    covered = np.add.reduceat(added, group_starts)
+    index_day = np.minimum.reduceat(fill_day, group_starts)
+    last_day = np.maximum.reduceat(fill_day, group_starts)
+    fills = np.diff(np.append(group_starts, len(order)))
+
+    # Measured once the class was filled on two or more dates
+    measured = last_day > index_day
+    period_days = period_end - index_day + 1
+    return (
+        member_id[group_starts][measured],
+        class_code[group_starts][measured],
+        fills[measured],
+        index_day[measured],
+        covered[measured],
+        period_days[measured]
+    )
+
+
+class AdherenceService:
+    """Proportion of days covered (PDC) per member and therapeutic class"""
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    @staticmethod
+    def threshold():
+        return current_app.config.get('ADHERENCE_PDC_THRESHOLD', 0.8)
+
+    @staticmethod
+    def load(start_date, end_date, therapeutic_class=None):
+        """
+        Fills between start_date and end_date with their drug's class, in one
+        streamed query. Returns the class names and per-fill columns with the
+        class as an index into them.
+        """
+        if np is None:
+            raise RuntimeError('Adherence analysis requires numpy')
+
+        sql = ADHERENCE_COLUMNS_SQL
+        params = {'statuses': list(SUPPLY_STATUSES), 'start_date': start_date, 'end_date': end_date}
+        if therapeutic_class:
+            sql += "      AND d.therapeutic_class = :therapeutic_class\n"
+            params['therapeutic_class'] = therapeutic_class
+
+        chunks = []
+        classes = {}
+        result = db.session.execute(text(sql).execution_options(yield_per=200000), params)
+        try:
+            for partition in result.partitions():
+                member_id, drug_id, class_names, fill_day, days_supply = zip(*partition)
+                class_code = [classes.setdefault(name, len(classes)) for name in class_names]
+                chunks.append([np.array(column, dtype=np.int64)
+                               for column in (member_id, class_code, drug_id, fill_day, days_supply)])
+        finally:
+            result.close()
+
+        if not chunks:
+            return [], [np.empty(0, dtype=np.int64) for _ in range(5)]
+        return list(classes), [np.concatenate(parts) for parts in zip(*chunks)]
+
+    @staticmethod
+    def report(start_date, end_date, therapeutic_class=None, limit=100):
+        """
+        PDC distribution and the members above and below ADHERENCE_PDC_THRESHOLD
+        for the measurement period start_date..end_date, overall and by class.
+        """
+        threshold = AdherenceService.threshold()
+        class_names, columns = AdherenceService.load(start_date, end_date, therapeutic_class)
+        member_id, class_code, fills, index_day, covered, period_days = proportion_of_days_covered(
+            *columns, to_day(start_date), to_day(end_date)
+        )
+        pdc = covered / np.maximum(period_days, 1)
+        adherent = pdc >= threshold
+
+        distribution = []
+        for low, high in PDC_BUCKETS:
+            in_bucket = pdc >= low
+            if high is not None:
+                in_bucket &= pdc < high
+            distribution.append({
+                'pdc': f'{low:.0%}-{high:.0%}' if high is not None else f'{low:.0%}+',
+                'members': int(in_bucket.sum())
+            })
+
+        classes = []
+        for code in np.unique(class_code):
+            in_class = class_code == code
+            classes.append({
+                'therapeutic_class': class_names[code],
+                'members': int(in_class.sum()),
+                'adherent': int((in_class & adherent).sum()),
+                'non_adherent': int((in_class & ~adherent).sum()),
+                'average_pdc': round(float(pdc[in_class].mean()), 4)
+            })
+        classes.sort(key=lambda row: row['members'], reverse=True)
+
+        def members(selected):
+            return [
+                {
+                    'member_id': int(member_id[i]),
+                    'therapeutic_class': class_names[class_code[i]],
+                    'pdc': round(float(pdc[i]), 4),
+                    'covered_days': int(covered[i]),
+                    'period_days': int(period_days[i]),
+                    'fills': int(fills[i]),
+                    'index_date': to_date(index_day[i]).isoformat()
+                }
+                for i in selected
+            ]
+
+        # Highest PDC first above the threshold, lowest first below it
+        above = np.flatnonzero(adherent)
+        above = above[np.lexsort((member_id[above], -pdc[above]))][:limit]
+        below = np.flatnonzero(~adherent)
+        below = below[np.lexsort((member_id[below], pdc[below]))][:limit]
+
+        return {
+            'threshold': threshold,
+            'members_measured': int(len(pdc)),
+            'adherent': int(adherent.sum()),
+            'non_adherent': int((~adherent).sum()),
+            'adherence_rate': round(float(adherent.mean()), 4) if len(pdc) else None,
+            'average_pdc': round(float(pdc.mean()), 4) if len(pdc) else None,
+            'pdc_distribution': distribution,
+            'therapeutic_classes': classes,
+            'adherent_members': members(above),
+            'non_adherent_members': members(below)
+        }
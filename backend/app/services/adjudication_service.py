@@ -0,0 +1,183 @@
+from app import db
+from app.models import Claim, Drug
+from app.services.coverage_service import CoverageContext
+from app.services.claim_stats_service import ClaimStatsService
+from app.services.accumulator_service import AccumulatorService
+from app.services.refill_service import RefillService, REJECT_REFILL_TOO_SOON, to_date
+from app.services.columnar_engine import to_day
+from app.utils.cache import cache
+from sqlalchemy import select, update, bindparam
+from types import SimpleNamespace
+from datetime import datetime
+from decimal import Decimal
+
+
+# NCPDP reject codes for formulary utilization management
+REJECT_PRIOR_AUTH = ('75', 'Prior authorization required')
+REJECT_STEP_THERAPY = ('608', 'Step therapy required')
+REJECT_QUANTITY_LIMIT = ('76', 'Plan limitations exceeded: quantity limit')
+
+CENT = Decimal('0.01')
+
+BATCH_COLUMNS = ('id', 'member_id', 'drug_id', 'pharmacy_id', 'fill_date', 'quantity', 'days_supply',
+                 'status', 'total_cost', 'plan_paid_amount', 'member_copay', 'member_coinsurance',
+                 'deductible_applied')
+
+
+def _money(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class AdjudicationService:
+    """Moves pending claims to approved / denied in batches claimed with SKIP LOCKED"""
+
+    @staticmethod
+    def claim_batch(batch_size):
+        """
+        Lock up to batch_size pending claims, oldest first. Rows locked by other
+        workers are skipped rather than waited on, so workers never contend.
+        """
+        table = Claim.__table__
+        query = select(*[table.c[column] for column in BATCH_COLUMNS]).where(
+            table.c.status == 'pending'
+        ).order_by(table.c.submitted_at, table.c.id).limit(batch_size).with_for_update(skip_locked=True)
+        return db.session.execute(query).all()
+
+    @staticmethod
+    def process_batch(batch_size=500):
+        """Claim, adjudicate and write back one batch in a single transaction"""
+        claims = AdjudicationService.claim_batch(batch_size)
+        if not claims:
+            db.session.rollback()
+            return {'claimed': 0, 'approved': 0, 'denied': 0}
+
+        context = CoverageContext.load(
+            {claim.member_id for claim in claims},
+            {claim.pharmacy_id for claim in claims},
+            CoverageContext.drugs_by(Drug.id, {claim.drug_id for claim in claims}),
+            [claim.fill_date for claim in claims]
+        )
+
+        # Supply history for the batch's members and drugs, loaded once
+        timeline = RefillService.for_claims(claims) if RefillService.available() else None
+
+        now = datetime.utcnow()
+        results = AdjudicationService.adjudicate_all(claims, context, timeline)
+        AdjudicationService._write(claims, results, now)
+        db.session.commit()
+        # Reaches the web processes only with CACHE_BACKEND=redis (worker.py runs separately)
+        cache.invalidate('claims')
+
+        approved = sum(1 for result in results if result['status'] == 'approved')
+        return {'claimed': len(claims), 'approved': approved, 'denied': len(claims) - approved}
+
+    @staticmethod
+    def adjudicate_all(claims, context, timeline=None):
+        """Adjudicate claims in order; approved fills count toward later refill checks"""
+        results = []
+        for claim in claims:
+            result = AdjudicationService.adjudicate(claim, context, timeline)
+            if timeline is not None and result['status'] == 'approved':
+                # Later claims in this batch must see this fill's supply
+                timeline.record(claim.member_id, claim.drug_id, to_day(claim.fill_date), claim.days_supply)
+            results.append(result)
+        return results
+
+    @staticmethod
+    def adjudicate(claim, context, timeline=None):
+        """
+        Decide one claim against eligibility, network, formulary and (given a
+        SupplyTimeline) refill timing, and price it
+        """
+        denials, entry, pharmacy = context.evaluate(claim.member_id, claim.pharmacy_id, claim.drug_id,
+                                                    claim.fill_date)
+        if entry is not None and not denials:
+            if entry['requires_prior_auth']:
+                denials.append(REJECT_PRIOR_AUTH)
+            if entry['requires_step_therapy']:
+                denials.append(REJECT_STEP_THERAPY)
+            if entry['quantity_limit'] and claim.quantity > entry['quantity_limit']:
+                denials.append(REJECT_QUANTITY_LIMIT)
+            if timeline is not None:
+                too_soon, remaining, earliest = timeline.refill_check(
+                    claim.member_id, claim.drug_id, to_day(claim.fill_date), RefillService.threshold()
+                )
+                if too_soon:
+                    code, reason = REJECT_REFILL_TOO_SOON
+                    denials.append((code, f'{reason}: {remaining} days supply on hand, '
+                                          f'refill allowed from {to_date(earliest).isoformat()}'))
+
+        if denials:
+            return {
+                'status': 'denied',
+                'rejection_code': denials[0][0],
+                'rejection_reason': '; '.join(reason for _, reason in denials),
+                'plan_paid_amount': claim.plan_paid_amount,
+                'member_copay': claim.member_copay,
+                'member_coinsurance': claim.member_coinsurance,
+                'deductible_applied': claim.deductible_applied
+            }
+
+        return {'status': 'approved', 'rejection_code': None, 'rejection_reason': None,
+                **AdjudicationService.price(claim, entry, CoverageContext.is_mail_order(pharmacy))}
+
+    @staticmethod
+    def price(claim, entry, mail_order):
+        """
+        Split total_cost into member and plan shares: any deductible already
+        applied comes first, then the tier copay, then coinsurance, each capped
+        at what is left of the cost.
+        """
+        cost_sharing = entry['cost_sharing']
+        remaining = _money(claim.total_cost)
+
+        deductible = min(_money(claim.deductible_applied), remaining)
+        remaining -= deductible
+
+        copay = _money(cost_sharing['copay_mail_order'] if mail_order else cost_sharing['copay_retail'])
+        copay = min(copay, remaining)
+        remaining -= copay
+
+        rate = _money(cost_sharing['coinsurance_rate'])
+        coinsurance = min((remaining * rate).quantize(CENT), remaining)
+        remaining -= coinsurance
+
+        return {
+            'plan_paid_amount': remaining,
+            'member_copay': copay,
+            'member_coinsurance': coinsurance,
+            'deductible_applied': deductible
+        }
+
+    @staticmethod
+    def _write(claims, results, now):
+        """One batched UPDATE for the claims plus one upsert per rollup table"""
+        table = Claim.__table__
+        # fill_date lets Postgres prune each update to a single monthly partition
+        stmt = update(table).where(
+            table.c.id == bindparam('b_id'), table.c.fill_date == bindparam('b_fill_date')
+        ).values(
+            status=bindparam('b_status'),
+            rejection_code=bindparam('b_rejection_code'),
+            rejection_reason=bindparam('b_rejection_reason'),
+            plan_paid_amount=bindparam('b_plan_paid_amount'),
+            member_copay=bindparam('b_member_copay'),
+            member_coinsurance=bindparam('b_member_coinsurance'),
+            deductible_applied=bindparam('b_deductible_applied'),
+            processed_at=now,
+            updated_at=now
+        )
+        db.session.execute(stmt, [
+            {'b_id': claim.id, 'b_fill_date': claim.fill_date, **{f'b_{key}': value for key, value in result.items()}}
+            for claim, result in zip(claims, results)
+        ])
+
+        stats_changes, accumulator_changes = [], []
+        for claim, result in zip(claims, results):
+            after = SimpleNamespace(**{**claim._mapping, **result})
+            stats_changes.append((ClaimStatsService.snapshot(claim), ClaimStatsService.snapshot(after)))
+            accumulator_changes.append((AccumulatorService.snapshot(claim), AccumulatorService.snapshot(after)))
+        ClaimStatsService.record_changes(stats_changes)
+        AccumulatorService.record_changes(accumulator_changes)
@@ -1,88 +1,463 @@
 from app import db
-from app.models import Claim, Drug, Member
-from sqlalchemy import func, text
+from app.models import Claim, Drug, Member, Pharmacy
+from sqlalchemy import func, text, case
 from datetime import datetime, timedelta
+from decimal import Decimal
+
+
+TREND_GRANULARITIES = ('day', 'week', 'month')
+
+# Ranked report queries shared by the live methods below and the snapshot
+# refresh in AnalyticsSnapshotService (INSERT ... SELECT from the same SQL).
+DUPLICATE_CLAIMS_SQL = """
+    WITH claim_groups AS (
+        SELECT 
+            member_id,
+            drug_id,
+            fill_date,
+            COUNT(*) as claim_count,
+            ARRAY_AGG(claim_number ORDER BY claim_number) as claim_numbers,
+            SUM(total_cost) as total_cost
+        FROM claims
+        WHERE fill_date >= CURRENT_DATE - CAST(:lookback_days AS integer)
+        GROUP BY member_id, drug_id, fill_date
+        HAVING COUNT(*) > 1
+    )
+    SELECT 
+        ROW_NUMBER() OVER (
+            ORDER BY cg.total_cost DESC, cg.member_id, cg.drug_id, cg.fill_date
+        ) as rank,
+        cg.member_id,
+        m.first_name || ' ' || m.last_name as member_name,
+        d.name as drug_name,
+        cg.fill_date,
+        cg.claim_count,
+        cg.claim_numbers,
+        cg.total_cost
+    FROM claim_groups cg
+    JOIN members m ON cg.member_id = m.id
+    JOIN drugs d ON cg.drug_id = d.id
+"""
+
+MEMBER_RISK_SQL = """
+    WITH member_stats AS (
+        SELECT 
+            member_id,
+            COUNT(*) as claim_count,
+            SUM(total_cost) as total_cost,
+            COUNT(DISTINCT drug_id) as unique_drugs,
+            AVG(days_supply) as avg_days_supply
+        FROM claims
+        WHERE fill_date >= CURRENT_DATE - CAST(:lookback_days AS integer)
+        GROUP BY member_id
+    ),
+    percentiles AS (
+        SELECT 
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY claim_count) as p75_claims,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY total_cost) as p75_cost,
+            PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY unique_drugs) as p75_drugs
+        FROM member_stats
+    ),
+    scored AS (
+        SELECT 
+            ms.member_id,
+            m.first_name || ' ' || m.last_name as member_name,
+            ms.claim_count,
+            ms.total_cost,
+            ms.unique_drugs,
+            ms.avg_days_supply,
+            CASE 
+                WHEN ms.claim_count > p.p75_claims THEN 2
+                WHEN ms.claim_count > (p.p75_claims * 0.5) THEN 1
+                ELSE 0
+            END +
+            CASE 
+                WHEN ms.total_cost > p.p75_cost THEN 2
+                WHEN ms.total_cost > (p.p75_cost * 0.5) THEN 1
+                ELSE 0
+            END +
+            CASE 
+                WHEN ms.unique_drugs > p.p75_drugs THEN 2
+                WHEN ms.unique_drugs > (p.p75_drugs * 0.5) THEN 1
+                ELSE 0
+            END as risk_score
+        FROM member_stats ms
+        JOIN members m ON ms.member_id = m.id
+        CROSS JOIN percentiles p
+        WHERE m.is_active = true
+    )
+    SELECT 
+        ROW_NUMBER() OVER (ORDER BY risk_score DESC, total_cost DESC, member_id) as rank,
+        scored.*
+    FROM scored
+"""
+
+
+def average(total, count):
+    """Decimal mean so every engine rounds the same exact value"""
+    return float(Decimal(total) / count) if count else 0
+
+
+def trend_point(bucket, claims, cost, moving_claims, moving_cost, frame_rows, running_total, cost_rank):
+    return {
+        'date': bucket.isoformat(),
+        'claims': int(claims),
+        'cost': float(cost),
+        'moving_avg_claims': round(average(moving_claims, frame_rows), 2),
+        'moving_avg_cost': round(average(moving_cost, frame_rows), 2),
+        'running_total': float(running_total),
+        'cost_rank': int(cost_rank)
+    }
 
 
 class AnalyticsService:
     """Service for complex analytics queries"""
     
     @staticmethod
-    def get_cost_trends_with_window_functions(days=90):
+    def get_dashboard_summary(start_date, top_n=10):
         """
-        Use PostgreSQL window functions to calculate running totals and ranks
+        Totals, generic vs brand, top drugs and status breakdown from one
+        GROUPING SETS pass over the daily rollup. A single statement reads a
+        single snapshot, so the four sections always agree with each other.
         """
-        start_date = datetime.utcnow().date() - timedelta(days=days)
+        query = text("""
+            WITH window_stats AS (
+                SELECT 
+                    s.drug_id,
+                    s.status,
+                    d.is_generic,
+                    s.claim_count,
+                    s.total_cost
+                FROM claim_daily_stats s
+                JOIN drugs d ON d.id = s.drug_id
+                WHERE s.fill_date >= :start_date
+            ),
+            grouped AS (
+                SELECT 
+                    GROUPING(is_generic, drug_id, status) as grouping_set,
+                    is_generic,
+                    drug_id,
+                    status,
+                    SUM(claim_count) as claim_count,
+                    SUM(total_cost) as total_cost,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY GROUPING(is_generic, drug_id, status)
+                        ORDER BY SUM(total_cost) DESC, drug_id
+                    ) as cost_rank
+                FROM window_stats
+                GROUP BY GROUPING SETS ((), (is_generic), (drug_id, is_generic), (status))
+                HAVING SUM(claim_count) > 0
+            )
+            SELECT 
+                g.grouping_set,
+                g.is_generic,
+                g.drug_id,
+                d.name,
+                g.status,
+                g.claim_count,
+                g.total_cost,
+                g.cost_rank
+            FROM grouped g
+            LEFT JOIN drugs d ON g.grouping_set = :drug_set AND d.id = g.drug_id
+            WHERE g.grouping_set <> :drug_set OR g.cost_rank <= :top_n
+        """)
+        
+        # GROUPING() bitmask: a bit is set for each column NOT grouped (is_generic=4, drug_id=2, status=1)
+        total_set, generic_set, drug_set, status_set = 7, 3, 1, 6
+        
+        rows = db.session.execute(query, {
+            'start_date': start_date,
+            'drug_set': drug_set,
+            'top_n': top_n
+        }).all()
+        
+        total_claims, total_cost = 0, Decimal('0')
+        generic_vs_brand, top_drugs, status_breakdown = [], [], []
+        
+        for row in rows:
+            if row.grouping_set == total_set:
+                total_claims, total_cost = int(row.claim_count), row.total_cost
+            elif row.grouping_set == generic_set:
+                generic_vs_brand.append({
+                    'type': 'Generic' if row.is_generic else 'Brand',
+                    'claims': int(row.claim_count),
+                    'cost': float(row.total_cost)
+                })
+            elif row.grouping_set == drug_set:
+                top_drugs.append((row.cost_rank, {
+                    'name': row.name,
+                    'is_generic': row.is_generic,
+                    'claims': int(row.claim_count),
+                    'total_cost': float(row.total_cost)
+                }))
+            elif row.grouping_set == status_set:
+                status_breakdown.append({'status': row.status, 'count': int(row.claim_count)})
+        
+        return {
+            'summary': {
+                'total_claims': total_claims,
+                'total_cost': float(total_cost),
+                'average_cost': average(total_cost, total_claims)
+            },
+            'generic_vs_brand': sorted(generic_vs_brand, key=lambda r: r['type']),
+            'top_drugs': [drug for _, drug in sorted(top_drugs, key=lambda r: r[0])],
+            'status_breakdown': sorted(status_breakdown, key=lambda r: r['status'])
+        }
+    
+    @staticmethod
+    def get_cost_trends_with_window_functions(days=90, window=7, granularity='day', end_date=None):
+        """
+        Use PostgreSQL window functions to calculate moving averages, running totals
+        and ranks over a gap-filled series: generate_series emits every bucket in the
+        range so empty days/weeks/months count as zero and the moving window always
+        spans `window` calendar buckets, not `window` rows that happen to exist.
+        """
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
+        if window < 1:
+            raise ValueError('window must be at least 1')
+        
+        end_date = end_date or datetime.utcnow().date()
+        start_date = end_date - timedelta(days=days)
         
-        # Raw SQL with window functions
         query = text("""
+            WITH buckets AS (
+                SELECT generate_series(
+                    date_trunc(:granularity, CAST(:start_date AS date)),
+                    date_trunc(:granularity, CAST(:end_date AS date)),
+                    CAST(:step AS interval)
+                )::date as bucket
+            ),
+            totals AS (
+                SELECT 
+                    date_trunc(:granularity, fill_date)::date as bucket,
+                    SUM(claim_count) as claims,
+                    SUM(total_cost) as cost
+                FROM claim_daily_stats
+                WHERE fill_date >= date_trunc(:granularity, CAST(:start_date AS date))
+                  AND fill_date <= :end_date
+                GROUP BY 1
+            ),
+            series AS (
+                SELECT 
+                    b.bucket,
+                    COALESCE(t.claims, 0) as claims,
+                    COALESCE(t.cost, 0) as cost
+                FROM buckets b
+                LEFT JOIN totals t ON t.bucket = b.bucket
+            )
             SELECT 
-                fill_date,
-                COUNT(*) as daily_claims,
-                SUM(total_cost) as daily_cost,
-                SUM(SUM(total_cost)) OVER (
-                    ORDER BY fill_date 
+                bucket,
+                claims,
+                cost,
+                SUM(claims) OVER moving as moving_claims,
+                SUM(cost) OVER moving as moving_cost,
+                COUNT(*) OVER moving as frame_rows,
+                SUM(cost) OVER (
+                    ORDER BY bucket 
                     ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
                 ) as running_total,
-                AVG(SUM(total_cost)) OVER (
-                    ORDER BY fill_date 
-                    ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-                ) as moving_avg_7day,
-                RANK() OVER (ORDER BY SUM(total_cost) DESC) as cost_rank
-            FROM claims
-            WHERE fill_date >= :start_date
-            GROUP BY fill_date
-            ORDER BY fill_date
+                RANK() OVER (ORDER BY cost DESC) as cost_rank
+            FROM series
+            WINDOW moving AS (ORDER BY bucket ROWS BETWEEN :preceding PRECEDING AND CURRENT ROW)
+            ORDER BY bucket
         """)
         
-        result = db.session.execute(query, {'start_date': start_date})
+        result = db.session.execute(query, {
+            'granularity': granularity,
+            'step': f'1 {granularity}',
+            'start_date': start_date,
+            'end_date': end_date,
+            'preceding': window - 1
+        })
         
         return [
-            {
-                'date': row.fill_date.isoformat(),
-                'daily_claims': row.daily_claims,
-                'daily_cost': float(row.daily_cost),
-                'running_total': float(row.running_total),
-                'moving_avg_7day': float(row.moving_avg_7day),
-                'cost_rank': row.cost_rank
-            }
+            trend_point(row.bucket, row.claims, row.cost, row.moving_claims, row.moving_cost,
+                        row.frame_rows, row.running_total, row.cost_rank)
             for row in result
         ]
     
     @staticmethod
-    def find_duplicate_claims():
+    def get_generic_savings(start_date, min_savings=0, therapeutic_class=None, limit=20):
         """
-        Find potential duplicate claims using CTE pattern
+        Brand claims with a generic equivalent, priced against the generic's average
+        cost. Brand and generic averages come from the daily rollup in one statement;
+        the grand total is a window over every qualifying row, taken before LIMIT.
         """
         query = text("""
-            WITH claim_groups AS (
+            WITH brand AS (
                 SELECT 
-                    member_id,
-                    drug_id,
-                    fill_date,
-                    COUNT(*) as claim_count,
-                    ARRAY_AGG(claim_number) as claim_numbers,
-                    SUM(total_cost) as total_cost
-                FROM claims
-                WHERE fill_date >= CURRENT_DATE - INTERVAL '90 days'
-                GROUP BY member_id, drug_id, fill_date
-                HAVING COUNT(*) > 1
+                    d.name as brand_name,
+                    d.generic_name,
+                    SUM(s.claim_count) as brand_claims,
+                    SUM(s.total_cost) / SUM(s.claim_count) as avg_brand_cost
+                FROM claim_daily_stats s
+                JOIN drugs d ON d.id = s.drug_id
+                WHERE s.fill_date >= :start_date
+                  AND d.is_generic = false
+                  AND d.generic_name IS NOT NULL
+                  AND (CAST(:therapeutic_class AS text) IS NULL OR d.therapeutic_class = :therapeutic_class)
+                GROUP BY d.name, d.generic_name
+                HAVING SUM(s.claim_count) > 0
+            ),
+            generic AS (
+                SELECT 
+                    d.generic_name,
+                    SUM(s.total_cost) / SUM(s.claim_count) as avg_generic_cost
+                FROM claim_daily_stats s
+                JOIN drugs d ON d.id = s.drug_id
+                WHERE s.fill_date >= :start_date
+                  AND d.is_generic = true
+                  AND d.generic_name IN (SELECT generic_name FROM brand)
+                GROUP BY d.generic_name
+                HAVING SUM(s.claim_count) > 0
+            ),
+            savings AS (
+                SELECT 
+                    b.brand_name,
+                    b.generic_name,
+                    b.brand_claims,
+                    b.avg_brand_cost,
+                    g.avg_generic_cost,
+                    b.avg_brand_cost - g.avg_generic_cost as savings_per_claim,
+                    (b.avg_brand_cost - g.avg_generic_cost) * b.brand_claims as potential_savings
+                FROM brand b
+                JOIN generic g ON g.generic_name = b.generic_name
             )
             SELECT 
-                cg.member_id,
-                m.first_name || ' ' || m.last_name as member_name,
-                d.name as drug_name,
-                cg.fill_date,
-                cg.claim_count,
-                cg.claim_numbers,
-                cg.total_cost
-            FROM claim_groups cg
-            JOIN members m ON cg.member_id = m.id
-            JOIN drugs d ON cg.drug_id = d.id
-            ORDER BY cg.total_cost DESC
+                *,
+                COUNT(*) OVER () as opportunity_count,
+                SUM(potential_savings) OVER () as total_potential_savings
+            FROM savings
+            WHERE potential_savings > 0
+              AND potential_savings >= :min_savings
+            ORDER BY potential_savings DESC, brand_name
+            LIMIT :limit
         """)
         
-        result = db.session.execute(query)
+        rows = db.session.execute(query, {
+            'start_date': start_date,
+            'min_savings': min_savings,
+            'therapeutic_class': therapeutic_class,
+            'limit': limit
+        }).all()
+        
+        return {
+            'total_potential_savings': round(float(rows[0].total_potential_savings), 2) if rows else 0.0,
+            'opportunity_count': rows[0].opportunity_count if rows else 0,
+            'opportunities': [
+                {
+                    'brand_name': row.brand_name,
+                    'generic_name': row.generic_name,
+                    'brand_claims': int(row.brand_claims),
+                    'avg_brand_cost': round(float(row.avg_brand_cost), 2),
+                    'avg_generic_cost': round(float(row.avg_generic_cost), 2),
+                    'potential_savings': round(float(row.potential_savings), 2),
+                    'savings_per_claim': round(float(row.savings_per_claim), 2)
+                }
+                for row in rows
+            ]
+        }
+    
+    @staticmethod
+    def get_high_utilizers(start_date, min_claims=5, limit=20):
+        """Members with at least min_claims claims since start_date, by total cost"""
+        # count() rather than count(claims.id): the same on an inner join, and it
+        # keeps the claims side an index-only scan of idx_claim_date_covering
+        rows = db.session.query(
+            Member.id,
+            Member.member_id,
+            Member.first_name,
+            Member.last_name,
+            func.count().label('claim_count'),
+            func.sum(Claim.total_cost).label('total_cost')
+        ).join(Claim).filter(
+            Claim.fill_date >= start_date
+        ).group_by(
+            Member.id, Member.member_id, Member.first_name, Member.last_name
+        ).having(
+            func.count() >= min_claims
+        ).order_by(
+            func.sum(Claim.total_cost).desc(), Member.id
+        ).limit(limit).all()
+        
+        return [
+            {
+                'member_id': row.member_id,
+                'name': f"{row.first_name} {row.last_name}",
+                'claim_count': row.claim_count,
+                'total_cost': float(row.total_cost),
+                'avg_cost_per_claim': average(row.total_cost, row.claim_count)
+            } for row in rows
+        ]
+    
+    @staticmethod
+    def get_pharmacy_performance(start_date, limit=20):
+        """Busiest pharmacies since start_date with cost and denial rate"""
+        rows = db.session.query(
+            Pharmacy.name,
+            Pharmacy.chain_name,
+            Pharmacy.network_tier,
+            func.count().label('claim_count'),
+            func.sum(Claim.total_cost).label('total_cost'),
+            func.count(case((Claim.status == 'denied', 1))).label('denied_count')
+        ).join(Claim).filter(
+            Claim.fill_date >= start_date
+        ).group_by(
+            Pharmacy.id, Pharmacy.name, Pharmacy.chain_name, Pharmacy.network_tier
+        ).order_by(
+            func.count().desc(), Pharmacy.id
+        ).limit(limit).all()
+        
+        return [
+            {
+                'name': row.name,
+                'chain': row.chain_name,
+                'network_tier': row.network_tier,
+                'claims': row.claim_count,
+                'total_cost': float(row.total_cost),
+                'avg_cost': average(row.total_cost, row.claim_count),
+                'denied_claims': row.denied_count,
+                'denial_rate': round((row.denied_count / row.claim_count * 100), 2) if row.claim_count > 0 else 0
+            } for row in rows
+        ]
+    
+    @staticmethod
+    def get_therapeutic_class_breakdown(start_date):
+        """Claims, cost and distinct members per therapeutic class since start_date"""
+        rows = db.session.query(
+            Drug.therapeutic_class,
+            func.count().label('claim_count'),
+            func.sum(Claim.total_cost).label('total_cost'),
+            func.count(func.distinct(Claim.member_id)).label('unique_members')
+        ).join(Drug).filter(
+            Claim.fill_date >= start_date,
+            Drug.therapeutic_class.isnot(None)
+        ).group_by(Drug.therapeutic_class).order_by(
+            func.sum(Claim.total_cost).desc(), Drug.therapeutic_class.collate('C')
+        ).all()
+        
+        return [
+            {
+                'class': row.therapeutic_class,
+                'claims': row.claim_count,
+                'total_cost': float(row.total_cost),
+                'unique_members': row.unique_members,
+                'avg_cost_per_claim': average(row.total_cost, row.claim_count)
+            } for row in rows
+        ]
+    
+    @staticmethod
+    def find_duplicate_claims(lookback_days=90):
+        """
+        Find potential duplicate claims using CTE pattern
+        """
+        query = text(f"""
+            SELECT * FROM ({DUPLICATE_CLAIMS_SQL}) duplicates
+            ORDER BY rank
+        """)
+        
+        result = db.session.execute(query, {'lookback_days': lookback_days})
         
         return [
             {
@@ -98,60 +473,17 @@ class AnalyticsService:
         ]
     
     @staticmethod
-    def calculate_member_risk_score():
+    def calculate_member_risk_score(lookback_days=180, limit=50):
         """
         Calculate risk scores for members based on utilization patterns
         """
-        query = text("""
-            WITH member_stats AS (
-                SELECT 
-                    member_id,
-                    COUNT(*) as claim_count,
-                    SUM(total_cost) as total_cost,
-                    COUNT(DISTINCT drug_id) as unique_drugs,
-                    AVG(days_supply) as avg_days_supply
-                FROM claims
-                WHERE fill_date >= CURRENT_DATE - INTERVAL '180 days'
-                GROUP BY member_id
-            ),
-            percentiles AS (
-                SELECT 
-                    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY claim_count) as p75_claims,
-                    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY total_cost) as p75_cost,
-                    PERCENTILE_CONT(0.75) WITHIN GROUP (ORDER BY unique_drugs) as p75_drugs
-                FROM member_stats
-            )
-            SELECT 
-                ms.member_id,
-                m.first_name || ' ' || m.last_name as member_name,
-                ms.claim_count,
-                ms.total_cost,
-                ms.unique_drugs,
-                ms.avg_days_supply,
-                CASE 
-                    WHEN ms.claim_count > p.p75_claims THEN 2
-                    WHEN ms.claim_count > (p.p75_claims * 0.5) THEN 1
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN ms.total_cost > p.p75_cost THEN 2
-                    WHEN ms.total_cost > (p.p75_cost * 0.5) THEN 1
-                    ELSE 0
-                END +
-                CASE 
-                    WHEN ms.unique_drugs > p.p75_drugs THEN 2
-                    WHEN ms.unique_drugs > (p.p75_drugs * 0.5) THEN 1
-                    ELSE 0
-                END as risk_score
-            FROM member_stats ms
-            JOIN members m ON ms.member_id = m.id
-            CROSS JOIN percentiles p
-            WHERE m.is_active = true
-            ORDER BY risk_score DESC, ms.total_cost DESC
-            LIMIT 50
+        query = text(f"""
+            SELECT * FROM ({MEMBER_RISK_SQL}) scores
+            WHERE rank <= :limit
+            ORDER BY rank
         """)
         
-        result = db.session.execute(query)
+        result = db.session.execute(query, {'lookback_days': lookback_days, 'limit': limit})
         
         return [
             {
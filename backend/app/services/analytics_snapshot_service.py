@@ -0,0 +1,143 @@
+from app import db
+from app.models import AnalyticsSnapshot, MemberRiskScore, DuplicateClaimGroup
+from app.services.analytics_service import DUPLICATE_CLAIMS_SQL, MEMBER_RISK_SQL
+from flask import current_app
+from sqlalchemy import text
+from datetime import datetime, timedelta
+import threading
+
+
+SNAPSHOT_REPORTS = {
+    'risk_scores': {
+        'model': MemberRiskScore,
+        'sql': MEMBER_RISK_SQL,
+        'columns': ('rank', 'member_id', 'member_name', 'claim_count', 'total_cost',
+                    'unique_drugs', 'avg_days_supply', 'risk_score'),
+        'default_lookback': 180
+    },
+    'duplicates': {
+        'model': DuplicateClaimGroup,
+        'sql': DUPLICATE_CLAIMS_SQL,
+        'columns': ('rank', 'member_id', 'member_name', 'drug_name', 'fill_date',
+                    'claim_count', 'claim_numbers', 'total_cost'),
+        'default_lookback': 90
+    },
+}
+
+
+class AnalyticsSnapshotService:
+    """
+    Materialized analytics reports. Each refresh writes a complete ranked result
+    set under a new snapshot id in one transaction and drops the previous one, so
+    readers always page through a consistent, precomputed snapshot.
+    """
+
+    _refreshing = set()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def latest(kind, lookback_days):
+        """Most recent successful snapshot for a report and lookback window"""
+        return AnalyticsSnapshot.query.filter_by(
+            kind=kind,
+            lookback_days=lookback_days,
+            status='ready'
+        ).order_by(AnalyticsSnapshot.computed_at.desc()).first()
+
+    @staticmethod
+    def is_stale(snapshot, max_age):
+        return snapshot.computed_at < datetime.utcnow() - timedelta(seconds=max_age)
+
+    @staticmethod
+    def refresh(kind, lookback_days):
+        """
+        Recompute a report into a new snapshot. Returns None without doing any
+        work if another process is already refreshing the same report.
+        """
+        report = SNAPSHOT_REPORTS[kind]
+
+        locked = db.session.execute(
+            text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+            {'key': f'analytics_snapshot:{kind}:{lookback_days}'}
+        ).scalar()
+        if not locked:
+            db.session.rollback()
+            return None
+
+        started_at = datetime.utcnow()
+        try:
+            snapshot = AnalyticsSnapshot(kind=kind, lookback_days=lookback_days, status='ready',
+                                         started_at=started_at)
+            db.session.add(snapshot)
+            db.session.flush()
+
+            columns = ', '.join(report['columns'])
+            result = db.session.execute(text(f"""
+                INSERT INTO {report['model'].__tablename__} (snapshot_id, {columns})
+                SELECT :snapshot_id, {columns}
+                FROM ({report['sql']}) report
+            """), {'snapshot_id': snapshot.id, 'lookback_days': lookback_days})
+
+            snapshot.row_count = result.rowcount
+            snapshot.computed_at = datetime.utcnow()
+
+            # Superseded snapshots (and their rows, via ON DELETE CASCADE) go away
+            AnalyticsSnapshot.query.filter(
+                AnalyticsSnapshot.kind == kind,
+                AnalyticsSnapshot.lookback_days == lookback_days,
+                AnalyticsSnapshot.id != snapshot.id
+            ).delete(synchronize_session=False)
+
+            db.session.commit()
+            return snapshot
+        except Exception as e:
+            db.session.rollback()
+            db.session.add(AnalyticsSnapshot(kind=kind, lookback_days=lookback_days, status='failed',
+                                             started_at=started_at, error=str(e)))
+            db.session.commit()
+            raise
+
+    @staticmethod
+    def refresh_async(app, kind, lookback_days):
+        """Start a background refresh unless this process already has one running"""
+        key = (kind, lookback_days)
+        with AnalyticsSnapshotService._lock:
+            if key in AnalyticsSnapshotService._refreshing:
+                return False
+            AnalyticsSnapshotService._refreshing.add(key)
+
+        def run():
+            try:
+                with app.app_context():
+                    try:
+                        AnalyticsSnapshotService.refresh(kind, lookback_days)
+                    except Exception:
+                        app.logger.exception(f'Analytics snapshot refresh failed: {kind} {lookback_days}d')
+                    finally:
+                        db.session.remove()
+            finally:
+                with AnalyticsSnapshotService._lock:
+                    AnalyticsSnapshotService._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f'snapshot-{kind}-{lookback_days}', daemon=True).start()
+        return True
+
+    @staticmethod
+    def get(kind, lookback_days, force=False):
+        """
+        Return (snapshot, refreshing). A fresh snapshot is served as is; a stale or
+        missing one triggers a refresh (in the background unless
+        ANALYTICS_SNAPSHOT_BACKGROUND is off) while the stale copy, if any, is served.
+        """
+        config = current_app.config
+        snapshot = AnalyticsSnapshotService.latest(kind, lookback_days)
+        if snapshot is not None and not force and not AnalyticsSnapshotService.is_stale(
+                snapshot, config.get('ANALYTICS_SNAPSHOT_MAX_AGE', 900)):
+            return snapshot, False
+
+        if not config.get('ANALYTICS_SNAPSHOT_BACKGROUND', True):
+            refreshed = AnalyticsSnapshotService.refresh(kind, lookback_days)
+            return (refreshed, False) if refreshed is not None else (snapshot, True)
+
+        AnalyticsSnapshotService.refresh_async(current_app._get_current_object(), kind, lookback_days)
+        return snapshot, True
@@ -0,0 +1,120 @@
+from app import db
+from app.models import Claim, Member, Drug
+from sqlalchemy import select
+from datetime import date, datetime
+from decimal import Decimal
+import csv
+import io
+import json
+import zlib
+
+
+EXPORT_COLUMNS = (
+    ('id', Claim.id),
+    ('claim_number', Claim.claim_number),
+    ('rx_number', Claim.rx_number),
+    ('member_id', Claim.member_id),
+    ('member_first_name', Member.first_name),
+    ('member_last_name', Member.last_name),
+    ('drug_id', Claim.drug_id),
+    ('ndc', Drug.ndc),
+    ('drug_name', Drug.name),
+    ('is_generic', Drug.is_generic),
+    ('pharmacy_id', Claim.pharmacy_id),
+    ('fill_date', Claim.fill_date),
+    ('quantity', Claim.quantity),
+    ('days_supply', Claim.days_supply),
+    ('refill_number', Claim.refill_number),
+    ('prescriber_npi', Claim.prescriber_npi),
+    ('submitted_amount', Claim.submitted_amount),
+    ('ingredient_cost', Claim.ingredient_cost),
+    ('dispensing_fee', Claim.dispensing_fee),
+    ('plan_paid_amount', Claim.plan_paid_amount),
+    ('member_copay', Claim.member_copay),
+    ('member_coinsurance', Claim.member_coinsurance),
+    ('deductible_applied', Claim.deductible_applied),
+    ('total_cost', Claim.total_cost),
+    ('status', Claim.status),
+    ('rejection_code', Claim.rejection_code),
+    ('submitted_at', Claim.submitted_at),
+    ('processed_at', Claim.processed_at),
+    ('paid_at', Claim.paid_at),
+)
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ClaimExportService:
+    """Constant-memory claim exports streamed from a server-side cursor"""
+
+    @staticmethod
+    def base_query():
+        """Flat Core projection of claims joined to member and drug names (no ORM hydration)"""
+        return select(*[column.label(name) for name, column in EXPORT_COLUMNS]).select_from(
+            Claim
+        ).join(Member, Claim.member_id == Member.id).join(Drug, Claim.drug_id == Drug.id)
+
+    @staticmethod
+    def stream(query, fmt='csv', batch_size=5000, compress=False):
+        """
+        Yield the export as byte chunks, one per fetched batch. Rows are pulled
+        through a server-side cursor (yield_per) so only batch_size rows are in
+        memory at any time; gzip output is produced incrementally as well.
+        """
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+        def emit(text):
+            data = text.encode('utf-8')
+            return compressor.compress(data) if compressor else data
+
+        if fmt == 'csv':
+            chunk = emit(ClaimExportService._csv_rows([[name for name, _ in EXPORT_COLUMNS]]))
+            if chunk:
+                yield chunk
+
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        try:
+            for partition in result.partitions():
+                if fmt == 'csv':
+                    text = ClaimExportService._csv_rows(
+                        [[ClaimExportService._csv_value(v) for v in row] for row in partition]
+                    )
+                else:
+                    text = ''.join(
+                        json.dumps(ClaimExportService._json_row(row), separators=(',', ':')) + '\n'
+                        for row in partition
+                    )
+                chunk = emit(text)
+                if chunk:
+                    yield chunk
+        finally:
+            result.close()
+
+        if compressor:
+            yield compressor.flush()
+
+    @staticmethod
+    def _csv_rows(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _csv_value(value):
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+
+    @staticmethod
+    def _json_row(row):
+        record = {}
+        for key, value in row._mapping.items():
+            if isinstance(value, Decimal):
+                value = float(value)
+            elif isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            record[key] = value
+        return record
@@ -0,0 +1,339 @@
+from app import db
+from app.models import Claim, Member, Drug, Pharmacy
+from app.models.claim import CLAIM_STATUSES
+from app.services.claim_stats_service import ClaimStatsService
+from app.services.accumulator_service import AccumulatorService
+from app.services.duplicate_claim_service import DuplicateClaimService
+from app.services.claim_number_service import ClaimNumberService
+from sqlalchemy import insert, select
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+import csv
+import io
+import json
+
+
+REQUIRED_FIELDS = ('claim_number', 'member_id', 'drug_id', 'pharmacy_id',
+                   'fill_date', 'quantity', 'days_supply', 'total_cost')
+
+TEXT_FIELDS = ('claim_number', 'rx_number', 'prescriber_npi', 'prescriber_name',
+               'status', 'rejection_code', 'rejection_reason')
+INT_FIELDS = ('member_id', 'drug_id', 'pharmacy_id', 'days_supply',
+              'refills_authorized', 'refill_number')
+DECIMAL_FIELDS = ('quantity', 'submitted_amount', 'ingredient_cost', 'dispensing_fee',
+                  'sales_tax', 'plan_paid_amount', 'member_copay', 'member_coinsurance',
+                  'deductible_applied', 'total_cost')
+DATE_FIELDS = ('fill_date', 'service_date')
+BOOL_FIELDS = ('is_generic_substitution', 'requires_prior_auth', 'is_compound', 'is_specialty')
+
+# Column order used for both COPY and the multi-row INSERT fallback
+LOAD_COLUMNS = TEXT_FIELDS + INT_FIELDS + DECIMAL_FIELDS + DATE_FIELDS + BOOL_FIELDS + (
+    'is_duplicate', 'submitted_at', 'created_at', 'updated_at'
+)
+
+# Column limits taken from the model, so a value COPY would refuse rejects only
+# its own record instead of failing the whole chunk
+TEXT_LENGTHS = {field: Claim.__table__.c[field].type.length for field in TEXT_FIELDS}
+DECIMAL_LIMITS = {
+    field: (Claim.__table__.c[field].type.precision, Claim.__table__.c[field].type.scale)
+    for field in DECIMAL_FIELDS
+}
+INT_MIN, INT_MAX = -2 ** 31, 2 ** 31 - 1
+
+TRUE_VALUES = {'true', 't', '1', 'yes', 'y'}
+FALSE_VALUES = {'false', 'f', '0', 'no', 'n'}
+
+CONTENT_TYPES = {
+    'text/csv': 'csv',
+    'application/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+
+class ClaimIngestService:
+    """Bulk claim loading from streamed CSV / NDJSON uploads"""
+
+    @staticmethod
+    def detect_format(mimetype, requested=None):
+        """Resolve the upload format from ?format= or the request content type"""
+        if requested:
+            return requested.lower() if requested.lower() in ('csv', 'ndjson') else None
+        return CONTENT_TYPES.get(mimetype)
+
+    @staticmethod
+    def ingest(stream, fmt, chunk_size=5000, max_errors=1000):
+        """
+        Read records from a binary stream, validate them chunk by chunk with
+        set-based lookups and load the valid rows. Each chunk is committed in its
+        own transaction so memory stays bounded by chunk_size.
+        """
+        report = {
+            'format': fmt,
+            'received': 0,
+            'loaded': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'chunks': 0,
+            'errors': [],
+            'errors_truncated': False
+        }
+
+        def add_error(row_number, claim_number, message):
+            report['rejected'] += 1
+            if len(report['errors']) < max_errors:
+                report['errors'].append({
+                    'row': row_number,
+                    'claim_number': claim_number,
+                    'error': message
+                })
+            else:
+                report['errors_truncated'] = True
+
+        chunk = []
+        for row_number, record, error in ClaimIngestService._iter_records(stream, fmt):
+            report['received'] += 1
+            if error:
+                add_error(row_number, None, error)
+                continue
+            chunk.append((row_number, record))
+            if len(chunk) >= chunk_size:
+                ClaimIngestService._process_chunk(chunk, report, add_error)
+                chunk = []
+
+        if chunk:
+            ClaimIngestService._process_chunk(chunk, report, add_error)
+
+        return report
+
+    @staticmethod
+    def _iter_records(stream, fmt):
+        """Yield (row_number, record, error) tuples without buffering the whole body"""
+        lines = ClaimIngestService._iter_lines(stream)
+
+        if fmt == 'csv':
+            reader = csv.DictReader(lines)
+            for row_number, raw in enumerate(reader, start=1):
+                yield row_number, raw, None
+            return
+
+        row_number = 0
+        for line in lines:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                raw = json.loads(line)
+            except ValueError as e:
+                yield row_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(raw, dict):
+                yield row_number, None, 'Each NDJSON line must be a JSON object'
+                continue
+            yield row_number, raw, None
+
+    @staticmethod
+    def _iter_lines(stream):
+        first = True
+        for line in stream:
+            text = line.decode('utf-8')
+            if first:
+                text = text.lstrip('\ufeff')
+                first = False
+            yield text
+
+    @staticmethod
+    def _parse_record(raw, now):
+        """Coerce one raw record into a claims row, raising ValueError on bad input"""
+        values = {}
+        for key, value in raw.items():
+            if isinstance(value, str):
+                value = value.strip()
+                if value == '':
+                    value = None
+            values[key] = value
+
+        for field in REQUIRED_FIELDS:
+            if values.get(field) is None:
+                raise ValueError(f'Missing required field: {field}')
+
+        row = {}
+        for field in TEXT_FIELDS:
+            value = values.get(field)
+            row[field] = str(value) if value is not None else None
+            length = TEXT_LENGTHS[field]
+            if length is not None and row[field] is not None and len(row[field]) > length:
+                raise ValueError(f'{field} exceeds {length} characters')
+
+        for field in INT_FIELDS:
+            value = values.get(field)
+            try:
+                row[field] = int(value) if value is not None else None
+            except (TypeError, ValueError):
+                raise ValueError(f'Invalid integer for {field}: {value!r}')
+            if row[field] is not None and not INT_MIN <= row[field] <= INT_MAX:
+                raise ValueError(f'{field} is out of range')
+
+        for field in DECIMAL_FIELDS:
+            value = values.get(field)
+            try:
+                row[field] = Decimal(str(value)) if value is not None else None
+            except InvalidOperation:
+                raise ValueError(f'Invalid number for {field}: {value!r}')
+            if row[field] is not None and not row[field].is_finite():
+                raise ValueError(f'Invalid number for {field}: {value!r}')
+            # Stored rounded to `scale` places, so the bound allows for rounding up
+            precision, scale = DECIMAL_LIMITS[field]
+            limit = Decimal(10) ** (precision - scale)
+            if row[field] is not None and abs(row[field]) >= limit - Decimal(5).scaleb(-scale - 1):
+                raise ValueError(f'{field} must be less than {limit:,}')
+
+        for field in DATE_FIELDS:
+            value = values.get(field)
+            try:
+                row[field] = datetime.strptime(str(value), '%Y-%m-%d').date() if value is not None else None
+            except ValueError:
+                raise ValueError(f'Invalid date for {field}: {value!r} (expected YYYY-MM-DD)')
+
+        for field in BOOL_FIELDS:
+            value = values.get(field)
+            if value is None or isinstance(value, bool):
+                row[field] = bool(value)
+            elif str(value).lower() in TRUE_VALUES:
+                row[field] = True
+            elif str(value).lower() in FALSE_VALUES:
+                row[field] = False
+            else:
+                raise ValueError(f'Invalid boolean for {field}: {value!r}')
+
+        if row['refill_number'] is None:
+            row['refill_number'] = 0
+        if row['submitted_amount'] is None:
+            row['submitted_amount'] = row['total_cost']
+        if row['status'] is None:
+            row['status'] = 'pending'
+
+        if row['status'] not in CLAIM_STATUSES:
+            raise ValueError(f"Invalid status: {row['status']}")
+        if row['quantity'] <= 0:
+            raise ValueError('quantity must be greater than 0')
+        if row['days_supply'] <= 0:
+            raise ValueError('days_supply must be greater than 0')
+        if row['total_cost'] < 0:
+            raise ValueError('total_cost must not be negative')
+
+        row['is_duplicate'] = False
+        row['submitted_at'] = now
+        row['created_at'] = now
+        row['updated_at'] = now
+        return row
+
+    @staticmethod
+    def _process_chunk(chunk, report, add_error):
+        """Validate a chunk against the database in a handful of queries and load it"""
+        report['chunks'] += 1
+        now = datetime.utcnow()
+
+        parsed = []
+        seen_numbers = set()
+        for row_number, raw in chunk:
+            claim_number = raw.get('claim_number')
+            try:
+                row = ClaimIngestService._parse_record(raw, now)
+            except ValueError as e:
+                add_error(row_number, claim_number, str(e))
+                continue
+            if row['claim_number'] in seen_numbers:
+                add_error(row_number, row['claim_number'], 'Duplicate claim number in upload')
+                continue
+            seen_numbers.add(row['claim_number'])
+            parsed.append((row_number, row))
+
+        if not parsed:
+            return
+
+        rows = [row for _, row in parsed]
+        members = ClaimIngestService._existing_ids(Member.id, {r['member_id'] for r in rows})
+        drugs = ClaimIngestService._existing_ids(Drug.id, {r['drug_id'] for r in rows})
+        pharmacies = ClaimIngestService._existing_ids(Pharmacy.id, {r['pharmacy_id'] for r in rows})
+
+        checked = []
+        for row_number, row in parsed:
+            if row['member_id'] not in members:
+                add_error(row_number, row['claim_number'], 'Member not found')
+            elif row['drug_id'] not in drugs:
+                add_error(row_number, row['claim_number'], 'Drug not found')
+            elif row['pharmacy_id'] not in pharmacies:
+                add_error(row_number, row['claim_number'], 'Pharmacy not found')
+            else:
+                checked.append((row_number, row))
+
+        # Reserved in this chunk's transaction, so a number another upload or
+        # request is writing concurrently is rejected here, one row at a time
+        reserved = ClaimNumberService.reserve([row for _, row in checked])
+        valid = []
+        for row_number, row in checked:
+            if row['claim_number'] in reserved:
+                valid.append((row_number, row))
+            else:
+                add_error(row_number, row['claim_number'], 'Claim number already exists')
+
+        if not valid:
+            db.session.rollback()
+            return
+
+        try:
+            rows = [row for _, row in valid]
+            duplicates = DuplicateClaimService.mark_rows(rows)
+            ClaimIngestService._load(rows)
+            ClaimStatsService.record_rows(rows)
+            AccumulatorService.record_rows(rows)
+            db.session.commit()
+            report['loaded'] += len(valid)
+            report['duplicates'] += duplicates
+        except Exception as e:
+            db.session.rollback()
+            for row_number, row in valid:
+                add_error(row_number, row['claim_number'], f'Chunk load failed: {e}')
+
+    @staticmethod
+    def _existing_ids(column, values):
+        if not values:
+            return set()
+        return set(db.session.execute(select(column).where(column.in_(values))).scalars())
+
+    @staticmethod
+    def _load(rows):
+        """Load rows with COPY on psycopg2 connections, multi-row INSERT otherwise"""
+        connection = db.session.connection()
+
+        if connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([ClaimIngestService._copy_value(row[column]) for column in LOAD_COLUMNS])
+            buffer.seek(0)
+
+            cursor = connection.connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {Claim.__tablename__} ({', '.join(LOAD_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            finally:
+                cursor.close()
+        else:
+            db.session.execute(insert(Claim.__table__), rows)
+
+    @staticmethod
+    def _copy_value(value):
+        if value is None:
+            return None
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, datetime):
+            return value.isoformat(sep=' ')
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
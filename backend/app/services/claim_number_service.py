@@ -0,0 +1,25 @@
+from app import db
+from app.models import ClaimNumber
+from sqlalchemy.dialects.postgresql import insert
+
+
+class ClaimNumberService:
+    """Global claim number uniqueness, enforced by the claim_numbers primary key"""
+
+    @staticmethod
+    def reserve(rows):
+        """
+        Register the claim_number / fill_date of each row in the current
+        transaction, skipping numbers already on file. A number another open
+        transaction is registering waits for that transaction to end, so two
+        writers can never both take it; numbers are taken in sorted order so
+        overlapping batches cannot deadlock. Returns the claim numbers
+        reserved; rows missing from it must not be written.
+        """
+        if not rows:
+            return set()
+        stmt = insert(ClaimNumber.__table__).values([
+            {'claim_number': row['claim_number'], 'fill_date': row['fill_date']}
+            for row in sorted(rows, key=lambda row: row['claim_number'])
+        ]).on_conflict_do_nothing(index_elements=['claim_number']).returning(ClaimNumber.claim_number)
+        return set(db.session.execute(stmt).scalars())
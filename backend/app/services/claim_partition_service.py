@@ -0,0 +1,71 @@
+from app import db
+from app.models import Claim
+from app.services.claim_stats_service import ClaimStatsService
+from app.services.accumulator_service import AccumulatorService
+from app.services.columnar_engine import claim_store
+from app.utils.cache import cache
+from app.utils.partitions import (add_months, month_start, create_default_partition, ensure_partitions,
+                                  list_partitions, partitions_before, detach_partition)
+from flask import current_app
+from sqlalchemy import text
+from datetime import date
+
+
+class ClaimPartitionService:
+    """Keeps the monthly partitions of claims ahead of incoming fill dates"""
+
+    @staticmethod
+    def maintain(months_ahead=None):
+        """
+        Create any missing partitions from the current month through
+        months_ahead months out (CLAIM_PARTITION_MONTHS_AHEAD). Safe to run
+        repeatedly; returns the names of the partitions created.
+        """
+        if months_ahead is None:
+            months_ahead = current_app.config.get('CLAIM_PARTITION_MONTHS_AHEAD', 3)
+        table = Claim.__tablename__
+        today = date.today()
+
+        connection = db.session.connection()
+        create_default_partition(connection, table)
+        created = ensure_partitions(connection, table, today, add_months(today, months_ahead))
+        db.session.commit()
+        return created
+
+    @staticmethod
+    def detach(before, drop=False):
+        """
+        Detach the monthly partitions that end on or before the first of
+        before's month, e.g. once they have been archived. Detached tables keep
+        their rows (queryable by name) unless drop=True; claim numbers stay
+        reserved either way.
+
+        The claims leave claim_daily_stats and member_accumulators in the same
+        transaction, so the rollups keep matching claims and reconciliation
+        reports no drift. Other processes' in-memory analytics engines pick
+        the change up at their next full reload (ANALYTICS_ENGINE_RELOAD_INTERVAL),
+        and their cached responses at CACHE_DEFAULT_TTL unless CACHE_BACKEND=redis.
+        """
+        connection = db.session.connection()
+        table = Claim.__tablename__
+        detached = []
+        for name, month in partitions_before(connection, table, month_start(before)):
+            # Hold off writes to the month between subtracting it and detaching it
+            connection.execute(text(f'LOCK TABLE {name} IN SHARE MODE'))
+            ClaimStatsService.remove_range(month, add_months(month, 1))
+            AccumulatorService.remove_range(month, add_months(month, 1))
+            detach_partition(connection, table, name, drop)
+            detached.append(name)
+        db.session.commit()
+
+        if detached:
+            cache.invalidate('claims')
+            claim_store.invalidate()
+        return detached
+
+    @staticmethod
+    def partitions():
+        return [
+            {'name': row.name, 'bound': row.bound}
+            for row in list_partitions(db.session.connection(), Claim.__tablename__)
+        ]
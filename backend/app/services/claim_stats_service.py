@@ -0,0 +1,147 @@
+from app import db
+from app.models import ClaimDailyStat
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+from decimal import Decimal
+
+
+ROLLUP_KEY = ('fill_date', 'drug_id', 'pharmacy_id', 'status')
+ROLLUP_AMOUNTS = ('total_cost', 'plan_paid_amount', 'member_copay')
+
+
+def _money(value):
+    if value is None:
+        return Decimal('0')
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class ClaimStatsService:
+    """Incremental maintenance of the claim_daily_stats rollup"""
+    
+    @staticmethod
+    def snapshot(claim):
+        """Capture the rollup-relevant values of a claim before or after a change"""
+        if claim is None:
+            return None
+        values = {key: getattr(claim, key) for key in ROLLUP_KEY}
+        for amount in ROLLUP_AMOUNTS:
+            values[amount] = _money(getattr(claim, amount))
+        return values
+    
+    @staticmethod
+    def record_change(before=None, after=None):
+        """
+        Apply the difference between two claim snapshots to the rollup inside the
+        caller's transaction. Pass before=None for a new claim.
+        """
+        ClaimStatsService.record_changes([(before, after)])
+    
+    @staticmethod
+    def record_changes(changes):
+        """Apply many (before, after) snapshot pairs to the rollup in one upsert"""
+        deltas = {}
+        for before, after in changes:
+            ClaimStatsService._accumulate(deltas, before, -1)
+            ClaimStatsService._accumulate(deltas, after, 1)
+        ClaimStatsService._apply(deltas)
+    
+    @staticmethod
+    def record_rows(rows):
+        """Add a batch of newly inserted claim rows (dicts) to the rollup in one upsert"""
+        deltas = {}
+        for row in rows:
+            ClaimStatsService._accumulate(deltas, {
+                **{key: row[key] for key in ROLLUP_KEY},
+                **{amount: _money(row.get(amount)) for amount in ROLLUP_AMOUNTS}
+            }, 1)
+        ClaimStatsService._apply(deltas)
+    
+    @staticmethod
+    def remove_range(start_date, end_date):
+        """
+        Take claims with start_date <= fill_date < end_date out of the rollup
+        inside the caller's transaction, e.g. before their partition is
+        detached. Rollup rows are per fill date, so that is a range delete.
+        """
+        db.session.execute(text(
+            'DELETE FROM claim_daily_stats WHERE fill_date >= :start_date AND fill_date < :end_date'
+        ), {'start_date': start_date, 'end_date': end_date})
+    
+    @staticmethod
+    def _accumulate(deltas, values, sign):
+        if values is None:
+            return
+        key = tuple(values[k] for k in ROLLUP_KEY)
+        entry = deltas.setdefault(key, {'claim_count': 0, **{a: Decimal('0') for a in ROLLUP_AMOUNTS}})
+        entry['claim_count'] += sign
+        for amount in ROLLUP_AMOUNTS:
+            entry[amount] += sign * values[amount]
+    
+    @staticmethod
+    def _apply(deltas):
+        now = datetime.utcnow()
+        rows = []
+        # Sorted keys give concurrent writers a consistent lock order
+        for key in sorted(deltas):
+            entry = deltas[key]
+            if entry['claim_count'] == 0 and not any(entry[a] for a in ROLLUP_AMOUNTS):
+                continue
+            rows.append({**dict(zip(ROLLUP_KEY, key)), **entry, 'updated_at': now})
+        
+        if not rows:
+            return
+        
+        table = ClaimDailyStat.__table__
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_KEY),
+            set_={
+                'claim_count': table.c.claim_count + stmt.excluded.claim_count,
+                'total_cost': table.c.total_cost + stmt.excluded.total_cost,
+                'plan_paid_amount': table.c.plan_paid_amount + stmt.excluded.plan_paid_amount,
+                'member_copay': table.c.member_copay + stmt.excluded.member_copay,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+    
+    @staticmethod
+    def rebuild(start_date=None, end_date=None):
+        """
+        Recompute the rollup from claims, optionally for a fill_date range only.
+        Concurrent claim writes block on the table lock until the rebuild commits.
+        """
+        conditions = []
+        params = {}
+        if start_date:
+            conditions.append('fill_date >= :start_date')
+            params['start_date'] = start_date
+        if end_date:
+            conditions.append('fill_date <= :end_date')
+            params['end_date'] = end_date
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        db.session.execute(text('LOCK TABLE claim_daily_stats IN EXCLUSIVE MODE'))
+        db.session.execute(text(f'DELETE FROM claim_daily_stats {where}'), params)
+        result = db.session.execute(text(f"""
+            INSERT INTO claim_daily_stats (
+                fill_date, drug_id, pharmacy_id, status,
+                claim_count, total_cost, plan_paid_amount, member_copay, updated_at
+            )
+            SELECT 
+                fill_date,
+                drug_id,
+                pharmacy_id,
+                status,
+                COUNT(*),
+                SUM(total_cost),
+                COALESCE(SUM(plan_paid_amount), 0),
+                COALESCE(SUM(member_copay), 0),
+                NOW()
+            FROM claims
+            {where}
+            GROUP BY fill_date, drug_id, pharmacy_id, status
+        """), params)
+        db.session.commit()
+        return result.rowcount
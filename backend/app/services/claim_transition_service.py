@@ -0,0 +1,150 @@
+from app import db
+from app.models.claim import CHANGE_XID_SQL
+from app.services.accumulator_service import ACCUMULATING_STATUSES, ACCUMULATOR_AMOUNTS
+from app.services.claim_stats_service import ROLLUP_AMOUNTS
+from sqlalchemy import text
+from datetime import datetime
+
+
+# Target status -> statuses a claim may move from
+ALLOWED_TRANSITIONS = {
+    'approved': ('pending',),
+    'denied': ('pending',),
+    'paid': ('approved',),
+    'reversed': ('pending', 'approved', 'paid'),
+}
+
+REMITTANCE_AMOUNTS = ('total_cost', 'plan_paid_amount', 'member_copay', 'member_coinsurance',
+                      'deductible_applied')
+
+
+class ClaimTransitionService:
+    """Set-based claim status changes, e.g. the weekly payment run"""
+
+    @staticmethod
+    def transition(to_status, claim_ids=None, pharmacy_ids=None, through_date=None):
+        """
+        Move every matching claim to to_status in one statement: lock the rows,
+        UPDATE ... RETURNING them, fold the returned rows into claim_daily_stats
+        and member_accumulators, and aggregate a per-pharmacy summary, all inside
+        the caller's transaction. Every claim in the run gets the same timestamp.
+        """
+        if to_status not in ALLOWED_TRANSITIONS:
+            raise ValueError(f'Cannot bulk-transition claims to {to_status!r}')
+
+        now = datetime.utcnow()
+        params = {
+            'to_status': to_status,
+            'from_statuses': list(ALLOWED_TRANSITIONS[to_status]),
+            'accumulating': list(ACCUMULATING_STATUSES),
+            'to_accumulates': 1 if to_status in ACCUMULATING_STATUSES else 0,
+            'now': now
+        }
+        filters = ''
+        if claim_ids is not None:
+            filters += ' AND id = ANY(:claim_ids)'
+            params['claim_ids'] = list(claim_ids)
+        if pharmacy_ids:
+            filters += ' AND pharmacy_id = ANY(:pharmacy_ids)'
+            params['pharmacy_ids'] = list(pharmacy_ids)
+        if through_date:
+            filters += ' AND fill_date <= :through_date'
+            params['through_date'] = through_date
+
+        processed_at = 'COALESCE(c.processed_at, :now)' if to_status != 'reversed' else 'c.processed_at'
+        paid_at = ':now' if to_status == 'paid' else 'c.paid_at'
+        stats_amounts = ',\n                       '.join(f'SUM(d.sign * COALESCE(m.{a}, 0)) AS {a}' for a in ROLLUP_AMOUNTS)
+        accumulator_amounts = ',\n                       '.join(f'SUM(s.sign * COALESCE(m.{a}, 0)) AS {a}' for a in ACCUMULATOR_AMOUNTS)
+        remittance_amounts = ',\n                '.join(f'COALESCE(SUM(m.{a}), 0) AS {a}' for a in REMITTANCE_AMOUNTS)
+
+        rows = db.session.execute(text(f"""
+            WITH target AS (
+                SELECT id, fill_date, status AS previous_status
+                FROM claims
+                WHERE status = ANY(:from_statuses) {filters}
+                ORDER BY id
+                FOR UPDATE
+            ),
+            moved AS (
+                UPDATE claims c
+                SET status = :to_status,
+                    processed_at = {processed_at},
+                    paid_at = {paid_at},
+                    updated_at = :now,
+                    change_xid = {CHANGE_XID_SQL}
+                FROM target t
+                WHERE c.id = t.id AND c.fill_date = t.fill_date
+                RETURNING c.id, c.member_id, c.drug_id, c.pharmacy_id, c.fill_date, t.previous_status,
+                          {', '.join(f'c.{a}' for a in sorted(set(ROLLUP_AMOUNTS + ACCUMULATOR_AMOUNTS)))}
+            ),
+            stats AS (
+                INSERT INTO claim_daily_stats (
+                    fill_date, drug_id, pharmacy_id, status, claim_count,
+                    {', '.join(ROLLUP_AMOUNTS)}, updated_at
+                )
+                SELECT m.fill_date, m.drug_id, m.pharmacy_id, d.status, SUM(d.sign),
+                       {stats_amounts},
+                       :now
+                FROM moved m
+                CROSS JOIN LATERAL (VALUES (m.previous_status, -1), (CAST(:to_status AS varchar), 1)) AS d(status, sign)
+                GROUP BY m.fill_date, m.drug_id, m.pharmacy_id, d.status
+                ORDER BY m.fill_date, m.drug_id, m.pharmacy_id, d.status
+                ON CONFLICT (fill_date, drug_id, pharmacy_id, status) DO UPDATE SET
+                    claim_count = claim_daily_stats.claim_count + EXCLUDED.claim_count,
+                    {', '.join(f'{a} = claim_daily_stats.{a} + EXCLUDED.{a}' for a in ROLLUP_AMOUNTS)},
+                    updated_at = EXCLUDED.updated_at
+            ),
+            accumulators AS (
+                INSERT INTO member_accumulators (
+                    member_id, plan_year, claim_count, {', '.join(ACCUMULATOR_AMOUNTS)}, updated_at
+                )
+                SELECT m.member_id, CAST(EXTRACT(YEAR FROM m.fill_date) AS integer), SUM(s.sign),
+                       {accumulator_amounts},
+                       :now
+                FROM moved m
+                CROSS JOIN LATERAL (
+                    SELECT :to_accumulates - CASE WHEN m.previous_status = ANY(:accumulating) THEN 1 ELSE 0 END AS sign
+                ) s
+                WHERE s.sign <> 0
+                GROUP BY m.member_id, CAST(EXTRACT(YEAR FROM m.fill_date) AS integer)
+                ORDER BY 1, 2
+                ON CONFLICT (member_id, plan_year) DO UPDATE SET
+                    claim_count = member_accumulators.claim_count + EXCLUDED.claim_count,
+                    {', '.join(f'{a} = member_accumulators.{a} + EXCLUDED.{a}' for a in ACCUMULATOR_AMOUNTS)},
+                    updated_at = EXCLUDED.updated_at
+            )
+            SELECT
+                m.pharmacy_id,
+                p.ncpdp_id,
+                p.npi,
+                p.name AS pharmacy_name,
+                COUNT(*) AS claim_count,
+                {remittance_amounts},
+                MIN(m.fill_date) AS first_fill_date,
+                MAX(m.fill_date) AS last_fill_date
+            FROM moved m
+            JOIN pharmacies p ON p.id = m.pharmacy_id
+            GROUP BY m.pharmacy_id, p.ncpdp_id, p.npi, p.name
+            ORDER BY m.pharmacy_id
+        """), params).mappings().all()
+
+        pharmacies = [
+            {
+                'pharmacy_id': row['pharmacy_id'],
+                'ncpdp_id': row['ncpdp_id'],
+                'npi': row['npi'],
+                'pharmacy_name': row['pharmacy_name'],
+                'claim_count': row['claim_count'],
+                **{a: float(row[a]) for a in REMITTANCE_AMOUNTS},
+                'first_fill_date': row['first_fill_date'].isoformat(),
+                'last_fill_date': row['last_fill_date'].isoformat()
+            }
+            for row in rows
+        ]
+        return {
+            'status': to_status,
+            'processed_at': now.isoformat(),
+            'claim_count': sum(p['claim_count'] for p in pharmacies),
+            'plan_paid_amount': round(sum(p['plan_paid_amount'] for p in pharmacies), 2),
+            'pharmacies': pharmacies
+        }
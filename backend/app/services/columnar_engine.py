@@ -0,0 +1,411 @@
+from app import db
+from app.models import Drug, Member, Pharmacy
+from app.models.claim import CLAIM_STATUSES
+from app.services.analytics_service import TREND_GRANULARITIES, average, trend_point
+from flask import current_app
+from sqlalchemy import text, func
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional in-memory analytics engine
+    np = None
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Oldest transaction still running, as a bigint like claims.change_xid. Every
+# transaction before it has committed or aborted, so a refresh that re-reads
+# rows with change_xid >= the horizon taken before the previous read misses no
+# late commit, however long the writer ran. A long-open transaction holds the
+# horizon back, and the rows written since it began are re-read until it ends.
+CHANGE_HORIZON_SQL = 'SELECT CAST(CAST(pg_snapshot_xmin(pg_current_snapshot()) AS text) AS bigint)'
+
+CLAIM_COLUMNS_SQL = """
+    SELECT
+        id,
+        fill_date - DATE '1970-01-01' as fill_day,
+        member_id,
+        drug_id,
+        pharmacy_id,
+        CAST(ROUND(total_cost * 100) AS bigint) as cost_cents,
+        status
+    FROM claims
+"""
+
+
+def to_day(value):
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def cents_to_decimal(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+class _ClaimColumns:
+    """Immutable columnar snapshot of claims, sorted by fill_day"""
+
+    def __init__(self, ids, fill_day, member_id, drug_id, pharmacy_id, cost_cents, status,
+                 statuses, watermark, drugs, loaded_at):
+        self.ids = ids
+        self.fill_day = fill_day
+        self.member_id = member_id
+        self.drug_id = drug_id
+        self.pharmacy_id = pharmacy_id
+        self.cost_cents = cost_cents
+        self.status = status
+        self.statuses = statuses
+        self.watermark = watermark
+        self.drugs = drugs
+        self.loaded_at = loaded_at
+
+    def columns(self):
+        return (self.ids, self.fill_day, self.member_id, self.drug_id,
+                self.pharmacy_id, self.cost_cents, self.status)
+
+    def since(self, start_day, end_day=None):
+        """Index range of rows with start_day <= fill_day (<= end_day) via binary search"""
+        lo = int(np.searchsorted(self.fill_day, start_day, side='left'))
+        hi = len(self.fill_day) if end_day is None else int(np.searchsorted(self.fill_day, end_day, side='right'))
+        return slice(lo, hi)
+
+
+class _DrugColumns:
+    """Drug attributes as arrays indexed by drug id"""
+
+    def __init__(self, is_generic, class_code, class_names, names, version):
+        self.is_generic = is_generic
+        self.class_code = class_code
+        self.class_names = class_names
+        self.names = names
+        self.version = version
+
+
+class ColumnarClaimStore:
+    """
+    In-process columnar copy of the claims table for interactive analytics.
+    Claims are held as NumPy arrays sorted by fill date (int32 days, int64 cents,
+    int8 status codes) and refreshed incrementally from claims.change_xid; each
+    refresh builds a new snapshot and swaps it in, so readers never see a
+    half-applied update. The query methods mirror AnalyticsService and return
+    identical results.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._refresh_lock = threading.Lock()
+        self._checked_at = 0
+
+    @property
+    def available(self):
+        return np is not None
+
+    def invalidate(self):
+        """Force a full reload on next use (e.g. after claims were hard-deleted)"""
+        self._snapshot = None
+
+    def snapshot(self):
+        """Current snapshot, refreshed at most every ANALYTICS_ENGINE_REFRESH_INTERVAL seconds"""
+        if np is None:
+            raise RuntimeError('The in-memory analytics engine requires numpy')
+
+        config = current_app.config
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < config.get('ANALYTICS_ENGINE_REFRESH_INTERVAL', 5):
+            return snapshot
+
+        # One refresh at a time; other requests keep reading the current snapshot
+        if not self._refresh_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            snapshot = self._snapshot
+            if snapshot is None or time.monotonic() - snapshot.loaded_at > config.get('ANALYTICS_ENGINE_RELOAD_INTERVAL', 3600):
+                snapshot = self._full_load()
+            else:
+                snapshot = self._incremental_load(snapshot)
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+        finally:
+            self._refresh_lock.release()
+
+    def _load_drugs(self, current=None):
+        version = tuple(db.session.query(func.count(Drug.id), func.max(Drug.updated_at)).one())
+        if current is not None and current.version == version:
+            return current
+
+        rows = db.session.query(Drug.id, Drug.name, Drug.is_generic, Drug.therapeutic_class).all()
+        size = max((row.id for row in rows), default=0) + 1
+        is_generic = np.zeros(size, dtype=bool)
+        class_code = np.full(size, -1, dtype=np.int32)
+        class_names = sorted({row.therapeutic_class for row in rows if row.therapeutic_class is not None})
+        codes = {name: code for code, name in enumerate(class_names)}
+        names = {}
+        for row in rows:
+            is_generic[row.id] = row.is_generic
+            if row.therapeutic_class is not None:
+                class_code[row.id] = codes[row.therapeutic_class]
+            names[row.id] = row.name
+        return _DrugColumns(is_generic, class_code, class_names, names, version)
+
+    def _fetch(self, statuses, since=None):
+        """Stream claim rows into column arrays plus the change horizon they were read at"""
+        # Taken before the read, so it is no later than the read's own snapshot
+        horizon = db.session.execute(text(CHANGE_HORIZON_SQL)).scalar()
+        sql = CLAIM_COLUMNS_SQL + (" WHERE change_xid >= :since" if since is not None else "")
+        status_codes = {name: code for code, name in enumerate(statuses)}
+        chunks = []
+
+        result = db.session.execute(text(sql).execution_options(yield_per=100000), {'since': since})
+        try:
+            for partition in result.partitions():
+                ids, days, members, drugs, pharmacies, cents, status = zip(*partition)
+                for name in set(status) - status_codes.keys():
+                    status_codes[name] = len(statuses)
+                    statuses = statuses + (name,)
+                chunks.append((
+                    np.array(ids, dtype=np.int64),
+                    np.array(days, dtype=np.int32),
+                    np.array(members, dtype=np.int32),
+                    np.array(drugs, dtype=np.int32),
+                    np.array(pharmacies, dtype=np.int32),
+                    np.array(cents, dtype=np.int64),
+                    np.array([status_codes[name] for name in status], dtype=np.int8),
+                ))
+        finally:
+            result.close()
+
+        dtypes = (np.int64, np.int32, np.int32, np.int32, np.int32, np.int64, np.int8)
+        if chunks:
+            columns = [np.concatenate(parts) for parts in zip(*chunks)]
+        else:
+            columns = [np.empty(0, dtype=dtype) for dtype in dtypes]
+        return columns, statuses, horizon
+
+    def _full_load(self):
+        columns, statuses, watermark = self._fetch(CLAIM_STATUSES)
+        order = np.argsort(columns[1], kind='stable')
+        columns = [column[order] for column in columns]
+        return _ClaimColumns(*columns, statuses=statuses, watermark=watermark,
+                             drugs=self._load_drugs(), loaded_at=time.monotonic())
+
+    def _incremental_load(self, snapshot):
+        changed, statuses, watermark = self._fetch(snapshot.statuses, snapshot.watermark)
+        drugs = self._load_drugs(snapshot.drugs)
+
+        if len(changed[0]) == 0:
+            if drugs is snapshot.drugs:
+                return snapshot
+            columns = snapshot.columns()
+        else:
+            # Drop the previous version of every changed claim, then insert the new
+            # versions at their sorted fill_day positions. No re-sort, but isin and
+            # insert each copy every column, so a refresh costs O(total rows) even
+            # for a handful of changes; ANALYTICS_ENGINE_REFRESH_INTERVAL bounds how
+            # often that is paid
+            keep = ~np.isin(snapshot.ids, changed[0])
+            base = [column[keep] for column in snapshot.columns()]
+            order = np.argsort(changed[1], kind='stable')
+            changed = [column[order] for column in changed]
+            positions = np.searchsorted(base[1], changed[1], side='right')
+            columns = [np.insert(column, positions, values) for column, values in zip(base, changed)]
+
+        return _ClaimColumns(*columns, statuses=statuses, watermark=watermark,
+                             drugs=drugs, loaded_at=snapshot.loaded_at)
+
+    @staticmethod
+    def _group(keys, snapshot_cents, size):
+        """Vectorized group-by: (count, cents) per integer key"""
+        counts = np.bincount(keys, minlength=size)
+        # float64 weights are exact for sums below 2**53 cents
+        cents = np.rint(np.bincount(keys, weights=snapshot_cents, minlength=size)).astype(np.int64)
+        return counts, cents
+
+    def get_dashboard_summary(self, start_date, top_n=10):
+        snap = self.snapshot()
+        rows = snap.since(to_day(start_date))
+        drug_id, cost, status = snap.drug_id[rows], snap.cost_cents[rows], snap.status[rows]
+
+        is_generic = snap.drugs.is_generic[drug_id].astype(np.int64)
+        type_counts, type_cents = self._group(is_generic, cost, 2)
+
+        drug_counts, drug_cents = self._group(drug_id, cost, len(snap.drugs.is_generic))
+        present = np.flatnonzero(drug_counts)
+        top = present[np.lexsort((present, -drug_cents[present]))][:top_n]
+
+        status_counts = np.bincount(status, minlength=len(snap.statuses))
+        total_claims, total_cents = int(len(cost)), int(cost.sum())
+
+        return {
+            'summary': {
+                'total_claims': total_claims,
+                'total_cost': float(cents_to_decimal(total_cents)),
+                'average_cost': average(cents_to_decimal(total_cents), total_claims)
+            },
+            'generic_vs_brand': [
+                {
+                    'type': 'Generic' if code else 'Brand',
+                    'claims': int(type_counts[code]),
+                    'cost': float(cents_to_decimal(type_cents[code]))
+                } for code in (0, 1) if type_counts[code]
+            ],
+            'top_drugs': [
+                {
+                    'name': snap.drugs.names.get(int(drug)),
+                    'is_generic': bool(snap.drugs.is_generic[drug]),
+                    'claims': int(drug_counts[drug]),
+                    'total_cost': float(cents_to_decimal(drug_cents[drug]))
+                } for drug in top
+            ],
+            'status_breakdown': sorted(
+                [
+                    {'status': name, 'count': int(status_counts[code])}
+                    for code, name in enumerate(snap.statuses) if status_counts[code]
+                ],
+                key=lambda r: r['status']
+            )
+        }
+
+    def get_cost_trends_with_window_functions(self, days=90, window=7, granularity='day', end_date=None):
+        if granularity not in TREND_GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(TREND_GRANULARITIES)}")
+        if window < 1:
+            raise ValueError('window must be at least 1')
+
+        snap = self.snapshot()
+        end_date = end_date or datetime.utcnow().date()
+        start_date = end_date - timedelta(days=days)
+
+        # Same buckets as date_trunc: ISO weeks start on Monday
+        if granularity == 'day':
+            first, last = start_date, end_date
+        elif granularity == 'week':
+            first = start_date - timedelta(days=start_date.weekday())
+            last = end_date - timedelta(days=end_date.weekday())
+        else:
+            first, last = start_date.replace(day=1), end_date.replace(day=1)
+
+        rows = snap.since(to_day(first), to_day(end_date))
+        fill_day, cost = snap.fill_day[rows], snap.cost_cents[rows]
+
+        if granularity == 'day':
+            buckets = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+            index = fill_day - to_day(first)
+        elif granularity == 'week':
+            buckets = [first + timedelta(weeks=i) for i in range((last - first).days // 7 + 1)]
+            index = (fill_day - to_day(first)) // 7
+        else:
+            months = (last.year - first.year) * 12 + last.month - first.month + 1
+            buckets = [date(first.year + (first.month - 1 + i) // 12, (first.month - 1 + i) % 12 + 1, 1)
+                       for i in range(months)]
+            month_of_row = fill_day.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            index = month_of_row - ((first.year - 1970) * 12 + first.month - 1)
+
+        claims, cents = self._group(index.astype(np.int64), cost, len(buckets))
+
+        claim_sums = np.concatenate(([0], np.cumsum(claims)))
+        cent_sums = np.concatenate(([0], np.cumsum(cents)))
+        ends = np.arange(1, len(buckets) + 1)
+        starts = np.maximum(ends - window, 0)
+        moving_claims = claim_sums[ends] - claim_sums[starts]
+        moving_cents = cent_sums[ends] - cent_sums[starts]
+        frame_rows = ends - starts
+
+        # RANK() OVER (ORDER BY cost DESC): 1 + buckets with a strictly higher cost
+        ranks = np.searchsorted(np.sort(-cents), -cents, side='left') + 1
+
+        return [
+            trend_point(bucket, int(claims[i]), cents_to_decimal(cents[i]), int(moving_claims[i]),
+                        cents_to_decimal(moving_cents[i]), int(frame_rows[i]),
+                        cents_to_decimal(cent_sums[i + 1]), int(ranks[i]))
+            for i, bucket in enumerate(buckets)
+        ]
+
+    def get_high_utilizers(self, start_date, min_claims=5, limit=20):
+        snap = self.snapshot()
+        rows = snap.since(to_day(start_date))
+        member_id, cost = snap.member_id[rows], snap.cost_cents[rows]
+        if len(member_id) == 0:
+            return []
+
+        counts, cents = self._group(member_id, cost, int(member_id.max()) + 1)
+        eligible = np.flatnonzero(counts >= max(min_claims, 1))
+        top = eligible[np.lexsort((eligible, -cents[eligible]))][:limit]
+
+        members = {m.id: m for m in Member.query.filter(Member.id.in_([int(i) for i in top])).all()}
+        return [
+            {
+                'member_id': members[int(i)].member_id,
+                'name': f"{members[int(i)].first_name} {members[int(i)].last_name}",
+                'claim_count': int(counts[i]),
+                'total_cost': float(cents_to_decimal(cents[i])),
+                'avg_cost_per_claim': average(cents_to_decimal(cents[i]), int(counts[i]))
+            } for i in top if int(i) in members
+        ]
+
+    def get_pharmacy_performance(self, start_date, limit=20):
+        snap = self.snapshot()
+        rows = snap.since(to_day(start_date))
+        pharmacy_id, cost, status = snap.pharmacy_id[rows], snap.cost_cents[rows], snap.status[rows]
+        if len(pharmacy_id) == 0:
+            return []
+
+        size = int(pharmacy_id.max()) + 1
+        counts, cents = self._group(pharmacy_id, cost, size)
+        denied = np.bincount(pharmacy_id[status == snap.statuses.index('denied')], minlength=size)
+        present = np.flatnonzero(counts)
+        top = present[np.lexsort((present, -counts[present]))][:limit]
+
+        pharmacies = {p.id: p for p in Pharmacy.query.filter(Pharmacy.id.in_([int(i) for i in top])).all()}
+        results = []
+        for i in top:
+            pharmacy, claim_count, denied_count = pharmacies.get(int(i)), int(counts[i]), int(denied[i])
+            if pharmacy is None:
+                continue
+            results.append({
+                'name': pharmacy.name,
+                'chain': pharmacy.chain_name,
+                'network_tier': pharmacy.network_tier,
+                'claims': claim_count,
+                'total_cost': float(cents_to_decimal(cents[i])),
+                'avg_cost': average(cents_to_decimal(cents[i]), claim_count),
+                'denied_claims': denied_count,
+                'denial_rate': round((denied_count / claim_count * 100), 2) if claim_count > 0 else 0
+            })
+        return results
+
+    def get_therapeutic_class_breakdown(self, start_date):
+        snap = self.snapshot()
+        rows = snap.since(to_day(start_date))
+        class_code = snap.drugs.class_code[snap.drug_id[rows]]
+        classified = class_code >= 0
+        class_code = class_code[classified].astype(np.int64)
+        member_id = snap.member_id[rows][classified].astype(np.int64)
+        cost = snap.cost_cents[rows][classified]
+
+        size = len(snap.drugs.class_names)
+        counts, cents = self._group(class_code, cost, size)
+
+        # COUNT(DISTINCT member_id) per class: unique (class, member) pairs
+        width = int(member_id.max()) + 1 if len(member_id) else 1
+        pairs = np.unique(class_code * width + member_id)
+        unique_members = np.bincount(pairs // width, minlength=size)
+
+        present = np.flatnonzero(counts)
+        # Class codes follow sorted class names, so the code is the name tie-break
+        ordered = present[np.lexsort((present, -cents[present]))]
+        return [
+            {
+                'class': snap.drugs.class_names[i],
+                'claims': int(counts[i]),
+                'total_cost': float(cents_to_decimal(cents[i])),
+                'unique_members': int(unique_members[i]),
+                'avg_cost_per_claim': average(cents_to_decimal(cents[i]), int(counts[i]))
+            } for i in ordered
+        ]
+
+
+claim_store = ColumnarClaimStore()
@@ -0,0 +1,212 @@
+from app import db
+from app.models import Drug, Formulary, Member, Pharmacy
+from app.services.formulary_index import FormularySnapshot
+from sqlalchemy import select, or_
+from datetime import datetime, date
+
+
+MAIL_ORDER_TYPES = {'mail order', 'mail_order', 'mail'}
+
+# NCPDP reject codes for the coverage denials below
+REJECT_MEMBER_NOT_FOUND = ('52', 'Member not found')
+REJECT_MEMBER_NOT_ELIGIBLE = ('65', 'Member not eligible on fill_date')
+REJECT_PHARMACY_NOT_FOUND = ('50', 'Pharmacy not found')
+REJECT_PHARMACY_OUT_OF_NETWORK = ('50', 'Pharmacy not in network')
+REJECT_DRUG_NOT_FOUND = ('54', 'Drug not found')
+REJECT_DRUG_INACTIVE = ('70', 'Drug inactive')
+REJECT_NOT_ON_FORMULARY = ('70', 'Not on formulary on fill_date')
+REJECT_EXCLUDED = ('70', 'Excluded from coverage')
+
+
+class CoverageContext:
+    """
+    Members, pharmacies, drugs and the relevant formulary rows for a batch of
+    requests, each loaded with one query, so every item resolves from memory.
+    """
+
+    def __init__(self, members, pharmacies, drugs, formulary):
+        self.members = members
+        self.pharmacies = pharmacies
+        self.drugs = drugs
+        self.formulary = formulary
+
+    @staticmethod
+    def drugs_by(column, values):
+        """Drug rows whose column is in values, keyed by drug id"""
+        if not values:
+            return {}
+        return {
+            row.id: row for row in db.session.execute(
+                select(Drug.id, Drug.ndc, Drug.name, Drug.is_generic, Drug.is_active).where(column.in_(values))
+            )
+        }
+
+    @classmethod
+    def load(cls, member_ids, pharmacy_ids, drugs, dates):
+        members = cls._by_id(
+            select(Member.id, Member.is_active, Member.effective_date, Member.termination_date),
+            Member.id, member_ids
+        )
+        pharmacies = cls._by_id(
+            select(Pharmacy.id, Pharmacy.in_network, Pharmacy.is_active, Pharmacy.pharmacy_type),
+            Pharmacy.id, pharmacy_ids
+        )
+
+        # Only the formulary rows that can cover some requested (drug, date)
+        formulary = FormularySnapshot([])
+        if drugs and dates:
+            entries = Formulary.query.filter(
+                Formulary.drug_id.in_(drugs.keys()),
+                Formulary.effective_date <= max(dates),
+                or_(Formulary.termination_date == None, Formulary.termination_date >= min(dates))
+            ).all()
+            formulary = FormularySnapshot([entry.to_dict() for entry in entries])
+
+        return cls(members, pharmacies, drugs, formulary)
+
+    @staticmethod
+    def _by_id(query, column, ids):
+        if not ids:
+            return {}
+        return {row.id: row for row in db.session.execute(query.where(column.in_(ids)))}
+
+    def evaluate(self, member_id, pharmacy_id, drug_id, fill_date):
+        """
+        Return (denials, entry, pharmacy) for one request, where denials is a list
+        of (reject_code, reason) and entry the formulary row in effect, if any.
+        """
+        denials = []
+
+        member = self.members.get(member_id)
+        if member is None:
+            denials.append(REJECT_MEMBER_NOT_FOUND)
+        elif not member.is_active or (member.effective_date and member.effective_date > fill_date) or (
+                member.termination_date and member.termination_date < fill_date):
+            denials.append(REJECT_MEMBER_NOT_ELIGIBLE)
+
+        pharmacy = self.pharmacies.get(pharmacy_id)
+        if pharmacy is None:
+            denials.append(REJECT_PHARMACY_NOT_FOUND)
+        elif not pharmacy.is_active or not pharmacy.in_network:
+            denials.append(REJECT_PHARMACY_OUT_OF_NETWORK)
+
+        drug = self.drugs.get(drug_id)
+        entry = None
+        if drug is None:
+            denials.append(REJECT_DRUG_NOT_FOUND)
+        else:
+            if not drug.is_active:
+                denials.append(REJECT_DRUG_INACTIVE)
+            entry = self.formulary.lookup(drug.id, fill_date)
+            if entry is None:
+                denials.append(REJECT_NOT_ON_FORMULARY)
+            elif not entry['is_covered']:
+                denials.append(REJECT_EXCLUDED)
+
+        return denials, entry, pharmacy
+
+    @staticmethod
+    def is_mail_order(pharmacy):
+        return pharmacy is not None and (pharmacy.pharmacy_type or '').lower() in MAIL_ORDER_TYPES
+
+
+class CoverageService:
+    """Batch coverage and cost-sharing checks for pharmacy-side integrations"""
+
+    @staticmethod
+    def check(items):
+        """
+        Resolve a list of {ndc, fill_date, pharmacy_id, member_id} requests with
+        one query per table, however many items there are. Returns one result
+        per item, in request order.
+        """
+        parsed = []
+        for index, item in enumerate(items):
+            parsed.append(CoverageService._parse_item(index, item))
+
+        valid = [p for p in parsed if not p['errors']]
+        drugs = CoverageContext.drugs_by(Drug.ndc, {p['ndc'] for p in valid})
+        drug_ids = {row.ndc: drug_id for drug_id, row in drugs.items()}
+        context = CoverageContext.load(
+            {p['member_id'] for p in valid},
+            {p['pharmacy_id'] for p in valid},
+            drugs,
+            [p['fill_date'] for p in valid]
+        )
+
+        return [CoverageService._resolve(p, drug_ids, context) for p in parsed]
+
+    @staticmethod
+    def _parse_item(index, item):
+        result = {'index': index, 'errors': []}
+        if not isinstance(item, dict):
+            result['errors'].append('Each item must be an object')
+            return result
+
+        result['ndc'] = str(item['ndc']).strip() if item.get('ndc') is not None else None
+        if not result['ndc']:
+            result['errors'].append('Missing required field: ndc')
+
+        for field in ('member_id', 'pharmacy_id'):
+            value = item.get(field)
+            try:
+                result[field] = int(value)
+            except (TypeError, ValueError):
+                result[field] = value
+                result['errors'].append(f'Invalid or missing {field}')
+
+        fill_date = item.get('fill_date')
+        try:
+            result['fill_date'] = datetime.strptime(str(fill_date), '%Y-%m-%d').date()
+        except ValueError:
+            result['fill_date'] = fill_date
+            result['errors'].append('fill_date must be YYYY-MM-DD')
+        return result
+
+    @staticmethod
+    def _resolve(item, drug_ids, context):
+        result = {
+            'index': item['index'],
+            'ndc': item.get('ndc'),
+            'fill_date': item['fill_date'].isoformat() if isinstance(item.get('fill_date'), date) else item.get('fill_date'),
+            'member_id': item.get('member_id'),
+            'pharmacy_id': item.get('pharmacy_id'),
+            'covered': False,
+            'reasons': list(item['errors'])
+        }
+        if item['errors']:
+            return result
+
+        drug_id = drug_ids.get(item['ndc'])
+        denials, entry, pharmacy = context.evaluate(item['member_id'], item['pharmacy_id'], drug_id,
+                                                    item['fill_date'])
+        result['reasons'] = [reason for _, reason in denials]
+        result['reject_codes'] = sorted({code for code, _ in denials})
+
+        if pharmacy is not None:
+            result['pharmacy_in_network'] = pharmacy.in_network
+
+        drug = context.drugs.get(drug_id)
+        if drug is not None:
+            result['drug_id'] = drug.id
+            result['drug_name'] = drug.name
+            result['is_generic'] = drug.is_generic
+
+        if entry is not None:
+            cost_sharing = entry['cost_sharing']
+            result.update({
+                'formulary_id': entry['id'],
+                'tier': entry['tier'],
+                'tier_name': entry['tier_name'],
+                'copay_retail': cost_sharing['copay_retail'],
+                'copay_mail_order': cost_sharing['copay_mail_order'],
+                'copay': cost_sharing['copay_mail_order'] if CoverageContext.is_mail_order(pharmacy)
+                else cost_sharing['copay_retail'],
+                'coinsurance_rate': cost_sharing['coinsurance_rate'],
+                'requires_prior_auth': entry['requires_prior_auth'],
+                'requires_step_therapy': entry['requires_step_therapy'],
+                'quantity_limit': entry['quantity_limit']
+            })
+
+        result['covered'] = not denials
+        return result
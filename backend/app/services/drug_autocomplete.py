@@ -0,0 +1,100 @@
+from app import db
+from app.models import Drug
+from app.utils.reloadable import ReloadableIndex
+from app.utils.search import looks_like_ndc
+from sqlalchemy import func
+from bisect import bisect_left
+import re
+
+
+MAX_SUGGESTIONS = 50
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def normalize_name(text):
+    """Lowercase words joined by single spaces: 'Atorvastatin-Calcium ' -> 'atorvastatin calcium'"""
+    return ' '.join(_WORD.findall(text.lower())) if text else ''
+
+
+def normalize_ndc(text):
+    return ''.join(c for c in text if c.isdigit()) if text else ''
+
+
+class _SortedKeys:
+    """
+    One sorted list of 'key\x00drug_id' strings searched with bisect. A single
+    flat list of str sorts and stores far more compactly than (key, id) tuples;
+    '\x00' sorts before every printable character so key order is preserved.
+    """
+
+    def __init__(self, pairs):
+        self.entries = sorted({f'{key}\x00{drug_id}' for key, drug_id in pairs})
+
+    def match(self, prefix, limit):
+        """Distinct drug ids whose key starts with prefix, in key order"""
+        found = []
+        seen = set()
+        i = bisect_left(self.entries, prefix)
+        while i < len(self.entries) and len(found) < limit and self.entries[i].startswith(prefix):
+            entry = self.entries[i]
+            drug_id = int(entry[entry.rindex('\x00') + 1:])
+            if drug_id not in seen:
+                seen.add(drug_id)
+                found.append(drug_id)
+            i += 1
+        return found
+
+
+class PrefixSnapshot:
+    """
+    Immutable autocomplete index. Every word position of the name, generic and
+    brand name is a key ('atorvastatin calcium' and 'calcium'), so typing any
+    word of a name matches; NDCs are indexed by their digits.
+    """
+
+    def __init__(self, drugs):
+        self.drugs = {}
+        names, ndcs = [], []
+        for drug in drugs:
+            self.drugs[drug['id']] = drug
+            for field in ('name', 'generic_name', 'brand_name'):
+                words = normalize_name(drug.get(field)).split(' ')
+                for start in range(len(words)):
+                    key = ' '.join(words[start:])
+                    if key:
+                        names.append((key, drug['id']))
+            ndc = normalize_ndc(drug.get('ndc'))
+            if ndc:
+                ndcs.append((ndc, drug['id']))
+        self.names = _SortedKeys(names)
+        self.ndcs = _SortedKeys(ndcs)
+
+    def suggest(self, prefix, limit=10):
+        if looks_like_ndc(prefix):
+            ids = self.ndcs.match(normalize_ndc(prefix), limit)
+        else:
+            key = normalize_name(prefix)
+            ids = self.names.match(key, limit) if key else []
+        return [self.drugs[drug_id] for drug_id in ids]
+
+
+class DrugPrefixIndex(ReloadableIndex):
+    """In-process autocomplete over the active drug catalog"""
+
+    refresh_setting = 'AUTOCOMPLETE_REFRESH_INTERVAL'
+
+    def load_version(self):
+        return tuple(db.session.query(func.count(Drug.id), func.max(Drug.updated_at)).one())
+
+    def build(self):
+        rows = db.session.query(
+            Drug.id, Drug.ndc, Drug.name, Drug.generic_name, Drug.brand_name, Drug.is_generic
+        ).filter(Drug.is_active == True).all()
+        return PrefixSnapshot([dict(row._mapping) for row in rows])
+
+    def suggest(self, prefix, limit=10):
+        return self.current().suggest(prefix, max(1, min(limit, MAX_SUGGESTIONS)))
+
+
+drug_autocomplete = DrugPrefixIndex()
@@ -0,0 +1,158 @@
+from app import db
+from app.models import Claim
+from sqlalchemy import select, text, tuple_
+from flask import current_app
+
+
+# NCPDP reject code for a claim already on file for the same fill
+REJECT_DUPLICATE = ('83', 'Duplicate paid/captured claim')
+
+# Claims in these statuses no longer count as the original of a fill
+INACTIVE_STATUSES = ('denied', 'reversed')
+
+# Writers serialize on member_id % LOCK_SLOTS, so a bulk chunk takes at most
+# this many advisory locks however many members it touches
+LOCK_SLOTS = 256
+
+
+class DuplicateClaimService:
+    """
+    Write-time duplicate detection on (member_id, drug_id, fill_date,
+    pharmacy_id), answered from idx_claim_duplicate_key instead of rescanning
+    recent claims.
+    """
+
+    @staticmethod
+    def key(row):
+        return (row['member_id'], row['drug_id'], row['fill_date'], row['pharmacy_id'])
+
+    @staticmethod
+    def lock(member_ids):
+        """
+        Hold the advisory locks covering these members until the transaction
+        ends, so two writers cannot both miss each other's copy of a fill.
+        Taken in slot order to rule out deadlocks between bulk chunks.
+        """
+        slots = sorted({member_id % LOCK_SLOTS for member_id in member_ids})
+        db.session.execute(text("""
+            SELECT pg_advisory_xact_lock(hashtext('claim_duplicate'), slot)
+            FROM (SELECT slot FROM unnest(CAST(:slots AS integer[])) AS slot ORDER BY slot) slots
+        """), {'slots': slots})
+
+    @staticmethod
+    def existing(keys):
+        """The subset of keys that already have an active claim on file"""
+        if not keys:
+            return set()
+        dates = [key[2] for key in keys]
+        columns = (Claim.member_id, Claim.drug_id, Claim.fill_date, Claim.pharmacy_id)
+        query = select(*columns).where(
+            tuple_(*columns).in_(list(keys)),
+            # Lets the planner prune to the partitions the keys fall in
+            Claim.fill_date.between(min(dates), max(dates)),
+            Claim.status.notin_(INACTIVE_STATUSES)
+        ).distinct()
+        return set(tuple(row) for row in db.session.execute(query))
+
+    @staticmethod
+    def resolution():
+        """Fields set on a duplicate under DUPLICATE_CLAIM_POLICY"""
+        if current_app.config.get('DUPLICATE_CLAIM_POLICY', 'flag') == 'reject':
+            code, reason = REJECT_DUPLICATE
+            return {'is_duplicate': True, 'status': 'denied', 'rejection_code': code, 'rejection_reason': reason}
+        return {'is_duplicate': True}
+
+    @staticmethod
+    def mark_rows(rows):
+        """
+        Lock, check and mark a batch of claim dicts in place before they are
+        loaded. Rows repeating an earlier row of the same batch count as
+        duplicates too. Returns the number of rows marked.
+        """
+        active = [row for row in rows if row['status'] not in INACTIVE_STATUSES]
+        if not active:
+            return 0
+
+        DuplicateClaimService.lock({row['member_id'] for row in active})
+        seen = DuplicateClaimService.existing({DuplicateClaimService.key(row) for row in active})
+        resolution = DuplicateClaimService.resolution()
+
+        marked = 0
+        for row in active:
+            key = DuplicateClaimService.key(row)
+            if key in seen:
+                row.update(resolution)
+                marked += 1
+            else:
+                seen.add(key)
+        return marked
+
+    @staticmethod
+    def mark_claim(claim):
+        """Lock, check and mark a single new Claim before it is flushed"""
+        if claim.status in INACTIVE_STATUSES:
+            return False
+
+        key = (claim.member_id, claim.drug_id, claim.fill_date, claim.pharmacy_id)
+        DuplicateClaimService.lock({claim.member_id})
+        if key not in DuplicateClaimService.existing({key}):
+            return False
+
+        for field, value in DuplicateClaimService.resolution().items():
+            setattr(claim, field, value)
+        return True
+
+    @staticmethod
+    def list_flagged(start_date=None, end_date=None, member_id=None, limit=100, before_id=None):
+        """
+        Flagged duplicates, newest first, each with the claims it duplicates.
+        Reads the partial idx_claim_flagged_duplicates, so the cost follows the
+        number of duplicates rather than the number of claims.
+        """
+        filters = ''
+        params = {'limit': limit}
+        if start_date:
+            filters += ' AND d.fill_date >= :start_date'
+            params['start_date'] = start_date
+        if end_date:
+            filters += ' AND d.fill_date <= :end_date'
+            params['end_date'] = end_date
+        if member_id:
+            filters += ' AND d.member_id = :member_id'
+            params['member_id'] = member_id
+        if before_id:
+            filters += ' AND d.id < :before_id'
+            params['before_id'] = before_id
+
+        rows = db.session.execute(text(f"""
+            SELECT d.id, d.claim_number, d.member_id, d.drug_id, d.pharmacy_id, d.fill_date,
+                   d.status, d.rejection_code, d.total_cost, d.submitted_at, o.originals
+            FROM claims d
+            CROSS JOIN LATERAL (
+                SELECT ARRAY_AGG(c.claim_number ORDER BY c.id) AS originals
+                FROM claims c
+                WHERE c.member_id = d.member_id AND c.drug_id = d.drug_id
+                  AND c.fill_date = d.fill_date AND c.pharmacy_id = d.pharmacy_id
+                  AND c.id < d.id AND NOT c.is_duplicate
+            ) o
+            WHERE d.is_duplicate {filters}
+            ORDER BY d.id DESC
+            LIMIT :limit
+        """), params).mappings().all()
+
+        return [
+            {
+                'id': row['id'],
+                'claim_number': row['claim_number'],
+                'member_id': row['member_id'],
+                'drug_id': row['drug_id'],
+                'pharmacy_id': row['pharmacy_id'],
+                'fill_date': row['fill_date'].isoformat(),
+                'status': row['status'],
+                'rejection_code': row['rejection_code'],
+                'total_cost': float(row['total_cost']),
+                'submitted_at': row['submitted_at'].isoformat(),
+                'duplicate_of': row['originals'] or []
+            }
+            for row in rows
+        ]
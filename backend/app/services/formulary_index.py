@@ -0,0 +1,76 @@
+from app.models import Formulary
+from app.utils.reloadable import ReloadableIndex
+from app import db
+from sqlalchemy import func
+from bisect import bisect_right
+from datetime import date
+
+
+class _DrugIntervals:
+    """Disjoint [start, end] date segments for one drug, searched with bisect"""
+
+    def __init__(self, starts, ends, entries):
+        self.starts = starts
+        self.ends = ends
+        self.entries = entries
+
+    def at(self, on_date):
+        i = bisect_right(self.starts, on_date) - 1
+        if i < 0 or self.ends[i] < on_date:
+            return None
+        return self.entries[i]
+
+
+class FormularySnapshot:
+    """
+    Immutable point-in-time index over formulary rows. termination_date is the
+    last covered day (NULL = open ended). Where rows for a drug overlap, the one
+    with the later effective_date takes over from that date, so each drug's
+    segments are disjoint and a lookup is a single bisect.
+    """
+
+    def __init__(self, entries):
+        by_drug = {}
+        for entry in entries:
+            by_drug.setdefault(entry['drug_id'], []).append(entry)
+
+        self.drugs = {}
+        for drug_id, rows in by_drug.items():
+            rows.sort(key=lambda e: (e['effective_date'], e['id']))
+            starts, ends, kept = [], [], []
+            for i, entry in enumerate(rows):
+                start = date.fromisoformat(entry['effective_date'])
+                end = date.fromisoformat(entry['termination_date']) if entry['termination_date'] else date.max
+                if i + 1 < len(rows):
+                    next_start = date.fromisoformat(rows[i + 1]['effective_date'])
+                    if next_start <= end:
+                        end = date.fromordinal(next_start.toordinal() - 1)
+                if end < start:
+                    continue  # fully superseded by a row starting the same day
+                starts.append(start)
+                ends.append(end)
+                kept.append(entry)
+            self.drugs[drug_id] = _DrugIntervals(starts, ends, kept)
+
+    def lookup(self, drug_id, on_date):
+        """The formulary entry in effect for a drug on a date, or None"""
+        intervals = self.drugs.get(drug_id)
+        return intervals.at(on_date) if intervals is not None else None
+
+
+class FormularyIndex(ReloadableIndex):
+    """In-process effective-dated formulary lookups for adjudication"""
+
+    refresh_setting = 'FORMULARY_REFRESH_INTERVAL'
+
+    def load_version(self):
+        return tuple(db.session.query(func.count(Formulary.id), func.max(Formulary.updated_at)).one())
+
+    def build(self):
+        return FormularySnapshot([entry.to_dict() for entry in Formulary.query.all()])
+
+    def lookup(self, drug_id, on_date):
+        return self.current().lookup(drug_id, on_date)
+
+
+formulary_index = FormularyIndex()
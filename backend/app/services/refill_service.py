@@ -0,0 +1,312 @@
+from app import db
+from app.services.columnar_engine import EPOCH_ORDINAL, to_day
+from flask import current_app
+from sqlalchemy import text
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # optional, like the in-memory analytics engine
+    np = None
+
+
+# NCPDP reject code for a fill submitted while the previous supply is largely unused
+REJECT_REFILL_TOO_SOON = ('79', 'Refill too soon')
+
+# Fills that put medication in the member's hands
+SUPPLY_STATUSES = ('approved', 'paid')
+
+SUPPLY_COLUMNS_SQL = """
+    SELECT
+        id,
+        member_id,
+        drug_id,
+        fill_date - DATE '1970-01-01' as fill_day,
+        days_supply
+    FROM claims
+    WHERE status = ANY(:statuses)
+      AND fill_date >= :start_date
+      AND fill_date <= :end_date
+"""
+
+OVERLAP_BUCKETS = ((1, 7), (8, 14), (15, 30), (31, None))
+
+
+def to_date(day):
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def sort_order(columns, tiebreak=None):
+    """
+    Indices that sort by columns (most significant first), then tiebreak.
+    When the columns' ranges fit in 63 bits they are packed into one int64
+    key and argsorted once, which is several times faster than np.lexsort;
+    the few rows with equal keys are then ordered by tiebreak.
+    """
+    columns = [np.asarray(column, dtype=np.int64) for column in columns]
+    if len(columns[0]) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    lows = [int(column.min()) for column in columns]
+    bits = [(int(column.max()) - low).bit_length() for column, low in zip(columns, lows)]
+    if sum(bits) > 63:
+        keys = tuple(reversed(columns))
+        return np.lexsort(((tiebreak,) + keys) if tiebreak is not None else keys)
+
+    packed = np.zeros(len(columns[0]), dtype=np.int64)
+    for column, low, width in zip(columns, lows, bits):
+        packed = (packed << width) | (column - low)
+    order = np.argsort(packed)
+    if tiebreak is None:
+        return order
+
+    ordered = packed[order]
+    equal = ordered[1:] == ordered[:-1]
+    tied = np.zeros(len(order), dtype=bool)
+    tied[1:] = equal
+    tied[:-1] |= equal
+    if tied.any():
+        runs = np.flatnonzero(tied)
+        order[runs] = order[runs][np.lexsort((tiebreak[order[runs]], ordered[runs]))]
+    return order
+
+
+def refill_allowance(days_supply, threshold):
+    """Days of the previous supply that may still be on hand at refill time"""
+    return np.floor(days_supply * (1 - threshold)).astype(np.int64)
+
+
+class SupplyTimeline:
+    """
+    Days-supply intervals per (member, drug) as sorted arrays. Fills are ordered
+    by member, drug and fill day, and each carries the day its supply runs out
+    with early refills shifted forward (a fill starts when the previous supply
+    ends, or on its fill day if that is later). supply_end is built with one
+    vectorized scan:
+
+        end_i = max(end_(i-1), fill_i) + supply_i
+              = cumsum(supply)_i + max over j <= i of (fill_j - cumsum(supply)_(j-1))
+
+    so "days of supply on hand on day D" is two binary searches.
+    """
+
+    def __init__(self, claim_id, member_id, drug_id, fill_day, days_supply):
+        order = sort_order((member_id, drug_id, fill_day), tiebreak=claim_id)
+        self.order = order
+        self.claim_id = claim_id[order]
+        self.member_id = member_id[order]
+        self.drug_id = drug_id[order]
+        self.fill_day = fill_day[order].astype(np.int64)
+        self.days_supply = days_supply[order].astype(np.int64)
+        self._recorded = {}
+
+        keys = (self.member_id.astype(np.int64) << 32) | self.drug_id.astype(np.int64)
+        self.first_of_group = np.ones(len(keys), dtype=bool)
+        self.first_of_group[1:] = keys[1:] != keys[:-1]
+        self.group_starts = np.flatnonzero(self.first_of_group)
+        self.group_keys = keys[self.group_starts]
+        self.supply_end = self._supply_end()
+
+    @classmethod
+    def empty(cls):
+        return cls(*[np.empty(0, dtype=np.int64) for _ in range(5)])
+
+    def __len__(self):
+        return len(self.fill_day)
+
+    def _supply_end(self):
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        group = np.cumsum(self.first_of_group) - 1
+        total = np.cumsum(self.days_supply)
+        before = total - self.days_supply
+        group_before = before[self.group_starts][group]
+        candidate = self.fill_day - (before - group_before)
+
+        # Offset each group above every earlier one so a single running max
+        # restarts at each group boundary
+        low = candidate.min()
+        span = candidate.max() - low + 1
+        offset = group * span
+        running = np.maximum.accumulate(candidate - low + offset) - offset + low
+        return running + (total - group_before)
+
+    def _group(self, member_id, drug_id):
+        key = (int(member_id) << 32) | int(drug_id)
+        g = int(np.searchsorted(self.group_keys, key))
+        if g == len(self.group_keys) or self.group_keys[g] != key:
+            return None
+        end = self.group_starts[g + 1] if g + 1 < len(self.group_starts) else len(self)
+        return int(self.group_starts[g]), int(end)
+
+    def last_fill(self, member_id, drug_id, day):
+        """(supply_end, days_supply) of the latest fill on or before day, or None"""
+        recorded = [fill for fill in self._recorded.get((member_id, drug_id), ()) if fill[0] <= day]
+        bounds = self._group(member_id, drug_id)
+        lo, hi = bounds if bounds is not None else (0, 0)
+        last = lo + int(np.searchsorted(self.fill_day[lo:hi], day, side='right')) - 1
+        if not recorded:
+            return (int(self.supply_end[last]), int(self.days_supply[last])) if last >= lo else None
+
+        # Fills approved since the arrays were built (earlier in the same batch)
+        # can be dated before fills already on file, so replay both in fill-day
+        # order from the last array fill before the earliest recorded one
+        start = lo + int(np.searchsorted(self.fill_day[lo:hi], recorded[0][0], side='right')) - 1
+        found = (int(self.supply_end[start]), int(self.days_supply[start])) if start >= lo else None
+        later = [(int(self.fill_day[i]), int(self.days_supply[i])) for i in range(start + 1, last + 1)]
+        for fill_day, days_supply in sorted(later + recorded):
+            end = max(found[0], fill_day) if found else fill_day
+            found = (end + days_supply, days_supply)
+        return found
+
+    def days_remaining(self, member_id, drug_id, day):
+        """Days of supply still on hand on day, counting day itself"""
+        found = self.last_fill(member_id, drug_id, day)
+        return max(found[0] - day, 0) if found else 0
+
+    def refill_check(self, member_id, drug_id, day, threshold):
+        """
+        (too_soon, days_remaining, earliest_day) for a new fill on day. A refill
+        is allowed once at least `threshold` of the previous fill's supply is used.
+        """
+        found = self.last_fill(member_id, drug_id, day)
+        if found is None:
+            return False, 0, day
+        end, days_supply = found
+        earliest = end - int(refill_allowance(np.int64(days_supply), threshold))
+        return day < earliest, max(end - day, 0), max(earliest, day)
+
+    def record(self, member_id, drug_id, day, days_supply):
+        """Count a fill approved after the arrays were built in later checks"""
+        fills = self._recorded.setdefault((member_id, drug_id), [])
+        fills.append((day, days_supply))
+        fills.sort()
+
+    def overlaps(self, threshold):
+        """
+        For every fill: overlap_days, the supply still on hand from earlier
+        fills of the same drug on its fill day, and whether it was too soon.
+        """
+        previous_end = np.zeros(len(self), dtype=np.int64)
+        previous_end[1:] = self.supply_end[:-1]
+        previous_supply = np.zeros(len(self), dtype=np.int64)
+        previous_supply[1:] = self.days_supply[:-1]
+
+        has_previous = ~self.first_of_group
+        overlap_days = np.where(has_previous, np.clip(previous_end - self.fill_day, 0, None), 0)
+        earliest = previous_end - refill_allowance(previous_supply, threshold)
+        too_soon = has_previous & (self.fill_day < earliest)
+        return overlap_days, too_soon, np.where(has_previous, earliest, self.fill_day)
+
+
+class RefillService:
+    """Refill-too-soon checks for adjudication and the batch overlap report"""
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    @staticmethod
+    def threshold():
+        return current_app.config.get('REFILL_TOO_SOON_THRESHOLD', 0.75)
+
+    @staticmethod
+    def load(start_date, end_date, pairs=None):
+        """
+        Supply history for fills between start_date and end_date, optionally
+        only for the given (member_id, drug_id) pairs, in one streamed query.
+        """
+        if np is None:
+            raise RuntimeError('Refill checks require numpy')
+
+        sql = SUPPLY_COLUMNS_SQL
+        params = {'statuses': list(SUPPLY_STATUSES), 'start_date': start_date, 'end_date': end_date}
+        if pairs is not None:
+            if not pairs:
+                return SupplyTimeline.empty()
+            pairs = sorted(pairs)
+            sql += """
+      AND (member_id, drug_id) IN (
+          SELECT * FROM unnest(CAST(:pair_members AS integer[]), CAST(:pair_drugs AS integer[]))
+      )
+"""
+            params['pair_members'] = [member_id for member_id, _ in pairs]
+            params['pair_drugs'] = [drug_id for _, drug_id in pairs]
+
+        chunks = []
+        result = db.session.execute(text(sql).execution_options(yield_per=200000), params)
+        try:
+            for partition in result.partitions():
+                chunks.append([np.array(column, dtype=np.int64) for column in zip(*partition)])
+        finally:
+            result.close()
+
+        if not chunks:
+            return SupplyTimeline.empty()
+        return SupplyTimeline(*[np.concatenate(parts) for parts in zip(*chunks)])
+
+    @staticmethod
+    def for_claims(claims):
+        """Timeline covering the members and drugs of an adjudication batch"""
+        lookback = timedelta(days=current_app.config.get('REFILL_LOOKBACK_DAYS', 180))
+        dates = [claim.fill_date for claim in claims]
+        return RefillService.load(min(dates) - lookback, max(dates),
+                                  {(claim.member_id, claim.drug_id) for claim in claims})
+
+    @staticmethod
+    def report(start_date, end_date, limit=100):
+        """
+        Overlapping supply and refill-too-soon fills between start_date and
+        end_date. Earlier fills back to REFILL_LOOKBACK_DAYS are loaded too so
+        the first fills in the window see the supply already on hand.
+        """
+        threshold = RefillService.threshold()
+        lookback = timedelta(days=current_app.config.get('REFILL_LOOKBACK_DAYS', 180))
+        timeline = RefillService.load(start_date - lookback, end_date)
+        overlap_days, too_soon, earliest = timeline.overlaps(threshold)
+
+        in_window = timeline.fill_day >= to_day(start_date)
+        overlapping = in_window & (overlap_days > 0)
+        flagged = np.flatnonzero(in_window & too_soon)
+        top = flagged[np.lexsort((timeline.claim_id[flagged], -overlap_days[flagged]))][:limit]
+
+        claim_numbers = {}
+        if len(top):
+            claim_numbers = dict(db.session.execute(
+                text('SELECT id, claim_number FROM claims WHERE id = ANY(:ids)'),
+                {'ids': [int(i) for i in timeline.claim_id[top]]}
+            ).all())
+
+        distribution = []
+        for low, high in OVERLAP_BUCKETS:
+            in_bucket = overlapping & (overlap_days >= low)
+            if high is not None:
+                in_bucket &= overlap_days <= high
+            distribution.append({
+                'overlap_days': f'{low}-{high}' if high is not None else f'{low}+',
+                'claims': int(in_bucket.sum())
+            })
+
+        return {
+            'threshold': threshold,
+            'claims_checked': int(in_window.sum()),
+            'overlapping_claims': int(overlapping.sum()),
+            'refill_too_soon_claims': int(len(flagged)),
+            'members_affected': int(len(np.unique(timeline.member_id[flagged]))),
+            'overlap_days_total': int(overlap_days[in_window].sum()),
+            'overlap_distribution': distribution,
+            'claims': [
+                {
+                    'claim_id': int(timeline.claim_id[i]),
+                    'claim_number': claim_numbers.get(int(timeline.claim_id[i])),
+                    'member_id': int(timeline.member_id[i]),
+                    'drug_id': int(timeline.drug_id[i]),
+                    'fill_date': to_date(timeline.fill_day[i]).isoformat(),
+                    'days_supply': int(timeline.days_supply[i]),
+                    'overlap_days': int(overlap_days[i]),
+                    'earliest_refill_date': to_date(earliest[i]).isoformat()
+                }
+                for i in top
+            ]
+        }
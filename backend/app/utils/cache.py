@@ -0,0 +1,187 @@
+from flask import current_app, request
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import pickle
+import threading
+import time
+
+try:
+    import redis
+except ImportError:  # optional shared backend
+    redis = None
+
+
+class LRUBackend:
+    """In-process LRU cache with per-entry TTL; version counters are never evicted"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self, name):
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def incr_version(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+
+class RedisBackend:
+    """Shared backend so every worker sees the same entries and invalidations"""
+
+    def __init__(self, url, prefix='pbm:cache:'):
+        if redis is None:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.setex(self._prefix + key, int(max(ttl, 1)), pickle.dumps(value))
+
+    def get_version(self, name):
+        raw = self._client.get(f'{self._prefix}version:{name}')
+        return int(raw) if raw is not None else 0
+
+    def incr_version(self, name):
+        return self._client.incr(f'{self._prefix}version:{name}')
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class ResponseCache:
+    """
+    Response cache for read-heavy GET endpoints. Keys combine the endpoint, the
+    normalized query string and the current version of each data namespace the
+    view depends on; bumping a namespace (cache.invalidate('claims')) orphans
+    every entry built from it. Concurrent misses for the same key are coalesced
+    so only one request per process computes the response.
+
+    The memory backend keeps versions per process, so an invalidation made in
+    the adjudication worker or a maintenance script never reaches the web
+    processes, which serve their entries until CACHE_DEFAULT_TTL. Set
+    CACHE_BACKEND=redis (with the redis package) to share invalidations.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        if backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        app.extensions['response_cache'] = self
+
+    @property
+    def enabled(self):
+        return self.backend is not None and current_app.config.get('CACHE_BACKEND', 'memory') != 'none'
+
+    def invalidate(self, *namespaces):
+        """Bump namespace versions after a write; call once the transaction has committed"""
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            self.backend.incr_version(namespace)
+
+    def get_or_compute(self, key, compute, ttl, cacheable=lambda value: True, wait_timeout=30):
+        value = self.backend.get(key)
+        if value is not None:
+            return value, True
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            # Another request is computing the same key; reuse its answer
+            if flight.event.wait(wait_timeout) and not flight.failed:
+                return flight.result, True
+            return compute(), False
+
+        try:
+            value = compute()
+            if cacheable(value):
+                self.backend.set(key, value, ttl)
+            flight.result = value
+            return value, False
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def make_key(self, namespaces):
+        args = sorted(request.args.items(multi=True))
+        view_args = sorted((request.view_args or {}).items())
+        versions = [(name, self.backend.get_version(name)) for name in namespaces]
+        raw = repr((request.endpoint, view_args, args, versions))
+        return f'{request.endpoint}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+    def cached(self, *namespaces, ttl=None):
+        """Decorator caching a view's successful responses until TTL or invalidation"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+
+                def compute():
+                    response = current_app.make_response(view(*args, **kwargs))
+                    return response.get_data(), response.status_code, response.mimetype
+
+                (body, status, mimetype), hit = self.get_or_compute(
+                    self.make_key(namespaces),
+                    compute,
+                    ttl or current_app.config.get('CACHE_DEFAULT_TTL', 60),
+                    cacheable=lambda value: value[1] == 200
+                )
+                response = current_app.response_class(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+
+cache = ResponseCache()
@@ -0,0 +1,109 @@
+from app import db
+from sqlalchemy import tuple_, func, select
+from datetime import date, datetime
+import base64
+import json
+
+
+MAX_CURSOR_LIMIT = 1000
+COUNT_MODES = ('none', 'estimated', 'exact')
+
+
+def encode_cursor(values):
+    """Encode the sort-key values of the last row on a page as an opaque token"""
+    payload = [v.isoformat() if isinstance(v, (date, datetime)) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Decode a cursor token back into typed sort-key values, raising ValueError if invalid"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError('Invalid cursor')
+
+    values = []
+    for column, value in zip(columns, payload):
+        python_type = column.type.python_type
+        try:
+            if python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif not isinstance(value, python_type):
+                raise ValueError
+        except (ValueError, TypeError):
+            raise ValueError('Invalid cursor')
+        values.append(value)
+    return values
+
+
+def estimate_count(query):
+    """Row estimate from the PostgreSQL planner instead of a full COUNT(*)"""
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+
+    compiled = query.order_by(None).statement.compile(
+        dialect=connection.dialect,
+        compile_kwargs={'render_postcompile': True}
+    )
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def exact_count(query):
+    return db.session.execute(
+        select(func.count()).select_from(query.order_by(None).subquery())
+    ).scalar()
+
+
+def keyset_paginate(query, columns, cursor=None, limit=20, descending=False, count='none'):
+    """
+    Seek-based pagination: filter on the sort key of the last row seen instead of
+    OFFSET, so every page is an index range scan regardless of depth. The columns
+    must end with a unique column (normally the primary key) to break ties.
+    """
+    limit = max(1, min(limit, MAX_CURSOR_LIMIT))
+
+    if count not in COUNT_MODES:
+        raise ValueError(f"count must be one of {', '.join(COUNT_MODES)}")
+
+    total = None
+    if count == 'exact':
+        total = exact_count(query)
+    elif count == 'estimated':
+        total = estimate_count(query)
+
+    if cursor:
+        values = decode_cursor(cursor, columns)
+        if descending:
+            query = query.filter(tuple_(*columns) < tuple_(*values))
+        else:
+            query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    query = query.order_by(*[c.desc() if descending else c.asc() for c in columns])
+    rows = query.limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return {
+        'items': rows,
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'limit': limit,
+        'total': total
+    }
@@ -0,0 +1,127 @@
+from sqlalchemy import text
+from datetime import date
+import re
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    """claims, 2024-03-01 -> claims_y2024m03"""
+    return f'{table}_y{month.year:04d}m{month.month:02d}'
+
+
+def default_partition_name(table):
+    return f'{table}_default'
+
+
+def _exists(connection, name):
+    return connection.execute(text('SELECT to_regclass(:name) IS NOT NULL'), {'name': name}).scalar()
+
+
+def create_default_partition(connection, table):
+    """Catch-all partition so inserts never fail for a month that has no partition yet"""
+    connection.execute(text(
+        f'CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {table} DEFAULT'
+    ))
+
+
+def create_month_partition(connection, table, month, column='fill_date'):
+    """
+    Create the partition for one month. Rows for that month already sitting in
+    the default partition are moved into it first, since Postgres refuses to
+    add a partition whose range overlaps rows in the default. Returns False if
+    the partition already exists.
+    """
+    month = month_start(month)
+    name = partition_name(table, month)
+    if _exists(connection, name):
+        return False
+
+    bounds = {'lower': month, 'upper': add_months(month, 1)}
+    default = default_partition_name(table)
+    stranded = _exists(connection, default) and connection.execute(text(
+        f'SELECT EXISTS (SELECT 1 FROM {default} WHERE {column} >= :lower AND {column} < :upper)'
+    ), bounds).scalar()
+
+    if not stranded:
+        connection.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+        ))
+        return True
+
+    connection.execute(text(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    connection.execute(text(
+        f'INSERT INTO {name} SELECT * FROM {default} WHERE {column} >= :lower AND {column} < :upper'
+    ), bounds)
+    connection.execute(text(f'DELETE FROM {default} WHERE {column} >= :lower AND {column} < :upper'), bounds)
+    # ATTACH builds any parent indexes the new table is missing
+    connection.execute(text(
+        f"ALTER TABLE {table} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lower']}') TO ('{bounds['upper']}')"
+    ))
+    return True
+
+
+def ensure_partitions(connection, table, first_month, last_month):
+    """Create every missing monthly partition from first_month through last_month"""
+    created = []
+    month = month_start(first_month)
+    while month <= month_start(last_month):
+        if create_month_partition(connection, table, month):
+            created.append(partition_name(table, month))
+        month = add_months(month, 1)
+    return created
+
+
+def list_partitions(connection, table):
+    """(name, bound expression) for each partition attached to table"""
+    return connection.execute(text("""
+        SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = CAST(:table AS regclass)
+        ORDER BY c.relname
+    """), {'table': table}).all()
+
+
+def partitions_before(connection, table, before):
+    """(name, month) of each attached monthly partition that ends on or before `before`"""
+    pattern = re.compile(rf'^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$')
+    found = []
+    for name, _ in list_partitions(connection, table):
+        match = pattern.match(name)
+        if match:
+            month = date(int(match[1]), int(match[2]), 1)
+            if add_months(month, 1) <= before:
+                found.append((name, month))
+    return found
+
+
+def detach_partition(connection, table, name, drop=False, concurrently=False):
+    """
+    Detach one partition, keeping the table for archiving unless drop=True.
+    CONCURRENTLY avoids blocking queries on the parent but needs an
+    autocommit connection.
+    """
+    connection.execute(text(
+        f"ALTER TABLE {table} DETACH PARTITION {name}{' CONCURRENTLY' if concurrently else ''}"
+    ))
+    if drop:
+        connection.execute(text(f'DROP TABLE {name}'))
+
+
+def detach_partitions(connection, table, before, drop=False, concurrently=False):
+    """Detach monthly partitions that end on or before `before`; returns their names"""
+    detached = []
+    for name, _ in partitions_before(connection, table, before):
+        detach_partition(connection, table, name, drop, concurrently)
+        detached.append(name)
+    return detached
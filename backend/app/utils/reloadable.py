@@ -0,0 +1,53 @@
+from flask import current_app
+import threading
+import time
+
+
+class ReloadableIndex:
+    """
+    Base for read-mostly in-process indexes. The built structure is immutable and
+    replaced wholesale, so lookups never lock. A cheap version query is checked at
+    most every `refresh_setting` seconds (catching writes made by other workers);
+    invalidate() forces a rebuild on the next lookup in this process.
+    """
+
+    refresh_setting = None
+    default_refresh_interval = 30
+
+    def __init__(self):
+        self._snapshot = None
+        self._version = None
+        self._stale = False
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def load_version(self):
+        """Return a value that changes whenever the source data changes"""
+        raise NotImplementedError
+
+    def build(self):
+        """Load the source data and return a new immutable snapshot"""
+        raise NotImplementedError
+
+    def invalidate(self):
+        self._stale = True
+
+    def current(self):
+        interval = current_app.config.get(self.refresh_setting, self.default_refresh_interval)
+        snapshot = self._snapshot
+        if snapshot is not None and not self._stale and time.monotonic() - self._checked_at < interval:
+            return snapshot
+
+        # One rebuild at a time; concurrent lookups keep using the old snapshot
+        if not self._lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            stale, self._stale = self._stale, False
+            version = self.load_version()
+            if self._snapshot is None or stale or version != self._version:
+                self._snapshot = self.build()
+                self._version = version
+            self._checked_at = time.monotonic()
+            return self._snapshot
+        finally:
+            self._lock.release()
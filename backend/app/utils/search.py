@@ -0,0 +1,37 @@
+from sqlalchemy import func, or_
+import re
+
+
+SEARCH_CONFIG = 'simple'
+MAX_SEARCH_TERMS = 8
+
+_TERM = re.compile(r'\w+', re.UNICODE)
+_NDC = re.compile(r'^[\d-]+$')
+
+
+def prefix_tsquery(text, config=SEARCH_CONFIG):
+    """
+    Build a prefix-matching tsquery ('ator:* & 20:*') from free text. Input is
+    reduced to word characters before it reaches to_tsquery, so user text can
+    never inject tsquery operators. Returns None when nothing searchable is left.
+    """
+    terms = _TERM.findall(text.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return func.to_tsquery(config, ' & '.join(f'{term}:*' for term in terms))
+
+
+def looks_like_ndc(text):
+    """NDCs are digits and hyphens; search them by prefix rather than full text"""
+    return bool(_NDC.match(text.strip())) and any(c.isdigit() for c in text)
+
+
+def trigram_search(columns, text):
+    """
+    Typo-tolerant match for pg_trgm GIN-indexed columns: a row qualifies when any
+    column is similar to text (the % operator, pg_trgm.similarity_threshold) and
+    is ranked by its best similarity. Returns (condition, rank).
+    """
+    condition = or_(*[column.op('%')(text) for column in columns])
+    rank = func.greatest(*[func.similarity(column, text) for column in columns])
+    return condition, rank
@@ -0,0 +1,66 @@
+"""add analytics snapshot tables
+
+Revision ID: 27aaae58ac7e
+Revises: 3d1b9eebba8b
+Create Date: 2026-10-17 11:20:36.118945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '27aaae58ac7e'
+down_revision = '3d1b9eebba8b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('analytics_snapshots',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=30), nullable=False),
+    sa.Column('lookback_days', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_analytics_snapshot_lookup', 'analytics_snapshots',
+                    ['kind', 'lookback_days', 'status', 'computed_at'], unique=False)
+    op.create_table('member_risk_scores',
+    sa.Column('snapshot_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('member_name', sa.String(length=201), nullable=True),
+    sa.Column('claim_count', sa.Integer(), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('unique_drugs', sa.Integer(), nullable=False),
+    sa.Column('avg_days_supply', sa.Numeric(precision=10, scale=2), nullable=True),
+    sa.Column('risk_score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['snapshot_id'], ['analytics_snapshots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('snapshot_id', 'rank')
+    )
+    op.create_table('duplicate_claim_groups',
+    sa.Column('snapshot_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('member_name', sa.String(length=201), nullable=True),
+    sa.Column('drug_name', sa.String(length=255), nullable=True),
+    sa.Column('fill_date', sa.Date(), nullable=False),
+    sa.Column('claim_count', sa.Integer(), nullable=False),
+    sa.Column('claim_numbers', postgresql.ARRAY(sa.String(length=50)), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['snapshot_id'], ['analytics_snapshots.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('snapshot_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('duplicate_claim_groups')
+    op.drop_table('member_risk_scores')
+    op.drop_index('idx_analytics_snapshot_lookup', table_name='analytics_snapshots')
+    op.drop_table('analytics_snapshots')
@@ -0,0 +1,54 @@
+"""add claim_daily_stats rollup
+
+Revision ID: 3d1b9eebba8b
+Revises: 5e66987277fc
+Create Date: 2026-10-17 10:02:17.554210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d1b9eebba8b'
+down_revision = '5e66987277fc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('claim_daily_stats',
+    sa.Column('fill_date', sa.Date(), nullable=False),
+    sa.Column('drug_id', sa.Integer(), nullable=False),
+    sa.Column('pharmacy_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('claim_count', sa.Integer(), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('plan_paid_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('member_copay', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['drug_id'], ['drugs.id'], ),
+    sa.ForeignKeyConstraint(['pharmacy_id'], ['pharmacies.id'], ),
+    sa.PrimaryKeyConstraint('fill_date', 'drug_id', 'pharmacy_id', 'status')
+    )
+    op.create_index('idx_claim_daily_stats_drug', 'claim_daily_stats', ['drug_id', 'fill_date'], unique=False)
+    op.create_index('idx_claim_daily_stats_pharmacy', 'claim_daily_stats', ['pharmacy_id', 'fill_date'], unique=False)
+
+    # Backfill from existing claims
+    op.execute("""
+        INSERT INTO claim_daily_stats (
+            fill_date, drug_id, pharmacy_id, status,
+            claim_count, total_cost, plan_paid_amount, member_copay, updated_at
+        )
+        SELECT fill_date, drug_id, pharmacy_id, status,
+               COUNT(*), SUM(total_cost),
+               COALESCE(SUM(plan_paid_amount), 0), COALESCE(SUM(member_copay), 0), NOW()
+        FROM claims
+        GROUP BY fill_date, drug_id, pharmacy_id, status
+    """)
+
+
+def downgrade():
+    op.drop_index('idx_claim_daily_stats_pharmacy', table_name='claim_daily_stats')
+    op.drop_index('idx_claim_daily_stats_drug', table_name='claim_daily_stats')
+    op.drop_table('claim_daily_stats')
@@ -0,0 +1,51 @@
+"""add member_accumulators
+
+Revision ID: 4ef4a78139fc
+Revises: 96fe93149a1b
+Create Date: 2026-10-17 15:04:41.218093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4ef4a78139fc'
+down_revision = '96fe93149a1b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('member_accumulators',
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('plan_year', sa.Integer(), nullable=False),
+    sa.Column('claim_count', sa.Integer(), nullable=False),
+    sa.Column('deductible_applied', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('member_copay', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('member_coinsurance', sa.Numeric(precision=12, scale=2), nullable=False),
+    sa.Column('plan_paid_amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('total_cost', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['member_id'], ['members.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('member_id', 'plan_year')
+    )
+
+    # Backfill from existing adjudicated claims
+    op.execute("""
+        INSERT INTO member_accumulators (
+            member_id, plan_year, claim_count, deductible_applied, member_copay,
+            member_coinsurance, plan_paid_amount, total_cost, updated_at
+        )
+        SELECT member_id, CAST(EXTRACT(YEAR FROM fill_date) AS integer), COUNT(*),
+               COALESCE(SUM(deductible_applied), 0), COALESCE(SUM(member_copay), 0),
+               COALESCE(SUM(member_coinsurance), 0), COALESCE(SUM(plan_paid_amount), 0),
+               COALESCE(SUM(total_cost), 0), NOW()
+        FROM claims
+        WHERE status IN ('approved', 'paid')
+        GROUP BY member_id, CAST(EXTRACT(YEAR FROM fill_date) AS integer)
+    """)
+
+
+def downgrade():
+    op.drop_table('member_accumulators')
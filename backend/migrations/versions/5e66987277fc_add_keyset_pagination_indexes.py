@@ -0,0 +1,28 @@
+"""add keyset pagination indexes
+
+Revision ID: 5e66987277fc
+Revises:
+Create Date: 2026-10-17 09:12:44.381502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e66987277fc'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Base tables are created by scripts/init_db.py; these back the
+    # (name, id) seek used by cursor pagination on drugs and pharmacies.
+    op.create_index('idx_drug_name', 'drugs', ['name', 'id'], unique=False)
+    op.create_index('idx_pharmacy_name', 'pharmacies', ['name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_pharmacy_name', table_name='pharmacies')
+    op.drop_index('idx_drug_name', table_name='drugs')
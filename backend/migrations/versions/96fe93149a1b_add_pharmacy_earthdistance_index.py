@@ -0,0 +1,32 @@
+"""add pharmacy earthdistance index
+
+Revision ID: 96fe93149a1b
+Revises: e0a47a7c6466
+Create Date: 2026-10-17 14:12:08.530417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '96fe93149a1b'
+down_revision = 'e0a47a7c6466'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+    op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+    
+    with op.get_context().autocommit_block():
+        op.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_pharmacy_earth ON pharmacies '
+            'USING gist (ll_to_earth(CAST(latitude AS FLOAT), CAST(longitude AS FLOAT)))'
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_pharmacy_earth')
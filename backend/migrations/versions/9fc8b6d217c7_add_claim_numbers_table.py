@@ -0,0 +1,38 @@
+"""add claim numbers table
+
+Revision ID: 9fc8b6d217c7
+Revises: c15b05b9a925
+Create Date: 2026-10-17 18:40:27.553108
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9fc8b6d217c7'
+down_revision = 'c15b05b9a925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('claim_numbers',
+    sa.Column('claim_number', sa.String(length=50), nullable=False),
+    sa.Column('fill_date', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('claim_number')
+    )
+
+    # Register the numbers already on file. If a number was written twice in
+    # different months while only the application guarded it, the first claim
+    # keeps it; the later copies stay in claims but are not registered.
+    op.execute("""
+        INSERT INTO claim_numbers (claim_number, fill_date)
+        SELECT DISTINCT ON (claim_number) claim_number, fill_date
+        FROM claims
+        ORDER BY claim_number, id
+    """)
+
+
+def downgrade():
+    op.drop_table('claim_numbers')
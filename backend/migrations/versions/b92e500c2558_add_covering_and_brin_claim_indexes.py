@@ -0,0 +1,63 @@
+"""add covering and brin claim indexes
+
+Revision ID: b92e500c2558
+Revises: ef768979c2dd
+Create Date: 2026-10-17 16:31:09.813648
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b92e500c2558'
+down_revision = 'ef768979c2dd'
+branch_labels = None
+depends_on = None
+
+NEW_INDEXES = {
+    'idx_claim_date_covering': '(fill_date, status) INCLUDE (total_cost, drug_id, member_id, pharmacy_id, days_supply)',
+    'idx_claim_fill_date_brin': 'USING brin (fill_date) WITH (pages_per_range = 32)',
+}
+
+# Each is a leading prefix of a composite index that stays, or (idx_claim_dates)
+# has the same key as idx_claim_date_covering
+REDUNDANT_INDEXES = {
+    'ix_claims_member_id': '(member_id)',
+    'ix_claims_drug_id': '(drug_id)',
+    'ix_claims_fill_date': '(fill_date)',
+    'ix_claims_status': '(status)',
+    'idx_claim_dates': '(fill_date, status)',
+}
+
+
+def _create_partitioned_index(name, definition):
+    """
+    CREATE INDEX CONCURRENTLY is not supported on a partitioned table, so
+    create the parent index on the parent alone (invalid until every partition
+    has one), build each partition's index concurrently and attach it.
+    """
+    op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY claims {definition}')
+    partitions = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST('claims' AS regclass) ORDER BY c.relname"
+    )).scalars().all()
+
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name} ON {partition} {definition}')
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {partition}_{name}')
+
+
+def upgrade():
+    for name, definition in NEW_INDEXES.items():
+        _create_partitioned_index(name, definition)
+    for name in REDUNDANT_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def downgrade():
+    for name, definition in REDUNDANT_INDEXES.items():
+        _create_partitioned_index(name, definition)
+    for name in NEW_INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,46 @@
+"""add claim updated_at index
+
+Revision ID: c15b05b9a925
+Revises: e84af55a3066
+Create Date: 2026-10-17 18:12:44.201937
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c15b05b9a925'
+down_revision = 'e84af55a3066'
+branch_labels = None
+depends_on = None
+
+# The in-memory analytics engine refreshes every few seconds with
+# WHERE updated_at >= :since, which otherwise scans every partition
+INDEXES = {
+    'idx_claim_updated_at': '(updated_at)',
+}
+
+
+def _create_partitioned_index(name, definition):
+    """Parent index ON ONLY claims, then each partition's concurrently, attached"""
+    op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY claims {definition}')
+    partitions = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST('claims' AS regclass) ORDER BY c.relname"
+    )).scalars().all()
+
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name} ON {partition} {definition}')
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {partition}_{name}')
+
+
+def upgrade():
+    for name, definition in INDEXES.items():
+        _create_partitioned_index(name, definition)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
@@ -0,0 +1,48 @@
+"""add trigram search indexes
+
+Revision ID: e0a47a7c6466
+Revises: f0217f65a94e
+Create Date: 2026-10-17 13:36:52.906114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e0a47a7c6466'
+down_revision = 'f0217f65a94e'
+branch_labels = None
+depends_on = None
+
+
+TRIGRAM_INDEXES = (
+    ('idx_member_first_name_trgm', 'members', 'first_name'),
+    ('idx_member_last_name_trgm', 'members', 'last_name'),
+    ('idx_member_member_id_trgm', 'members', 'member_id'),
+    ('idx_member_email_trgm', 'members', 'email'),
+    ('idx_member_full_name_trgm', 'members', "(first_name || ' ' || last_name)"),
+    ('idx_pharmacy_name_trgm', 'pharmacies', 'name'),
+    ('idx_pharmacy_chain_name_trgm', 'pharmacies', 'chain_name'),
+    ('idx_pharmacy_ncpdp_id_trgm', 'pharmacies', 'ncpdp_id'),
+    ('idx_pharmacy_city_trgm', 'pharmacies', 'city'),
+)
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    
+    # CONCURRENTLY so a 10M-row members table stays writable while indexes build;
+    # it cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, table, expression in TRIGRAM_INDEXES:
+            op.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+                f'ON {table} USING gin ({expression} gin_trgm_ops)'
+            )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(TRIGRAM_INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,65 @@
+"""add claim duplicate flag
+
+Revision ID: e84af55a3066
+Revises: b92e500c2558
+Create Date: 2026-10-17 16:54:37.340574
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e84af55a3066'
+down_revision = 'b92e500c2558'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'idx_claim_duplicate_key': '(member_id, drug_id, fill_date, pharmacy_id)',
+    'idx_claim_flagged_duplicates': '(id) WHERE is_duplicate',
+}
+
+
+def _create_partitioned_index(name, definition):
+    """Parent index ON ONLY claims, then each partition's concurrently, attached"""
+    op.execute(f'CREATE INDEX IF NOT EXISTS {name} ON ONLY claims {definition}')
+    partitions = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST('claims' AS regclass) ORDER BY c.relname"
+    )).scalars().all()
+
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_{name} ON {partition} {definition}')
+            op.execute(f'ALTER INDEX {name} ATTACH PARTITION {partition}_{name}')
+
+
+def upgrade():
+    # A constant default is stored in the catalog, so this does not rewrite claims
+    op.add_column('claims', sa.Column('is_duplicate', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    # Flag the claims already on file the same way new writes are flagged:
+    # every active claim after the first for a member / drug / pharmacy / fill date
+    op.execute("""
+        UPDATE claims c
+        SET is_duplicate = true
+        FROM (
+            SELECT id, fill_date,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY member_id, drug_id, fill_date, pharmacy_id ORDER BY id
+                   ) AS position
+            FROM claims
+            WHERE status NOT IN ('denied', 'reversed')
+        ) ranked
+        WHERE c.id = ranked.id AND c.fill_date = ranked.fill_date AND ranked.position > 1
+    """)
+
+    for name, definition in INDEXES.items():
+        _create_partitioned_index(name, definition)
+
+
+def downgrade():
+    for name in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {name}')
+    op.drop_column('claims', 'is_duplicate')
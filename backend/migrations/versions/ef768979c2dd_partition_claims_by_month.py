@@ -0,0 +1,94 @@
+"""partition claims by month
+
+Revision ID: ef768979c2dd
+Revises: f122f517b183
+Create Date: 2026-10-17 16:12:41.842029
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import date
+
+
+# revision identifiers, used by Alembic.
+revision = 'ef768979c2dd'
+down_revision = 'f122f517b183'
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+INDEXES = [
+    ('ix_claims_member_id', ['member_id'], None),
+    ('ix_claims_drug_id', ['drug_id'], None),
+    ('ix_claims_pharmacy_id', ['pharmacy_id'], None),
+    ('ix_claims_fill_date', ['fill_date'], None),
+    ('ix_claims_status', ['status'], None),
+    ('idx_claim_dates', ['fill_date', 'status'], None),
+    ('idx_claim_member_date', ['member_id', 'fill_date'], None),
+    ('idx_claim_drug_date', ['drug_id', 'fill_date'], None),
+    ('idx_claim_status_date', ['status', 'fill_date'], None),
+    ('idx_claim_pending_queue', ['submitted_at', 'id'], "status = 'pending'"),
+]
+
+
+def _add_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _rebuild_claims(old_name, partitioned):
+    """
+    Copy claims into a new table of the other shape. Keys and indexes are
+    added after the load, which is much faster than maintaining them per row.
+    """
+    op.execute(f'ALTER TABLE claims RENAME TO {old_name}')
+    op.execute(
+        f"CREATE TABLE claims (LIKE {old_name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        f"{' PARTITION BY RANGE (fill_date)' if partitioned else ''}"
+    )
+
+    if partitioned:
+        # One partition per month that has claims, through a few months ahead,
+        # so the copy routes rows directly and never touches the default
+        op.execute('CREATE TABLE claims_default PARTITION OF claims DEFAULT')
+        first, last = op.get_bind().execute(sa.text(f'SELECT MIN(fill_date), MAX(fill_date) FROM {old_name}')).one()
+        today = date.today()
+        month = (first or today).replace(day=1)
+        last = max(last or today, today).replace(day=1)
+        for _ in range(MONTHS_AHEAD):
+            last = _add_month(last)
+        while month <= last:
+            upper = _add_month(month)
+            op.execute(
+                f"CREATE TABLE claims_y{month.year:04d}m{month.month:02d} PARTITION OF claims "
+                f"FOR VALUES FROM ('{month}') TO ('{upper}')"
+            )
+            month = upper
+
+    op.execute(f'INSERT INTO claims SELECT * FROM {old_name}')
+    op.execute('ALTER SEQUENCE claims_id_seq OWNED BY claims.id')
+    op.execute(f'DROP TABLE {old_name}')
+
+    if partitioned:
+        op.create_primary_key('claims_pkey', 'claims', ['id', 'fill_date'])
+        op.create_unique_constraint('uq_claim_number_fill_date', 'claims', ['claim_number', 'fill_date'])
+    else:
+        op.create_primary_key('claims_pkey', 'claims', ['id'])
+        op.create_index('ix_claims_claim_number', 'claims', ['claim_number'], unique=True)
+
+    for column, referent in (('member_id', 'members'), ('drug_id', 'drugs'), ('pharmacy_id', 'pharmacies')):
+        op.create_foreign_key(f'claims_{column}_fkey', 'claims', referent, [column], ['id'])
+
+    for name, columns, where in INDEXES:
+        op.create_index(name, 'claims', columns, postgresql_where=sa.text(where) if where else None)
+
+    op.execute('ANALYZE claims')
+
+
+def upgrade():
+    _rebuild_claims('claims_unpartitioned', partitioned=True)
+
+
+def downgrade():
+    # Partitions detached since the upgrade are not attached here, so their rows are not copied back
+    _rebuild_claims('claims_partitioned', partitioned=False)
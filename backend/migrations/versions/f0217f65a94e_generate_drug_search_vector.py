@@ -0,0 +1,47 @@
+"""generate drug search_vector
+
+Revision ID: f0217f65a94e
+Revises: 27aaae58ac7e
+Create Date: 2026-10-17 12:41:08.230417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0217f65a94e'
+down_revision = '27aaae58ac7e'
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(generic_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(brand_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(therapeutic_class, '')), 'C') || "
+    "setweight(to_tsvector('simple', coalesce(manufacturer, '')), 'D')"
+)
+
+
+def upgrade():
+    # The plain column was never populated; replace it with a stored generated
+    # column so PostgreSQL keeps it current on every insert and update.
+    op.drop_index('idx_drug_search', table_name='drugs')
+    op.drop_column('drugs', 'search_vector')
+    op.execute(
+        f"ALTER TABLE drugs ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    )
+    op.create_index('idx_drug_search', 'drugs', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('idx_drug_ndc_prefix', 'drugs', ['ndc'], unique=False,
+                    postgresql_ops={'ndc': 'varchar_pattern_ops'})
+
+
+def downgrade():
+    op.drop_index('idx_drug_ndc_prefix', table_name='drugs')
+    op.drop_index('idx_drug_search', table_name='drugs')
+    op.drop_column('drugs', 'search_vector')
+    op.add_column('drugs', sa.Column('search_vector', sa.dialects.postgresql.TSVECTOR(), nullable=True))
+    op.create_index('idx_drug_search', 'drugs', ['search_vector'], unique=False, postgresql_using='gin')
@@ -0,0 +1,29 @@
+"""add pending claim queue index
+
+Revision ID: f122f517b183
+Revises: 4ef4a78139fc
+Create Date: 2026-10-17 15:47:13.604529
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f122f517b183'
+down_revision = '4ef4a78139fc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_claim_pending_queue "
+            "ON claims (submitted_at, id) WHERE status = 'pending'"
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute('DROP INDEX CONCURRENTLY IF EXISTS idx_claim_pending_queue')
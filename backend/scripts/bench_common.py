@@ -0,0 +1,76 @@
+"""
+Shared helpers for the benchmark scripts in this directory
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import statistics
+import time
+from app import db
+from sqlalchemy import text
+
+
+def timed(fn, repeat=10, warmup=1):
+    """Run fn repeatedly and return (median_ms, p95_ms, last_result)"""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    p95 = samples[min(len(samples) - 1, int(round(len(samples) * 0.95)) - 1)]
+    return statistics.median(samples), p95, result
+
+
+def print_row(label, median_ms, p95_ms):
+    print(f"  {label:<44} median {median_ms:>9.2f} ms   p95 {p95_ms:>9.2f} ms")
+
+
+def seed_synthetic_claims(count, days=365, table='claims', batch=500000):
+    """
+    Insert `count` synthetic claims spread over the last `days` days, drawing
+    member / drug / pharmacy ids from the rows already seeded by seed_data.py.
+    Generated entirely in SQL so tens of millions of rows load in minutes.
+    """
+    run_id = int(time.time())
+    inserted = 0
+    # Claims written to the live table also take their numbers in claim_numbers
+    register = ('INSERT INTO claim_numbers (claim_number, fill_date) SELECT * FROM new_claims'
+                if table == 'claims' else 'SELECT COUNT(*) FROM new_claims')
+    while inserted < count:
+        size = min(batch, count - inserted)
+        db.session.execute(text(f"""
+            WITH m AS (SELECT array_agg(id) AS ids FROM members),
+                 d AS (SELECT array_agg(id) AS ids FROM drugs),
+                 p AS (SELECT array_agg(id) AS ids FROM pharmacies),
+                 new_claims AS (
+                    INSERT INTO {table} (
+                        claim_number, member_id, drug_id, pharmacy_id, fill_date,
+                        quantity, days_supply, refill_number, submitted_amount, plan_paid_amount,
+                        member_copay, total_cost, status, is_generic_substitution, requires_prior_auth,
+                        is_compound, is_specialty, submitted_at, created_at, updated_at
+                    )
+                    SELECT 
+                        'BENCH' || :run_id || '-' || (:offset + g),
+                        m.ids[1 + floor(random() * array_length(m.ids, 1))::int],
+                        d.ids[1 + floor(random() * array_length(d.ids, 1))::int],
+                        p.ids[1 + floor(random() * array_length(p.ids, 1))::int],
+                        CURRENT_DATE - floor(random() * :days)::int,
+                        30, 30, 0, c.cost, c.cost - 10, 10, c.cost,
+                        (ARRAY['paid', 'paid', 'paid', 'approved', 'pending', 'denied'])[1 + floor(random() * 6)::int],
+                        false, false, false, false, NOW(), NOW(), NOW()
+                    FROM generate_series(1, :size) g
+                    CROSS JOIN m CROSS JOIN d CROSS JOIN p
+                    CROSS JOIN LATERAL (SELECT round((20 + random() * 480)::numeric, 2) + (g * 0) AS cost) c
+                    RETURNING claim_number, fill_date
+                 )
+            {register}
+        """), {'run_id': run_id, 'offset': inserted, 'size': size, 'days': days})
+        db.session.commit()
+        inserted += size
+        print(f"  seeded {inserted:,} / {count:,} claims")
@@ -0,0 +1,92 @@
+"""
+Benchmark PDC adherence over a synthetic measurement year (no database
+needed), or over the configured database with --database
+Run: python scripts/benchmark_adherence.py [--members 2000000] [--drugs-per-member 2] [--database]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app import create_app
+from app.services.adherence_service import proportion_of_days_covered, AdherenceService
+
+
+def synthetic_fills(members, fills_per_drug, drugs, drugs_per_member, classes, seed):
+    """
+    Maintenance therapy: each member refills a few drugs with a fixed days
+    supply, coming back after 0.9-1.5x that supply; one in ten refills
+    switches to another drug of the same class
+    """
+    rng = np.random.default_rng(seed)
+    shape = (members, drugs_per_member, fills_per_drug)
+
+    member_id = np.broadcast_to(np.arange(1, members + 1, dtype=np.int64)[:, None, None], shape)
+    first_drug = rng.integers(1, drugs + 1, size=(members, drugs_per_member, 1), dtype=np.int64)
+    other_drug = rng.integers(1, drugs + 1, size=shape, dtype=np.int64)
+    other_drug += first_drug % classes - other_drug % classes
+    drug_id = np.where(rng.random(shape) < 0.1, other_drug, first_drug)
+
+    days_supply = np.broadcast_to(
+        rng.choice(np.array([30, 30, 90], dtype=np.int64), size=(members, drugs_per_member, 1)), shape
+    )
+    gaps = (days_supply * rng.uniform(0.9, 1.5, size=shape)).astype(np.int64)
+    fill_day = rng.integers(0, 60, size=(members, drugs_per_member, 1)) + np.cumsum(gaps, axis=2) - gaps[:, :, :1]
+
+    member_id, drug_id, fill_day, days_supply = [
+        column.ravel() for column in (member_id, drug_id, fill_day, days_supply)
+    ]
+    return member_id, drug_id % classes, drug_id, fill_day, days_supply
+
+
+def elapsed(started):
+    return time.perf_counter() - started
+
+
+def benchmark_adherence():
+    parser = argparse.ArgumentParser(description='Benchmark PDC adherence')
+    parser.add_argument('--members', type=int, default=2000000)
+    parser.add_argument('--fills-per-drug', type=int, default=12, help='fills generated per member and drug')
+    parser.add_argument('--drugs', type=int, default=3000, help='distinct drugs in the synthetic catalog')
+    parser.add_argument('--drugs-per-member', type=int, default=2)
+    parser.add_argument('--classes', type=int, default=40, help='therapeutic classes in the synthetic catalog')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--database', action='store_true', help='time AdherenceService.report over the last year')
+    args = parser.parse_args()
+
+    if args.database:
+        app = create_app()
+        with app.app_context():
+            end_date = datetime.utcnow().date()
+            started = time.perf_counter()
+            report = AdherenceService.report(end_date - timedelta(days=364), end_date)
+            print(f"Adherence over {report['members_measured']:,} member/class pairs: {elapsed(started):.1f} s")
+            print(f"  {report['adherent']:,} adherent, {report['non_adherent']:,} below the threshold")
+        return
+
+    print(f"Generating {args.members:,} members x {args.drugs_per_member} drugs x {args.fills_per_drug} fills...")
+    columns = synthetic_fills(args.members, args.fills_per_drug, args.drugs, args.drugs_per_member,
+                              args.classes, args.seed)
+
+    started = time.perf_counter()
+    member_id, class_code, fills, index_day, covered, period_days = proportion_of_days_covered(
+        *columns, 0, 364
+    )
+    pdc = covered / period_days
+    pdc_s = elapsed(started)
+
+    in_year = int((columns[3] <= 364).sum())
+    adherent = pdc >= args.threshold
+    print(f"\nPDC over {in_year:,} fills in the year, {len(pdc):,} member/class pairs measured\n")
+    print(f"  {'shift + merge + PDC':<32} {pdc_s:>9.2f} s")
+    print(f"\n  {int(adherent.sum()):,} adherent, {int((~adherent).sum()):,} below {args.threshold:.0%}, "
+          f"average PDC {pdc.mean():.3f}")
+
+
+if __name__ == '__main__':
+    benchmark_adherence()
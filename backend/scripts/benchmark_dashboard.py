@@ -0,0 +1,97 @@
+"""
+Benchmark the analytics dashboard: the original four scans over claims
+versus the single GROUPING SETS pass over claim_daily_stats
+Run: python scripts/benchmark_dashboard.py [--seed 5000000] [--days 30] [--repeat 20]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Claim
+from app.services.analytics_service import AnalyticsService
+from app.services.claim_stats_service import ClaimStatsService
+from sqlalchemy import text
+from bench_common import timed, print_row, seed_synthetic_claims
+
+
+LEGACY_QUERIES = {
+    'totals': """
+        SELECT COUNT(id) AS total_claims, SUM(total_cost) AS total_cost
+        FROM claims WHERE fill_date >= :start_date
+    """,
+    'generic_vs_brand': """
+        SELECT d.is_generic, COUNT(c.id) AS claim_count, SUM(c.total_cost) AS total_cost
+        FROM claims c JOIN drugs d ON d.id = c.drug_id
+        WHERE c.fill_date >= :start_date
+        GROUP BY d.is_generic
+    """,
+    'top_drugs': """
+        SELECT d.name, d.is_generic, COUNT(c.id) AS claim_count, SUM(c.total_cost) AS total_cost
+        FROM claims c JOIN drugs d ON d.id = c.drug_id
+        WHERE c.fill_date >= :start_date
+        GROUP BY d.id, d.name, d.is_generic
+        ORDER BY SUM(c.total_cost) DESC, d.id
+        LIMIT 10
+    """,
+    'status_breakdown': """
+        SELECT status, COUNT(id) AS count
+        FROM claims WHERE fill_date >= :start_date
+        GROUP BY status
+    """,
+}
+
+
+def legacy_dashboard(start_date):
+    """The pre-rollup implementation: four independent scans of claims"""
+    return {
+        name: db.session.execute(text(sql), {'start_date': start_date}).all()
+        for name, sql in LEGACY_QUERIES.items()
+    }
+
+
+def benchmark_dashboard():
+    parser = argparse.ArgumentParser(description='Benchmark dashboard query paths')
+    parser.add_argument('--seed', type=int, default=0, help='synthetic claims to add before timing')
+    parser.add_argument('--days', type=int, default=30, help='dashboard window in days')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        if args.seed:
+            print(f"Seeding {args.seed:,} synthetic claims...")
+            seed_synthetic_claims(args.seed)
+            print("Rebuilding claim_daily_stats...")
+            ClaimStatsService.rebuild()
+            db.session.execute(text('ANALYZE claims'))
+            db.session.execute(text('ANALYZE claim_daily_stats'))
+            db.session.commit()
+        
+        start_date = datetime.utcnow().date() - timedelta(days=args.days)
+        claim_count = db.session.query(Claim.id).count()
+        print(f"\nDashboard benchmark: {claim_count:,} claims, {args.days}-day window, {args.repeat} runs\n")
+        
+        legacy_ms, legacy_p95, legacy = timed(lambda: legacy_dashboard(start_date), args.repeat)
+        print_row('four scans over claims (old)', legacy_ms, legacy_p95)
+        
+        new_ms, new_p95, summary = timed(
+            lambda: AnalyticsService.get_dashboard_summary(start_date), args.repeat
+        )
+        print_row('GROUPING SETS over claim_daily_stats (new)', new_ms, new_p95)
+        print(f"\n  speedup: {legacy_ms / new_ms:.1f}x")
+        
+        # Both paths must agree on the numbers
+        legacy_total = legacy['totals'][0]
+        assert summary['summary']['total_claims'] == (legacy_total.total_claims or 0)
+        assert summary['summary']['total_cost'] == float(legacy_total.total_cost or 0)
+        assert [d['name'] for d in summary['top_drugs']] == [r.name for r in legacy['top_drugs']]
+        print("  results match ✓")
+
+
+if __name__ == '__main__':
+    benchmark_dashboard()
@@ -0,0 +1,121 @@
+"""
+Benchmark member lookups: substring ILIKE as a sequential scan (the old plan),
+the same ILIKE served by the pg_trgm GIN indexes, and the fuzzy similarity mode
+Run: python scripts/benchmark_member_search.py [--seed 10000000] [--repeat 20]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from app import create_app, db
+from app.models import Member
+from app.utils.search import trigram_search
+from sqlalchemy import or_, text
+from bench_common import timed, print_row
+
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas']
+
+
+def seed_synthetic_members(count, batch=500000):
+    """Insert `count` members with realistic name collisions, generated in SQL"""
+    run_id = int(time.time())
+    inserted = 0
+    while inserted < count:
+        size = min(batch, count - inserted)
+        db.session.execute(text("""
+            INSERT INTO members (
+                member_id, first_name, last_name, date_of_birth, email,
+                plan_type, is_active, created_at, updated_at
+            )
+            SELECT 
+                'BM' || :run_id || '-' || (:offset + g),
+                (:first_names)[1 + floor(random() * array_length(CAST(:first_names AS text[]), 1))::int],
+                (:last_names)[1 + floor(random() * array_length(CAST(:last_names AS text[]), 1))::int]
+                    || CASE WHEN random() < 0.5 THEN '' ELSE chr(97 + floor(random() * 26)::int) END,
+                DATE '1940-01-01' + floor(random() * 25000)::int,
+                'bm' || :run_id || '-' || (:offset + g) || '@example.com',
+                'PPO', true, NOW(), NOW()
+            FROM generate_series(1, :size) g
+        """), {
+            'run_id': run_id,
+            'offset': inserted,
+            'size': size,
+            'first_names': FIRST_NAMES,
+            'last_names': LAST_NAMES
+        })
+        db.session.commit()
+        inserted += size
+        print(f"  seeded {inserted:,} / {count:,} members")
+
+
+def ilike_lookup(term):
+    search_filter = f'%{term}%'
+    return Member.query.filter(
+        or_(
+            Member.first_name.ilike(search_filter),
+            Member.last_name.ilike(search_filter),
+            Member.member_id.ilike(search_filter),
+            Member.email.ilike(search_filter)
+        )
+    ).order_by(Member.last_name, Member.first_name).limit(20).all()
+
+
+def seq_scan_lookup(term):
+    """The same ILIKE with index scans disabled, i.e. the plan before pg_trgm"""
+    db.session.execute(text('SET LOCAL enable_bitmapscan = off'))
+    db.session.execute(text('SET LOCAL enable_indexscan = off'))
+    try:
+        return ilike_lookup(term)
+    finally:
+        db.session.rollback()
+
+
+def fuzzy_lookup(term):
+    condition, rank = trigram_search(
+        [Member.full_name_expression(), Member.last_name, Member.first_name], term
+    )
+    return Member.query.filter(condition).order_by(rank.desc(), Member.id).limit(20).all()
+
+
+def benchmark_member_search():
+    parser = argparse.ArgumentParser(description='Benchmark member search query paths')
+    parser.add_argument('--seed', type=int, default=0, help='synthetic members to add before timing')
+    parser.add_argument('--term', default='hernandezq', help='substring for the ILIKE lookups')
+    parser.add_argument('--typo', default='Jenifer Hernadez', help='misspelled name for the fuzzy lookup')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        if args.seed:
+            print(f"Seeding {args.seed:,} synthetic members...")
+            seed_synthetic_members(args.seed)
+            db.session.execute(text('ANALYZE members'))
+            db.session.commit()
+        
+        member_count = db.session.query(Member.id).count()
+        print(f"\nMember search benchmark: {member_count:,} members, {args.repeat} runs\n")
+        
+        seq_ms, seq_p95, _ = timed(lambda: seq_scan_lookup(args.term), max(3, args.repeat // 5))
+        print_row(f"ILIKE '%{args.term}%' seq scan (old)", seq_ms, seq_p95)
+        
+        trgm_ms, trgm_p95, found = timed(lambda: ilike_lookup(args.term), args.repeat)
+        print_row(f"ILIKE '%{args.term}%' trigram GIN (new)", trgm_ms, trgm_p95)
+        
+        fuzzy_ms, fuzzy_p95, matches = timed(lambda: fuzzy_lookup(args.typo), args.repeat)
+        print_row(f"fuzzy '{args.typo}'", fuzzy_ms, fuzzy_p95)
+        
+        print(f"\n  speedup (ILIKE): {seq_ms / trgm_ms:.1f}x, {len(found)} rows")
+        print(f"  fuzzy top match: {matches[0].first_name} {matches[0].last_name}" if matches else "  fuzzy: no match")
+
+
+if __name__ == '__main__':
+    benchmark_member_search()
@@ -0,0 +1,143 @@
+"""
+Benchmark monthly partitioning of claims: bulk insert speed and the 30-day
+dashboard scans against a single table with the old indexes versus a table
+range-partitioned by fill_date
+Run: python scripts/benchmark_partitioning.py [--rows 5000000] [--history-days 730] [--days 30] [--repeat 20]
+
+Synthetic claims are generated once into an unindexed staging table and then
+copied into both shapes, built as scratch tables (bench_claims_flat,
+bench_claims_monthly), so both hold identical rows. All three are dropped
+afterwards; the real claims table is only read for its columns.
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import re
+import time
+from datetime import date, timedelta
+from app import create_app, db
+from app.utils.partitions import add_months, create_default_partition, ensure_partitions
+from sqlalchemy import text
+from bench_common import timed, print_row, seed_synthetic_claims
+from benchmark_dashboard import LEGACY_QUERIES
+
+
+SOURCE = 'bench_claims_source'
+FLAT = 'bench_claims_flat'
+MONTHLY = 'bench_claims_monthly'
+
+INDEXES = {
+    'member_id': 'member_id', 'drug_id': 'drug_id', 'pharmacy_id': 'pharmacy_id',
+    'fill_date': 'fill_date', 'status': 'status', 'dates': 'fill_date, status',
+    'member_date': 'member_id, fill_date', 'drug_date': 'drug_id, fill_date',
+    'status_date': 'status, fill_date',
+}
+
+
+def create_tables(history_days):
+    drop_tables()
+    db.session.execute(text(f'CREATE UNLOGGED TABLE {SOURCE} (LIKE claims INCLUDING DEFAULTS)'))
+    db.session.execute(text(f'CREATE TABLE {FLAT} (LIKE claims INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(text(f'ALTER TABLE {FLAT} ADD PRIMARY KEY (id)'))
+    db.session.execute(text(f'CREATE UNIQUE INDEX ON {FLAT} (claim_number)'))
+
+    db.session.execute(text(
+        f'CREATE TABLE {MONTHLY} (LIKE claims INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (fill_date)'
+    ))
+    db.session.execute(text(f'ALTER TABLE {MONTHLY} ADD PRIMARY KEY (id, fill_date)'))
+    db.session.execute(text(f'ALTER TABLE {MONTHLY} ADD UNIQUE (claim_number, fill_date)'))
+    connection = db.session.connection()
+    today = date.today()
+    create_default_partition(connection, MONTHLY)
+    ensure_partitions(connection, MONTHLY, today - timedelta(days=history_days), add_months(today, 3))
+
+    for table in (FLAT, MONTHLY):
+        for columns in INDEXES.values():
+            db.session.execute(text(f'CREATE INDEX ON {table} ({columns})'))
+        db.session.execute(text(f"CREATE INDEX ON {table} (submitted_at, id) WHERE status = 'pending'"))
+    db.session.commit()
+
+
+def drop_tables():
+    db.session.execute(text(f'DROP TABLE IF EXISTS {SOURCE}'))
+    db.session.execute(text(f'DROP TABLE IF EXISTS {FLAT}'))
+    db.session.execute(text(f'DROP TABLE IF EXISTS {MONTHLY}'))
+    db.session.commit()
+
+
+def timed_insert(table):
+    started = time.perf_counter()
+    db.session.execute(text(f'INSERT INTO {table} SELECT * FROM {SOURCE}'))
+    db.session.commit()
+    elapsed = time.perf_counter() - started
+    db.session.execute(text(f'ANALYZE {table}'))
+    db.session.commit()
+    return elapsed
+
+
+def dashboard(table, start_date):
+    return {
+        name: db.session.execute(text(sql.replace('FROM claims', f'FROM {table}')), {'start_date': start_date}).all()
+        for name, sql in LEGACY_QUERIES.items()
+    }
+
+
+def partitions_scanned(table, start_date):
+    plan = db.session.execute(
+        text('EXPLAIN ' + LEGACY_QUERIES['totals'].replace('FROM claims', f'FROM {table}')),
+        {'start_date': start_date}
+    ).scalars().all()
+    return len({match for line in plan for match in re.findall(rf'on ({table}_\w+)', line)})
+
+
+def benchmark_partitioning():
+    parser = argparse.ArgumentParser(description='Benchmark claims partitioning')
+    parser.add_argument('--rows', type=int, default=1000000, help='synthetic claims loaded into each table')
+    parser.add_argument('--history-days', type=int, default=730, help='spread of fill dates in days')
+    parser.add_argument('--days', type=int, default=30, help='dashboard window in days')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help='leave the scratch tables in place')
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        create_tables(args.history_days)
+        try:
+            print(f"Generating {args.rows:,} claims over {args.history_days} days...")
+            seed_synthetic_claims(args.rows, days=args.history_days, table=SOURCE)
+            flat_s = timed_insert(FLAT)
+            monthly_s = timed_insert(MONTHLY)
+
+            print(f"\nInsert: {args.rows:,} rows, all indexes in place\n")
+            print(f"  {'single table (old)':<44} {flat_s:>9.1f} s   {args.rows / flat_s:>12,.0f} rows/s")
+            print(f"  {'monthly partitions (new)':<44} {monthly_s:>9.1f} s   {args.rows / monthly_s:>12,.0f} rows/s")
+
+            start_date = date.today() - timedelta(days=args.days)
+            print(f"\nDashboard: four scans, {args.days}-day window, {args.repeat} runs\n")
+            flat_ms, flat_p95, flat = timed(lambda: dashboard(FLAT, start_date), args.repeat)
+            print_row('single table (old)', flat_ms, flat_p95)
+            monthly_ms, monthly_p95, monthly = timed(lambda: dashboard(MONTHLY, start_date), args.repeat)
+            print_row('monthly partitions (new)', monthly_ms, monthly_p95)
+            print(f"\n  speedup: {flat_ms / monthly_ms:.1f}x")
+
+            scanned = partitions_scanned(MONTHLY, start_date)
+            total = db.session.execute(text(
+                f"SELECT COUNT(*) FROM pg_inherits WHERE inhparent = CAST('{MONTHLY}' AS regclass)"
+            )).scalar()
+            print(f"  partitions scanned: {scanned} of {total}")
+
+            assert flat['totals'] == monthly['totals']
+            assert sorted(flat['status_breakdown']) == sorted(monthly['status_breakdown'])
+            print("  results match ✓")
+        finally:
+            db.session.rollback()
+            if not args.keep:
+                drop_tables()
+
+
+if __name__ == '__main__':
+    benchmark_partitioning()
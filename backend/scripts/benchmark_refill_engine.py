@@ -0,0 +1,89 @@
+"""
+Benchmark the refill-too-soon supply engine on a year of synthetic fills
+(no database needed), or on the configured database with --database
+Run: python scripts/benchmark_refill_engine.py [--members 5000000] [--fills-per-member 12] [--lookups 100000] [--database]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from app import create_app
+from app.services.refill_service import SupplyTimeline, RefillService
+
+
+def synthetic_fills(members, fills_per_member, drugs, drugs_per_member, seed):
+    """Maintenance fills: each member refills a few drugs every 20-40 days through the year"""
+    rng = np.random.default_rng(seed)
+    per_drug = max(fills_per_member // drugs_per_member, 1)
+    shape = (members, drugs_per_member, per_drug)
+
+    member_id = np.broadcast_to(np.arange(1, members + 1, dtype=np.int64)[:, None, None], shape)
+    drug_id = np.broadcast_to(rng.integers(1, drugs + 1, size=(members, drugs_per_member, 1), dtype=np.int64), shape)
+    fill_day = np.cumsum(rng.integers(20, 41, size=shape, dtype=np.int64), axis=2) - 20
+    days_supply = rng.choice(np.array([30, 30, 30, 90], dtype=np.int64), size=shape)
+
+    columns = [column.ravel() for column in (member_id, drug_id, fill_day, days_supply)]
+    return (np.arange(1, len(columns[0]) + 1, dtype=np.int64), *columns)
+
+
+def elapsed(started):
+    return time.perf_counter() - started
+
+
+def benchmark_refill_engine():
+    parser = argparse.ArgumentParser(description='Benchmark the refill-too-soon engine')
+    parser.add_argument('--members', type=int, default=5000000)
+    parser.add_argument('--fills-per-member', type=int, default=12)
+    parser.add_argument('--drugs', type=int, default=3000, help='distinct drugs in the synthetic catalog')
+    parser.add_argument('--drugs-per-member', type=int, default=3)
+    parser.add_argument('--lookups', type=int, default=100000, help='point refill checks to time')
+    parser.add_argument('--threshold', type=float, default=0.75)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--database', action='store_true', help='time RefillService.report over the last year of claims')
+    args = parser.parse_args()
+
+    if args.database:
+        app = create_app()
+        with app.app_context():
+            end_date = datetime.utcnow().date()
+            started = time.perf_counter()
+            report = RefillService.report(end_date - timedelta(days=365), end_date)
+            print(f"Refill report over {report['claims_checked']:,} fills: {elapsed(started):.1f} s")
+            print(f"  {report['refill_too_soon_claims']:,} refill-too-soon fills, "
+                  f"{report['members_affected']:,} members")
+        return
+
+    print(f"Generating {args.members:,} members x {args.fills_per_member} fills...")
+    columns = synthetic_fills(args.members, args.fills_per_member, args.drugs, args.drugs_per_member, args.seed)
+
+    started = time.perf_counter()
+    timeline = SupplyTimeline(*columns)
+    build_s = elapsed(started)
+
+    started = time.perf_counter()
+    overlap_days, too_soon, _ = timeline.overlaps(args.threshold)
+    report_s = elapsed(started)
+
+    rng = np.random.default_rng(args.seed + 1)
+    picks = rng.integers(0, len(timeline), size=args.lookups)
+    started = time.perf_counter()
+    for i in picks:
+        timeline.refill_check(int(timeline.member_id[i]), int(timeline.drug_id[i]), int(timeline.fill_day[i]) + 10,
+                              args.threshold)
+    lookup_s = elapsed(started)
+
+    print(f"\nSupply engine: {len(timeline):,} fills, {len(timeline.group_keys):,} member/drug pairs\n")
+    print(f"  {'sort + carry-over scan':<32} {build_s:>9.2f} s")
+    print(f"  {'overlap / too-soon pass':<32} {report_s:>9.2f} s")
+    print(f"  {f'{args.lookups:,} point checks':<32} {lookup_s:>9.2f} s   "
+          f"({lookup_s / args.lookups * 1e6:.1f} us each)")
+    print(f"\n  {int(too_soon.sum()):,} refill-too-soon fills, {int((overlap_days > 0).sum()):,} overlapping")
+
+
+if __name__ == '__main__':
+    benchmark_refill_engine()
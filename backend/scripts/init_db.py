@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app import create_app, db
 from app.models import Member, Drug, Pharmacy, Claim, Formulary
+from flask_migrate import stamp
 
 def init_database():
     print("Initializing database...")
@@ -20,6 +21,10 @@ def init_database():
         db.create_all()
         print("✓ All tables created successfully!")
         
+        # create_all already built the latest schema, so mark every migration as applied
+        stamp(directory=os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+        print("✓ Migrations stamped at head")
+        
         # Print table names
         print("\nCreated tables:")
         for table in db.metadata.sorted_tables:
@@ -0,0 +1,52 @@
+"""
+Create upcoming monthly claims partitions and detach old ones
+Run: python scripts/maintain_claim_partitions.py [--months-ahead 3] [--detach-before YYYY-MM-DD [--drop]] [--list]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from datetime import datetime
+from app import create_app
+from app.services.claim_partition_service import ClaimPartitionService
+
+
+def maintain_claim_partitions():
+    parser = argparse.ArgumentParser(description='Maintain monthly claims partitions')
+    parser.add_argument('--months-ahead', type=int, help='partitions to keep ready past this month (CLAIM_PARTITION_MONTHS_AHEAD)')
+    parser.add_argument('--detach-before', type=lambda s: datetime.strptime(s, '%Y-%m-%d').date(),
+                        help='detach partitions for months before this date')
+    parser.add_argument('--drop', action='store_true', help='drop detached partitions instead of keeping them')
+    parser.add_argument('--list', action='store_true', help='print the partitions after maintenance')
+    args = parser.parse_args()
+    
+    if args.drop and not args.detach_before:
+        parser.error('--drop requires --detach-before')
+    
+    app = create_app()
+    
+    with app.app_context():
+        created = ClaimPartitionService.maintain(args.months_ahead)
+        for name in created:
+            print(f"✓ Created {name}")
+        if not created:
+            print("All upcoming partitions already exist")
+        
+        if args.detach_before:
+            detached = ClaimPartitionService.detach(args.detach_before, drop=args.drop)
+            action = 'Dropped' if args.drop else 'Detached'
+            for name in detached:
+                print(f"✓ {action} {name}")
+            if not detached:
+                print(f"No partitions end before {args.detach_before.replace(day=1)}")
+        
+        if args.list:
+            print("\nclaims partitions:")
+            for partition in ClaimPartitionService.partitions():
+                print(f"  {partition['name']:<24} {partition['bound']}")
+
+
+if __name__ == '__main__':
+    maintain_claim_partitions()
@@ -0,0 +1,35 @@
+"""
+Rebuild the claim_daily_stats rollup from the claims table
+Run: python scripts/rebuild_claim_stats.py [--start-date YYYY-MM-DD] [--end-date YYYY-MM-DD]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from datetime import datetime
+from app import create_app
+from app.services.claim_stats_service import ClaimStatsService
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def rebuild_claim_stats():
+    parser = argparse.ArgumentParser(description='Rebuild the claim_daily_stats rollup')
+    parser.add_argument('--start-date', type=parse_date, help='only rebuild fill dates on or after this day')
+    parser.add_argument('--end-date', type=parse_date, help='only rebuild fill dates on or before this day')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("Rebuilding claim_daily_stats...")
+        rows = ClaimStatsService.rebuild(args.start_date, args.end_date)
+        print(f"✓ Rebuilt {rows} rollup rows")
+
+
+if __name__ == '__main__':
+    rebuild_claim_stats()
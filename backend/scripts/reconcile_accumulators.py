@@ -0,0 +1,47 @@
+"""
+Rebuild member_accumulators from the claims table and report drift
+Run: python scripts/reconcile_accumulators.py [--plan-year YYYY] [--dry-run]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from app import create_app
+from app.services.accumulator_service import AccumulatorService
+
+
+def reconcile_accumulators():
+    parser = argparse.ArgumentParser(description='Reconcile member accumulators against claims')
+    parser.add_argument('--plan-year', type=int, help='only reconcile this plan year')
+    parser.add_argument('--dry-run', action='store_true', help='report drift without rebuilding')
+    parser.add_argument('--sample', type=int, default=20, help='number of drifted accumulators to print')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        scope = f"plan year {args.plan_year}" if args.plan_year else "all plan years"
+        print(f"Reconciling member_accumulators for {scope}...")
+        report = AccumulatorService.reconcile(args.plan_year, apply=not args.dry_run, sample_size=args.sample)
+        
+        print(f"{report['drifted']} accumulators drifted from claims")
+        for drift in report['sample']:
+            fields = ', '.join(
+                f"{name} {values['stored']} -> {values['expected']}"
+                for name, values in drift.items() if name not in ('member_id', 'plan_year')
+            )
+            print(f"  member {drift['member_id']} {drift['plan_year']}: {fields}")
+        
+        if report['applied']:
+            print(f"✓ Rebuilt {report['rebuilt']} accumulator rows")
+        else:
+            print("Dry run, nothing changed")
+        
+        # Non-zero exit lets a scheduled job alert on drift
+        sys.exit(1 if report['drifted'] else 0)
+
+
+if __name__ == '__main__':
+    reconcile_accumulators()
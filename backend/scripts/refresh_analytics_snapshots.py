@@ -0,0 +1,37 @@
+"""
+Recompute the materialized analytics snapshots (member risk scores, duplicate claims)
+Run: python scripts/refresh_analytics_snapshots.py [--kind risk_scores|duplicates] [--lookback-days N]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+from app import create_app
+from app.services.analytics_snapshot_service import AnalyticsSnapshotService, SNAPSHOT_REPORTS
+
+
+def refresh_analytics_snapshots():
+    parser = argparse.ArgumentParser(description='Refresh analytics snapshot tables')
+    parser.add_argument('--kind', choices=sorted(SNAPSHOT_REPORTS), action='append',
+                        help='report to refresh (repeatable, default: all)')
+    parser.add_argument('--lookback-days', type=int,
+                        help='lookback window in days (default: the report default)')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        for kind in args.kind or sorted(SNAPSHOT_REPORTS):
+            lookback_days = args.lookback_days or SNAPSHOT_REPORTS[kind]['default_lookback']
+            print(f"Refreshing {kind} ({lookback_days} days)...")
+            snapshot = AnalyticsSnapshotService.refresh(kind, lookback_days)
+            if snapshot is None:
+                print("  skipped: another refresh is already running")
+            else:
+                print(f"✓ {snapshot.row_count} rows computed at {snapshot.computed_at.isoformat()}")
+
+
+if __name__ == '__main__':
+    refresh_analytics_snapshots()
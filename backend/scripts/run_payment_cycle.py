@@ -0,0 +1,55 @@
+"""
+Weekly payment run: mark approved claims paid and print the remittance summary
+Run: python scripts/run_payment_cycle.py [--pharmacy-id ID ...] [--through-date YYYY-MM-DD] [--output remittance.csv]
+"""
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import csv
+import time
+from datetime import datetime
+from app import create_app, db
+from app.services.claim_transition_service import ClaimTransitionService
+
+
+def parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def run_payment_cycle():
+    parser = argparse.ArgumentParser(description='Mark approved claims paid in bulk')
+    parser.add_argument('--pharmacy-id', type=int, action='append', dest='pharmacy_ids',
+                        help='only pay this pharmacy (repeatable)')
+    parser.add_argument('--through-date', type=parse_date, help='only pay claims filled on or before this day')
+    parser.add_argument('--output', help='also write the per-pharmacy remittance summary to this CSV file')
+    args = parser.parse_args()
+    
+    app = create_app()
+    
+    with app.app_context():
+        print("Running payment cycle...")
+        started = time.perf_counter()
+        result = ClaimTransitionService.transition('paid', pharmacy_ids=args.pharmacy_ids,
+                                                   through_date=args.through_date)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        
+        for pharmacy in result['pharmacies']:
+            print(f"  {pharmacy['ncpdp_id']} {pharmacy['pharmacy_name'][:40]:<40} "
+                  f"{pharmacy['claim_count']:>8} claims  ${pharmacy['plan_paid_amount']:>14,.2f}")
+        print(f"✓ Paid {result['claim_count']} claims to {len(result['pharmacies'])} pharmacies "
+              f"(${result['plan_paid_amount']:,.2f}) in {elapsed:.2f}s")
+        
+        if args.output and result['pharmacies']:
+            with open(args.output, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(result['pharmacies'][0]))
+                writer.writeheader()
+                writer.writerows(result['pharmacies'])
+            print(f"✓ Wrote remittance summary to {args.output}")
+
+
+if __name__ == '__main__':
+    run_payment_cycle()
@@ -10,7 +10,10 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from app import create_app, db
-from app.models import Member, Drug, Pharmacy, Claim, Formulary
+from app.models import Member, Drug, Pharmacy, Claim, Formulary, ClaimDailyStat
+from app.services.claim_stats_service import ClaimStatsService
+from app.services.accumulator_service import AccumulatorService
+from app.services.claim_number_service import ClaimNumberService
 from faker import Faker
 import random
 from datetime import datetime, timedelta
@@ -206,6 +209,15 @@ def create_formulary(drugs):
     print(f"✓ Created formulary entries")
 
 
+def save_claims(claims):
+    """Insert a batch of claims and register their numbers in claim_numbers"""
+    db.session.bulk_save_objects(claims)
+    ClaimNumberService.reserve([
+        {'claim_number': claim.claim_number, 'fill_date': claim.fill_date} for claim in claims
+    ])
+    db.session.commit()
+
+
 def create_claims(members, drugs, pharmacies, count=1000):
     """Create fake claims"""
     print(f"Creating {count} claims...")
@@ -282,13 +294,11 @@ def create_claims(members, drugs, pharmacies, count=1000):
         
         if (i + 1) % 200 == 0:
             print(f"  Created {i + 1} claims")
-            db.session.bulk_save_objects(claims)
-            db.session.commit()
+            save_claims(claims)
             claims = []
     
     if claims:
-        db.session.bulk_save_objects(claims)
-        db.session.commit()
+        save_claims(claims)
     
     print(f"✓ Created {count} claims")
 
@@ -312,6 +322,7 @@ def seed_database():
                 return
             
             print("\nClearing existing data...")
+            ClaimDailyStat.query.delete()
             Claim.query.delete()
             Formulary.query.delete()
             Drug.query.delete()
@@ -327,6 +338,12 @@ def seed_database():
         create_formulary(drugs)
         create_claims(members, drugs, pharmacies, 1000)
         
+        # bulk_save_objects bypasses the incremental rollup, so rebuild it once
+        ClaimStatsService.rebuild()
+        print("✓ Rebuilt claim_daily_stats rollup")
+        AccumulatorService.reconcile()
+        print("✓ Rebuilt member_accumulators")
+        
         # Print summary
         print("\n" + "="*50)
         print("DATABASE SEEDING COMPLETE!")
@@ -4,7 +4,17 @@ Integration tests for API endpoints
 
 import pytest
 import json
+import re
+from contextlib import contextmanager
 from datetime import date
+from decimal import Decimal
+from sqlalchemy import event, text
+from app import db
+from app.models import Member, Drug, Claim, ClaimDailyStat, MemberAccumulator, Formulary
+from app.services.accumulator_service import AccumulatorService
+from app.services.adjudication_service import AdjudicationService
+from app.services.claim_partition_service import ClaimPartitionService
+from app.utils.partitions import ensure_partitions
 
 
 def test_health_endpoint(client):
@@ -34,6 +44,38 @@ def test_get_members(client, sample_member):
     assert data['members'][0]['member_id'] == 'MBR000001'
 
 
+def test_fuzzy_member_and_pharmacy_search(client, sample_member, sample_pharmacy):
+    """?fuzzy=true tolerates typos and ranks by trigram similarity"""
+    response = client.get('/api/members?search=Jonh Doe&fuzzy=true')
+    assert response.status_code == 200
+    assert [m['member_id'] for m in json.loads(response.data)['members']] == ['MBR000001']
+    
+    response = client.get('/api/members?search=Jonh Doe')
+    assert json.loads(response.data)['members'] == []
+    
+    response = client.get('/api/pharmacies?search=Tset Pharmacy&fuzzy=true')
+    assert response.status_code == 200
+    assert len(json.loads(response.data)['pharmacies']) == 1
+
+
+def test_nearby_pharmacies(client, sample_pharmacy):
+    """GET /api/pharmacies/nearby filters by great-circle radius"""
+    response = client.get('/api/pharmacies/nearby?lat=42.3736&lon=-71.1097&radius_km=5')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [p['name'] for p in data['pharmacies']] == ['Test Pharmacy']
+    assert 3 < data['pharmacies'][0]['distance_km'] < 5
+    
+    response = client.get('/api/pharmacies/nearby?lat=42.3736&lon=-71.1097&radius_km=2')
+    assert json.loads(response.data)['pharmacies'] == []
+    
+    response = client.get('/api/pharmacies/nearby?lat=42.3601&lon=-71.0589&is_24_hours=true')
+    assert json.loads(response.data)['pharmacies'] == []
+    
+    response = client.get('/api/pharmacies/nearby?lat=123&lon=-71.0589')
+    assert response.status_code == 400
+
+
 def test_get_member_by_id(client, sample_member):
     """Test GET /api/members/<id>"""
     response = client.get(f'/api/members/{sample_member.id}')
@@ -96,6 +138,104 @@ def test_search_drugs(client, sample_drug):
     assert len(data['results']) > 0
 
 
+def test_search_drugs_full_text(client, sample_drug):
+    """Drug search matches word prefixes across fields and NDC prefixes"""
+    response = client.get('/api/drugs/search?q=lipid low')
+    assert [d['id'] for d in json.loads(response.data)['results']] == [sample_drug.id]
+    
+    response = client.get('/api/drugs/search?q=12345-678')
+    assert [d['id'] for d in json.loads(response.data)['results']] == [sample_drug.id]
+    
+    response = client.get('/api/drugs?search=generic manu')
+    assert json.loads(response.data)['total'] == 1
+    
+    response = client.get('/api/drugs/search?q=vastatin')
+    assert json.loads(response.data)['results'] == []
+    
+    response = client.get('/api/drugs/search?q=%27%7C%21')
+    assert response.status_code == 400
+
+
+def test_drug_autocomplete(client, sample_drug):
+    """Autocomplete is served from memory and rebuilt when the catalog changes"""
+    response = client.get('/api/drugs/autocomplete?prefix=ator')
+    assert response.status_code == 200
+    assert [d['id'] for d in json.loads(response.data)['suggestions']] == [sample_drug.id]
+    
+    response = client.post('/api/drugs', data=json.dumps({
+        'ndc': '99999-000-01',
+        'name': 'Atorvastatin Calcium',
+        'generic_name': 'Atorvastatin'
+    }), content_type='application/json')
+    assert response.status_code == 201
+    
+    response = client.get('/api/drugs/autocomplete?prefix=calc')
+    assert [d['name'] for d in json.loads(response.data)['suggestions']] == ['Atorvastatin Calcium']
+    
+    response = client.get('/api/drugs/autocomplete?prefix=99999-0')
+    assert len(json.loads(response.data)['suggestions']) == 1
+    
+    response = client.get('/api/drugs/autocomplete')
+    assert response.status_code == 400
+
+
+def test_formulary_point_in_time_lookup(client, sample_drug):
+    """Formulary lookups return the entry in effect on the requested date"""
+    def create(**fields):
+        return client.post('/api/formulary',
+                           data=json.dumps({'drug_id': sample_drug.id, **fields}),
+                           content_type='application/json')
+    
+    assert create(tier=2, effective_date='2024-01-01', termination_date='2024-12-31').status_code == 201
+    assert create(tier=1, effective_date='2025-01-01').status_code == 201
+    assert create(tier=3, effective_date='2024-06-01').status_code == 409
+    
+    response = client.get(f'/api/formulary/lookup?drug_id={sample_drug.id}&date=2024-07-04')
+    assert response.status_code == 200
+    assert json.loads(response.data)['tier'] == 2
+    
+    response = client.get(f'/api/formulary/lookup?drug_id={sample_drug.id}&date=2025-01-01')
+    assert json.loads(response.data)['tier'] == 1
+    
+    response = client.get(f'/api/formulary/lookup?drug_id={sample_drug.id}&date=2023-12-31')
+    assert response.status_code == 404
+    
+    response = client.get(f'/api/formulary?drug_id={sample_drug.id}&date=2024-07-04')
+    assert [e['tier'] for e in json.loads(response.data)['entries']] == [2]
+
+
+def test_formulary_coverage_check(client, session, sample_member, sample_drug, sample_pharmacy):
+    """POST /api/formulary/coverage-check resolves many items in one call"""
+    session.add(Formulary(drug_id=sample_drug.id, tier=1, tier_name='Generic',
+                          copay_retail=Decimal('10'), copay_mail_order=Decimal('20'),
+                          effective_date=date(2024, 1, 1)))
+    session.commit()
+    
+    item = {'ndc': '12345-678-90', 'fill_date': '2024-03-01',
+            'pharmacy_id': sample_pharmacy.id, 'member_id': sample_member.id}
+    response = client.post('/api/formulary/coverage-check',
+                           data=json.dumps({'items': [
+                               item,
+                               {**item, 'fill_date': '2023-03-01'},
+                               {**item, 'ndc': '00000-000-00'},
+                               {**item, 'fill_date': 'March'},
+                           ]}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    results = json.loads(response.data)['results']
+    assert results[0]['covered'] is True
+    assert results[0]['tier'] == 1
+    assert results[0]['copay'] == 10.0
+    assert results[1]['covered'] is False
+    assert 'Not on formulary on fill_date' in results[1]['reasons']
+    assert results[2]['reasons'] == ['Drug not found']
+    assert results[3]['reasons'] == ['fill_date must be YYYY-MM-DD']
+    
+    response = client.post('/api/formulary/coverage-check', data=json.dumps({'items': []}),
+                           content_type='application/json')
+    assert response.status_code == 400
+
+
 def test_get_claims(client, sample_claim):
     """Test GET /api/claims"""
     response = client.get('/api/claims')
@@ -146,6 +286,23 @@ def test_analytics_trends(client, sample_claim):
     assert 'trends' in data
 
 
+def test_analytics_trends_gap_filled(client, sample_claim):
+    """Trends return one bucket per period, including periods with no claims"""
+    response = client.get('/api/analytics/trends?days=30&granularity=day&window=3')
+    assert response.status_code == 200
+    trends = json.loads(response.data)['trends']
+    assert len(trends) == 31
+    assert all('moving_avg_cost' in point and 'running_total' in point for point in trends)
+    
+    response = client.get('/api/analytics/trends?days=90&granularity=week')
+    assert response.status_code == 200
+    weekly = json.loads(response.data)['trends']
+    assert 13 <= len(weekly) <= 14
+    
+    response = client.get('/api/analytics/trends?granularity=hour')
+    assert response.status_code == 400
+
+
 def test_generic_savings_report(client, sample_claim):
     """Test GET /api/reports/generic-savings"""
     response = client.get('/api/reports/generic-savings?days=90')
@@ -155,6 +312,53 @@ def test_generic_savings_report(client, sample_claim):
     assert 'opportunities' in data
 
 
+def test_generic_savings_filters(client, session, sample_member, sample_drug, sample_pharmacy):
+    """Brand vs generic averages, total and filters are computed in one query"""
+    brand = Drug(
+        ndc='12345-678-91',
+        name='Lipitor',
+        generic_name='Atorvastatin',
+        brand_name='Lipitor',
+        is_generic=False,
+        therapeutic_class='Lipid-Lowering',
+        awp=Decimal('250.00'),
+        is_active=True
+    )
+    session.add(brand)
+    session.commit()
+    
+    for number, drug, cost in (('CLMSAV0001', brand, 100.00), ('CLMSAV0002', sample_drug, 20.00)):
+        response = client.post('/api/claims', data=json.dumps({
+            'claim_number': number,
+            'member_id': sample_member.id,
+            'drug_id': drug.id,
+            'pharmacy_id': sample_pharmacy.id,
+            'fill_date': date.today().isoformat(),
+            'quantity': 30,
+            'days_supply': 30,
+            'total_cost': cost
+        }), content_type='application/json')
+        assert response.status_code == 201
+    
+    data = json.loads(client.get('/api/reports/generic-savings?days=30').data)
+    assert data['total_potential_savings'] == 80.0
+    assert data['opportunities'] == [{
+        'brand_name': 'Lipitor',
+        'generic_name': 'Atorvastatin',
+        'brand_claims': 1,
+        'avg_brand_cost': 100.0,
+        'avg_generic_cost': 20.0,
+        'potential_savings': 80.0,
+        'savings_per_claim': 80.0
+    }]
+    
+    data = json.loads(client.get('/api/reports/generic-savings?days=30&min_savings=100').data)
+    assert data['opportunities'] == []
+    
+    data = json.loads(client.get('/api/reports/generic-savings?days=30&therapeutic_class=Antidiabetic').data)
+    assert data['opportunity_count'] == 0
+
+
 def test_cost_summary_report(client, sample_claim):
     """Test GET /api/reports/cost-summary"""
     response = client.get('/api/reports/cost-summary')
@@ -172,3 +376,614 @@ def test_member_summary_report(client, sample_member, sample_claim):
     assert 'member' in data
     assert 'summary' in data
     assert 'most_used_drugs' in data
+
+
+def test_bulk_create_claims_ndjson(client, sample_member, sample_drug, sample_pharmacy):
+    """Test POST /api/claims/bulk reports per-row errors and loads valid rows"""
+    base = {
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': date.today().isoformat(),
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 42.50
+    }
+    lines = [
+        json.dumps(dict(base, claim_number='BULK0001')),
+        json.dumps(dict(base, claim_number='BULK0002', member_id=999999)),
+        json.dumps(dict(base, claim_number='BULK0003', days_supply=0)),
+        'not json',
+        # Too large for its column: rejected alone rather than failing the chunk's COPY
+        json.dumps(dict(base, claim_number='BULK0005', total_cost=100000000)),
+        json.dumps(dict(base, claim_number='BULK0006', prescriber_npi='12345678901'))
+    ]
+    response = client.post('/api/claims/bulk',
+                          data='\n'.join(lines),
+                          content_type='application/x-ndjson')
+    assert response.status_code == 201
+    data = json.loads(response.data)
+    assert data['received'] == 6
+    assert data['loaded'] == 1
+    assert data['rejected'] == 5
+    assert {e['row'] for e in data['errors']} == {2, 3, 4, 5, 6}
+
+
+def test_claim_number_unique_across_months(client, sample_member, sample_drug, sample_pharmacy):
+    """A claim number is rejected in any month once it is on file, by single or bulk writes"""
+    base = {
+        'claim_number': 'CLM-UNIQ-1',
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': '2024-03-01',
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 42.50
+    }
+    response = client.post('/api/claims', data=json.dumps(base), content_type='application/json')
+    assert response.status_code == 201
+    
+    response = client.post('/api/claims', data=json.dumps(dict(base, fill_date='2024-05-01')),
+                           content_type='application/json')
+    assert response.status_code == 409
+    
+    lines = [json.dumps(dict(base, fill_date='2024-07-01')),
+             json.dumps(dict(base, claim_number='CLM-UNIQ-2', fill_date='2024-07-01'))]
+    data = json.loads(client.post('/api/claims/bulk', data='\n'.join(lines),
+                                  content_type='application/x-ndjson').data)
+    assert data['loaded'] == 1
+    assert data['errors'][0]['claim_number'] == 'CLM-UNIQ-1'
+    assert data['errors'][0]['error'] == 'Claim number already exists'
+
+
+def test_duplicate_claims_flagged_at_write_time(app, client, session, sample_member, sample_drug, sample_pharmacy):
+    """Repeat fills are flagged (or denied with NCPDP 83) on insert and listed from the flag index"""
+    base = {
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': '2024-05-01',
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 42.50,
+        'status': 'approved'
+    }
+    first = json.loads(client.post('/api/claims', data=json.dumps(dict(base, claim_number='DUP-1')),
+                                   content_type='application/json').data)
+    assert first['flags']['is_duplicate'] is False
+    
+    second = json.loads(client.post('/api/claims', data=json.dumps(dict(base, claim_number='DUP-2')),
+                                    content_type='application/json').data)
+    assert second['flags']['is_duplicate'] is True
+    assert second['status'] == 'approved'
+    
+    app.config['DUPLICATE_CLAIM_POLICY'] = 'reject'
+    try:
+        third = json.loads(client.post('/api/claims', data=json.dumps(dict(base, claim_number='DUP-3')),
+                                       content_type='application/json').data)
+    finally:
+        app.config['DUPLICATE_CLAIM_POLICY'] = 'flag'
+    assert third['status'] == 'denied'
+    assert third['rejection_code'] == '83'
+    
+    # A different fill date is a new fill; a repeat inside the upload is caught too
+    lines = [json.dumps(dict(base, claim_number='DUP-4', fill_date='2024-05-02')),
+             json.dumps(dict(base, claim_number='DUP-5', fill_date='2024-05-02'))]
+    data = json.loads(client.post('/api/claims/bulk', data='\n'.join(lines),
+                                  content_type='application/x-ndjson').data)
+    assert data['loaded'] == 2
+    assert data['duplicates'] == 1
+    
+    response = client.get('/api/claims/duplicates?limit=2')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [d['claim_number'] for d in data['duplicates']] == ['DUP-5', 'DUP-3']
+    assert data['duplicates'][0]['duplicate_of'] == ['DUP-4']
+    assert data['duplicates'][1]['duplicate_of'] == ['DUP-1']
+    
+    data = json.loads(client.get(f"/api/claims/duplicates?before_id={data['next_before_id']}").data)
+    assert [d['claim_number'] for d in data['duplicates']] == ['DUP-2']
+    assert data['next_before_id'] is None
+
+
+def test_get_members_cursor_pagination(client, session, sample_member):
+    """Test GET /api/members?cursor= walks every row exactly once"""
+    for i in range(2, 6):
+        session.add(Member(
+            member_id=f'MBR00000{i}',
+            first_name='Jane',
+            last_name='Doe',
+            date_of_birth=date(1990, 1, i)
+        ))
+    session.commit()
+    
+    seen = []
+    cursor = ''
+    while True:
+        response = client.get(f'/api/members?cursor={cursor}&limit=2')
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert len(data['members']) <= 2
+        seen.extend(m['member_id'] for m in data['members'])
+        if not data['has_more']:
+            break
+        cursor = data['next_cursor']
+    
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+
+def test_get_claims_invalid_cursor(client, sample_claim):
+    """Test GET /api/claims rejects a malformed cursor"""
+    response = client.get('/api/claims?cursor=not-a-cursor')
+    assert response.status_code == 400
+
+
+@contextmanager
+def count_queries():
+    """Count SQL statements sent to the database inside the block"""
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def test_claim_list_query_count_is_constant(client, session, sample_pharmacy):
+    """Test claim listings do not lazy-load member/drug rows per claim"""
+    for i in range(6):
+        member = Member(member_id=f'MBRQ{i:05d}', first_name='Pat', last_name=f'Query{i}',
+                        date_of_birth=date(1970, 1, 1))
+        drug = Drug(ndc=f'99999-000-{i:02d}', name=f'Drug {i}', is_generic=bool(i % 2))
+        session.add_all([member, drug])
+        session.flush()
+        session.add(Claim(
+            claim_number=f'CLMQ{i:07d}', member_id=member.id, drug_id=drug.id,
+            pharmacy_id=sample_pharmacy.id, fill_date=date.today(),
+            quantity=Decimal('30'), days_supply=30,
+            submitted_amount=Decimal('10.00'), total_cost=Decimal('10.00')
+        ))
+    session.commit()
+    session.expunge_all()
+    
+    counts = []
+    for per_page in (1, 6):
+        with count_queries() as statements:
+            response = client.get(f'/api/claims?per_page={per_page}')
+        assert response.status_code == 200
+        assert len(json.loads(response.data)['claims']) == per_page
+        counts.append(len(statements))
+    
+    assert counts[0] == counts[1]
+    
+    for limit in (1, 6):
+        with count_queries() as statements:
+            response = client.get(f'/api/claims?cursor=&limit={limit}')
+        assert response.status_code == 200
+        assert len(statements) == 1
+
+
+def test_export_claims_csv(client, sample_claim):
+    """Test GET /api/claims/export streams a CSV with a header row"""
+    response = client.get('/api/claims/export?format=csv&status=paid')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    lines = response.get_data(as_text=True).strip().splitlines()
+    assert lines[0].startswith('id,claim_number')
+    assert len(lines) == 2
+    assert 'CLM00000001' in lines[1]
+
+
+def test_export_claims_ndjson_gzip(client, sample_claim):
+    """Test GET /api/claims/export gzip-compresses NDJSON output"""
+    import gzip
+    response = client.get('/api/claims/export?format=ndjson&gzip=true')
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    rows = [json.loads(line) for line in gzip.decompress(response.data).decode().splitlines()]
+    assert rows[0]['claim_number'] == 'CLM00000001'
+
+
+def test_claim_writes_update_dashboard_rollup(client, sample_member, sample_drug, sample_pharmacy):
+    """Test claim create/update/reversal keep the dashboard rollup current"""
+    new_claim = {
+        'claim_number': 'CLMROLL0001',
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': date.today().isoformat(),
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 25.00
+    }
+    response = client.post('/api/claims', data=json.dumps(new_claim), content_type='application/json')
+    assert response.status_code == 201
+    claim_id = json.loads(response.data)['id']
+    
+    data = json.loads(client.get('/api/analytics/dashboard?days=30').data)
+    assert data['summary']['total_claims'] == 1
+    assert data['summary']['total_cost'] == 25.0
+    assert data['status_breakdown'] == [{'status': 'pending', 'count': 1}]
+    
+    client.put(f'/api/claims/{claim_id}', data=json.dumps({'status': 'approved', 'total_cost': 30.00}),
+               content_type='application/json')
+    client.delete(f'/api/claims/{claim_id}')
+    
+    data = json.loads(client.get('/api/analytics/dashboard?days=30').data)
+    assert data['summary']['total_claims'] == 1
+    assert data['summary']['total_cost'] == 30.0
+    assert data['status_breakdown'] == [{'status': 'reversed', 'count': 1}]
+
+
+def test_member_accumulators(client, session, sample_member, sample_drug, sample_pharmacy):
+    """Claim writes keep the member's year-to-date accumulators current"""
+    claim = {
+        'claim_number': 'CLM-ACC-1',
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': '2024-03-01',
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 100.00,
+        'member_copay': 10.00,
+        'deductible_applied': 25.00,
+        'status': 'pending'
+    }
+    response = client.post('/api/claims', data=json.dumps(claim), content_type='application/json')
+    claim_id = json.loads(response.data)['id']
+    url = f'/api/members/{sample_member.id}/accumulators?plan_year=2024'
+    
+    # Pending claims do not accumulate until adjudicated
+    assert json.loads(client.get(url).data)['claim_count'] == 0
+    
+    client.put(f'/api/claims/{claim_id}', data=json.dumps({'status': 'paid', 'member_coinsurance': 5.00}),
+               content_type='application/json')
+    data = json.loads(client.get(url).data)
+    assert data['claim_count'] == 1
+    assert data['out_of_pocket'] == 40.0
+    
+    client.delete(f'/api/claims/{claim_id}')
+    data = json.loads(client.get(url).data)
+    assert data['claim_count'] == 0
+    assert data['out_of_pocket'] == 0.0
+    
+    # Drift introduced behind the service's back is reported and repaired
+    session.get(Claim, claim_id).status = 'paid'
+    session.commit()
+    report = AccumulatorService.reconcile(2024)
+    assert report['drifted'] == 1
+    assert json.loads(client.get(url).data)['out_of_pocket'] == 40.0
+    assert AccumulatorService.reconcile(2024, apply=False)['drifted'] == 0
+    
+    assert client.get('/api/members/999999/accumulators').status_code == 404
+
+
+def test_adjudication_worker_batch(client, session, sample_member, sample_drug, sample_pharmacy):
+    """A worker batch approves and prices covered claims and denies the rest"""
+    uncovered = Drug(ndc='55555-000-01', name='Uncovered', is_generic=False, is_active=True)
+    session.add(uncovered)
+    session.add(Formulary(drug_id=sample_drug.id, tier=1, copay_retail=Decimal('10'),
+                          copay_mail_order=Decimal('20'), effective_date=date(2024, 1, 1)))
+    session.commit()
+    
+    claim_ids = []
+    for number, drug_id in (('CLM-ADJ-1', sample_drug.id), ('CLM-ADJ-2', uncovered.id)):
+        response = client.post('/api/claims', data=json.dumps({
+            'claim_number': number,
+            'member_id': sample_member.id,
+            'drug_id': drug_id,
+            'pharmacy_id': sample_pharmacy.id,
+            'fill_date': '2024-03-01',
+            'quantity': 30,
+            'days_supply': 30,
+            'total_cost': 100.00
+        }), content_type='application/json')
+        claim_ids.append(json.loads(response.data)['id'])
+    
+    assert AdjudicationService.process_batch(10) == {'claimed': 2, 'approved': 1, 'denied': 1}
+    assert AdjudicationService.process_batch(10)['claimed'] == 0
+    
+    approved = json.loads(client.get(f'/api/claims/{claim_ids[0]}').data)
+    assert approved['status'] == 'approved'
+    assert approved['pricing']['member_copay'] == 10.0
+    assert approved['pricing']['plan_paid_amount'] == 90.0
+    
+    denied = json.loads(client.get(f'/api/claims/{claim_ids[1]}').data)
+    assert denied['status'] == 'denied'
+    assert denied['rejection_code'] == '70'
+    
+    accumulators = json.loads(client.get(f'/api/members/{sample_member.id}/accumulators?plan_year=2024').data)
+    assert accumulators['claim_count'] == 1
+    assert accumulators['out_of_pocket'] == 10.0
+
+
+def test_refill_too_soon_adjudication_and_report(client, session, sample_member, sample_drug, sample_pharmacy):
+    """Refills with most of the previous supply on hand are denied and reported"""
+    session.add(Formulary(drug_id=sample_drug.id, tier=1, copay_retail=Decimal('10'),
+                          copay_mail_order=Decimal('20'), effective_date=date(2024, 1, 1)))
+    session.commit()
+    
+    claim_ids = {}
+    for number, fill_date, status in (('CLM-RF-1', '2024-03-01', 'approved'), ('CLM-RF-2', '2024-03-10', 'pending'),
+                                      ('CLM-RF-3', '2024-03-25', 'pending'), ('CLM-RF-4', '2024-04-01', 'paid')):
+        response = client.post('/api/claims', data=json.dumps({
+            'claim_number': number,
+            'member_id': sample_member.id,
+            'drug_id': sample_drug.id,
+            'pharmacy_id': sample_pharmacy.id,
+            'fill_date': fill_date,
+            'quantity': 30,
+            'days_supply': 30,
+            'total_cost': 100.00,
+            'status': status
+        }), content_type='application/json')
+        claim_ids[number] = json.loads(response.data)['id']
+    
+    assert AdjudicationService.process_batch(10) == {'claimed': 2, 'approved': 1, 'denied': 1}
+    
+    denied = json.loads(client.get(f"/api/claims/{claim_ids['CLM-RF-2']}").data)
+    assert denied['rejection_code'] == '79'
+    assert '2024-03-24' in denied['rejection_reason']
+    
+    # CLM-RF-3 carries its supply to 2024-04-30, so the paid CLM-RF-4 overlaps 29 days
+    response = client.get('/api/analytics/refill-too-soon?days=3660')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['overlapping_claims'] == 2
+    assert data['refill_too_soon_claims'] == 1
+    assert data['claims'][0]['claim_number'] == 'CLM-RF-4'
+    assert data['claims'][0]['overlap_days'] == 29
+    assert data['claims'][0]['earliest_refill_date'] == '2024-04-23'
+
+
+def test_adherence_pdc_by_therapeutic_class(client, session, sample_member, sample_drug, sample_pharmacy):
+    """PDC merges fills across a class and splits members at the threshold"""
+    other_member = Member(member_id='MBRPDC001', first_name='Pat', last_name='Gaps', date_of_birth=date(1970, 1, 1))
+    same_class = Drug(ndc='12345-678-91', name='Rosuvastatin', is_generic=True, therapeutic_class='Lipid-Lowering')
+    session.add_all([other_member, same_class])
+    session.flush()
+    
+    fills = [
+        # 90-day fills shifted forward to cover 360 of 366 days
+        (sample_member.id, sample_drug.id, date(2024, 1, 1), 90, 'paid'),
+        (sample_member.id, sample_drug.id, date(2024, 3, 25), 90, 'paid'),
+        (sample_member.id, sample_drug.id, date(2024, 6, 20), 90, 'approved'),
+        (sample_member.id, sample_drug.id, date(2024, 9, 20), 90, 'paid'),
+        # Jan 1 - Mar 15 once the overlapping statins are merged; the denial adds nothing
+        (other_member.id, sample_drug.id, date(2024, 1, 1), 30, 'paid'),
+        (other_member.id, sample_drug.id, date(2024, 1, 20), 30, 'paid'),
+        (other_member.id, same_class.id, date(2024, 2, 15), 30, 'paid'),
+        (other_member.id, same_class.id, date(2024, 4, 1), 90, 'denied'),
+    ]
+    for i, (member_id, drug_id, fill_date, days_supply, status) in enumerate(fills):
+        session.add(Claim(
+            claim_number=f'CLM-PDC-{i}', member_id=member_id, drug_id=drug_id,
+            pharmacy_id=sample_pharmacy.id, fill_date=fill_date, status=status,
+            quantity=Decimal('30'), days_supply=days_supply,
+            submitted_amount=Decimal('10.00'), total_cost=Decimal('10.00')
+        ))
+    session.commit()
+    
+    response = client.get('/api/analytics/adherence?year=2024')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['measurement_start'] == '2024-01-01'
+    assert data['members_measured'] == 2
+    assert data['adherent'] == 1
+    assert data['adherent_members'][0]['member_id'] == sample_member.id
+    assert data['adherent_members'][0]['covered_days'] == 360
+    assert data['non_adherent_members'][0]['member_id'] == other_member.id
+    assert data['non_adherent_members'][0]['covered_days'] == 75
+    assert data['non_adherent_members'][0]['fills'] == 3
+    assert data['therapeutic_classes'][0]['therapeutic_class'] == 'Lipid-Lowering'
+    
+    response = client.get('/api/analytics/adherence?year=2024&therapeutic_class=Antidiabetic')
+    assert json.loads(response.data)['members_measured'] == 0
+    
+    assert client.get('/api/analytics/adherence?days=0').status_code == 400
+
+
+def test_payment_run_and_bulk_status(client, session, sample_member, sample_drug, sample_pharmacy):
+    """Payment runs pay approved claims in bulk and keep the rollups in step"""
+    claim_ids = []
+    for number, status in (('CLM-PAY-1', 'approved'), ('CLM-PAY-2', 'approved'), ('CLM-PAY-3', 'pending')):
+        response = client.post('/api/claims', data=json.dumps({
+            'claim_number': number,
+            'member_id': sample_member.id,
+            'drug_id': sample_drug.id,
+            'pharmacy_id': sample_pharmacy.id,
+            'fill_date': '2024-03-01',
+            'quantity': 30,
+            'days_supply': 30,
+            'total_cost': 50.00,
+            'plan_paid_amount': 40.00,
+            'member_copay': 10.00,
+            'status': status
+        }), content_type='application/json')
+        claim_ids.append(json.loads(response.data)['id'])
+    
+    response = client.post('/api/claims/payment-runs', data=json.dumps({}), content_type='application/json')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['claim_count'] == 2
+    assert data['pharmacies'][0]['pharmacy_id'] == sample_pharmacy.id
+    assert data['pharmacies'][0]['plan_paid_amount'] == 80.0
+    
+    paid = json.loads(client.get(f'/api/claims/{claim_ids[0]}').data)
+    assert paid['status'] == 'paid'
+    assert paid['paid_at'] is not None
+    
+    counts = dict(session.query(ClaimDailyStat.status, ClaimDailyStat.claim_count).all())
+    assert counts == {'approved': 0, 'paid': 2, 'pending': 1}
+    
+    response = client.post('/api/claims/payment-runs', data=json.dumps({}), content_type='application/json')
+    assert json.loads(response.data)['claim_count'] == 0
+    
+    response = client.post('/api/claims/bulk-status', data=json.dumps({'status': 'reversed', 'claim_ids': claim_ids}),
+                           content_type='application/json')
+    assert json.loads(response.data)['claim_count'] == 3
+    accumulators = json.loads(client.get(f'/api/members/{sample_member.id}/accumulators?plan_year=2024').data)
+    assert accumulators['claim_count'] == 0
+    assert AccumulatorService.reconcile(2024, apply=False)['drifted'] == 0
+    
+    response = client.post('/api/claims/bulk-status', data=json.dumps({'status': 'pending', 'claim_ids': claim_ids}),
+                           content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_analytics_plans_use_covering_index(client, session, sample_claim):
+    """Claim-scanning analytics endpoints read fill_date ranges from idx_claim_date_covering"""
+    def plan_indexes(statement, parameters):
+        plan = session.connection().exec_driver_sql('EXPLAIN ' + statement, parameters).scalars().all()
+        used = {name for line in plan for name in re.findall(r'(?:using|Bitmap Index Scan on) (\w+)', line)}
+        # Partitions scan their own copy of each index; report the parent index name
+        return set(session.execute(text("""
+            SELECT COALESCE(parent.relname, c.relname)
+            FROM pg_class c
+            LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+            LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+            WHERE c.relname = ANY(:names)
+        """), {'names': list(used)}).scalars())
+    
+    for url in ('/api/analytics/high-utilizers?min_claims=1',
+                '/api/analytics/pharmacy-performance',
+                '/api/analytics/therapeutic-class'):
+        executed = []
+        
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            executed.append((statement, parameters))
+        
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            assert client.get(url).status_code == 200
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        
+        statement, parameters = next((s, p) for s, p in executed if 'claims' in s)
+        # A handful of test rows would otherwise be read with a sequential scan,
+        # and bitmap scans would let the BRIN index compete for a one-page table
+        session.execute(text('SET LOCAL enable_seqscan = off'))
+        session.execute(text('SET LOCAL enable_bitmapscan = off'))
+        assert 'idx_claim_date_covering' in plan_indexes(statement, parameters), url
+        session.rollback()
+
+
+def test_claim_partitions_move_rows_out_of_default(client, session, sample_member, sample_drug, sample_pharmacy):
+    """A month created after the fact adopts its rows from claims_default and can be detached"""
+    response = client.post('/api/claims', data=json.dumps({
+        'claim_number': 'CLM-PART-1',
+        'member_id': sample_member.id,
+        'drug_id': sample_drug.id,
+        'pharmacy_id': sample_pharmacy.id,
+        'fill_date': '2019-02-15',
+        'quantity': 30,
+        'days_supply': 30,
+        'total_cost': 50.00,
+        'status': 'approved'
+    }), content_type='application/json')
+    claim_id = json.loads(response.data)['id']
+    
+    def partition_of(claim_id):
+        return session.execute(
+            text('SELECT CAST(CAST(tableoid AS regclass) AS text) FROM claims WHERE id = :id'), {'id': claim_id}
+        ).scalar()
+    
+    assert partition_of(claim_id) == 'claims_default'
+    
+    created = ensure_partitions(session.connection(), 'claims', date(2019, 2, 1), date(2019, 2, 28))
+    session.commit()
+    assert created == ['claims_y2019m02']
+    assert partition_of(claim_id) == 'claims_y2019m02'
+    assert json.loads(client.get(f'/api/claims/{claim_id}').data)['claim_number'] == 'CLM-PART-1'
+    assert ensure_partitions(session.connection(), 'claims', date(2019, 2, 1), date(2019, 2, 1)) == []
+    
+    assert session.get(MemberAccumulator, (sample_member.id, 2019)).claim_count == 1
+    
+    # Detaching takes the month's claims out of the rollups in the same transaction
+    assert ClaimPartitionService.detach(date(2019, 3, 15), drop=True) == ['claims_y2019m02']
+    assert client.get(f'/api/claims/{claim_id}').status_code == 404
+    assert session.query(ClaimDailyStat).filter(ClaimDailyStat.fill_date == date(2019, 2, 15)).count() == 0
+    assert session.get(MemberAccumulator, (sample_member.id, 2019)).claim_count == 0
+    assert AccumulatorService.reconcile(2019, apply=False)['drifted'] == 0
+
+
+def test_analytics_snapshots(client, session, sample_claim):
+    """Risk scores and duplicates are served from paginated snapshot tables"""
+    duplicate = Claim(
+        claim_number='CLM00000002',
+        member_id=sample_claim.member_id,
+        drug_id=sample_claim.drug_id,
+        pharmacy_id=sample_claim.pharmacy_id,
+        fill_date=sample_claim.fill_date,
+        quantity=Decimal('30'),
+        days_supply=30,
+        submitted_amount=Decimal('55.00'),
+        total_cost=Decimal('55.00'),
+        status='paid'
+    )
+    session.add(duplicate)
+    session.commit()
+    
+    response = client.get('/api/analytics/duplicates?lookback_days=30')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['total'] == 1
+    assert data['computed_at'] is not None
+    assert data['duplicates'][0]['claim_numbers'] == ['CLM00000001', 'CLM00000002']
+    
+    response = client.get('/api/analytics/risk-scores?per_page=10')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['members'][0]['member_id'] == sample_claim.member_id
+    assert data['members'][0]['rank'] == 1
+    
+    response = client.get('/api/analytics/risk-scores?lookback_days=0')
+    assert response.status_code == 400
+
+
+def test_analytics_running_totals(client, sample_claim):
+    """Test GET /api/analytics/running-totals"""
+    response = client.get('/api/analytics/running-totals?days=60&granularity=month&per_page=1')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert len(data['running_totals']) == 1
+    assert data['total'] >= 2
+
+
+def test_memory_engine_matches_sql(client, sample_member, sample_drug, sample_pharmacy):
+    """?engine=memory answers the analytics aggregations identically to SQL"""
+    for i, (cost, status) in enumerate(((12.10, 'paid'), (30.00, 'denied'), (7.35, 'approved'))):
+        response = client.post('/api/claims', data=json.dumps({
+            'claim_number': f'CLMENG000{i}',
+            'member_id': sample_member.id,
+            'drug_id': sample_drug.id,
+            'pharmacy_id': sample_pharmacy.id,
+            'fill_date': date.today().isoformat(),
+            'quantity': 30,
+            'days_supply': 30,
+            'total_cost': cost,
+            'status': status
+        }), content_type='application/json')
+        assert response.status_code == 201
+    
+    for path in ('/api/analytics/dashboard?days=30',
+                 '/api/analytics/trends?days=60&window=7',
+                 '/api/analytics/trends?days=120&granularity=week&window=4',
+                 '/api/analytics/trends?days=365&granularity=month',
+                 '/api/analytics/high-utilizers?min_claims=1',
+                 '/api/analytics/pharmacy-performance',
+                 '/api/analytics/therapeutic-class'):
+        sql = client.get(f'{path}&engine=sql' if '?' in path else f'{path}?engine=sql')
+        memory = client.get(f'{path}&engine=memory' if '?' in path else f'{path}?engine=memory')
+        assert sql.status_code == memory.status_code == 200
+        assert json.loads(sql.data) == json.loads(memory.data), path
+    
+    response = client.get('/api/analytics/dashboard?engine=duckdb')
+    assert response.status_code == 400
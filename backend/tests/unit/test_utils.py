@@ -0,0 +1,277 @@
+"""
+Unit tests for shared helpers
+"""
+
+import pytest
+import threading
+import time
+from datetime import date, datetime
+from app.models import Claim
+from app.utils.pagination import encode_cursor, decode_cursor
+from app.utils.cache import LRUBackend, ResponseCache
+from app.utils.partitions import add_months, partition_name
+from app.services.drug_autocomplete import PrefixSnapshot
+from app.services.formulary_index import FormularySnapshot
+from app.services.adjudication_service import AdjudicationService, BATCH_COLUMNS
+from app.services.coverage_service import CoverageContext
+from app.services.claim_ingest_service import ClaimIngestService
+from app.services.refill_service import SupplyTimeline, sort_order
+from app.services.adherence_service import proportion_of_days_covered
+from decimal import Decimal
+import numpy as np
+from collections import namedtuple
+from flask import Flask
+from types import SimpleNamespace
+
+
+def test_cursor_round_trip():
+    """Test a cursor decodes back to typed sort-key values"""
+    token = encode_cursor([date(2024, 3, 1), 42])
+    assert decode_cursor(token, [Claim.fill_date, Claim.id]) == [date(2024, 3, 1), 42]
+
+
+def test_cursor_rejects_tampered_token():
+    """Test a cursor with the wrong shape is rejected"""
+    token = encode_cursor(['2024-03-01'])
+    with pytest.raises(ValueError):
+        decode_cursor(token, [Claim.fill_date, Claim.id])
+    with pytest.raises(ValueError):
+        decode_cursor('%%%', [Claim.fill_date, Claim.id])
+
+
+def test_lru_backend_evicts_and_expires():
+    """Test the in-process backend honours max_entries and TTL"""
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=60)
+    backend.get('a')
+    backend.set('c', 3, ttl=60)
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+    backend.set('d', 4, ttl=-1)
+    assert backend.get('d') is None
+
+
+def test_response_cache_single_flight():
+    """Test concurrent misses for one key run the computation once"""
+    response_cache = ResponseCache()
+    response_cache.backend = LRUBackend()
+    calls = []
+    started = threading.Event()
+    
+    def compute():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'value'
+    
+    results = []
+    leader = threading.Thread(target=lambda: results.append(response_cache.get_or_compute('k', compute, 60)))
+    leader.start()
+    started.wait()
+    followers = [
+        threading.Thread(target=lambda: results.append(response_cache.get_or_compute('k', compute, 60)))
+        for _ in range(5)
+    ]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+    
+    assert len(calls) == 1
+    assert [value for value, _ in results] == ['value'] * 6
+
+
+def test_response_cache_invalidates_by_namespace():
+    """Test a view cached on several namespaces misses once any of them is bumped"""
+    app = Flask(__name__)
+    response_cache = ResponseCache(app)
+    
+    @app.route('/classes')
+    @response_cache.cached('claims', 'drugs')
+    def classes():
+        return 'classes'
+    
+    client = app.test_client()
+    assert client.get('/classes').headers['X-Cache'] == 'MISS'
+    assert client.get('/classes').headers['X-Cache'] == 'HIT'
+    response_cache.invalidate('pharmacies')
+    assert client.get('/classes').headers['X-Cache'] == 'HIT'
+    response_cache.invalidate('drugs')
+    assert client.get('/classes').headers['X-Cache'] == 'MISS'
+
+
+def test_prefix_snapshot_suggestions():
+    """Test autocomplete matches any word prefix of a name and NDC digits"""
+    snapshot = PrefixSnapshot([
+        {'id': 1, 'ndc': '00071-0155-23', 'name': 'Lipitor', 'generic_name': 'Atorvastatin Calcium',
+         'brand_name': 'Lipitor', 'is_generic': False},
+        {'id': 2, 'ndc': '60505-2579-9', 'name': 'Atorvastatin', 'generic_name': 'Atorvastatin Calcium',
+         'brand_name': None, 'is_generic': True},
+    ])
+    
+    assert [d['id'] for d in snapshot.suggest('ATORVA')] == [2, 1]
+    assert [d['id'] for d in snapshot.suggest('calc')] == [1, 2]
+    assert [d['id'] for d in snapshot.suggest('lip')] == [1]
+    assert [d['id'] for d in snapshot.suggest('00071-01')] == [1]
+    assert [d['id'] for d in snapshot.suggest('atorva', limit=1)] == [2]
+    assert snapshot.suggest('zzz') == []
+
+
+def test_formulary_snapshot_intervals():
+    """Test point-in-time lookups where a later entry supersedes an open-ended one"""
+    def entry(entry_id, tier, effective, termination=None):
+        return {'id': entry_id, 'drug_id': 7, 'tier': tier,
+                'effective_date': effective, 'termination_date': termination}
+    
+    snapshot = FormularySnapshot([
+        entry(1, 3, '2024-01-01'),
+        entry(2, 2, '2024-07-01', '2024-12-31'),
+        entry(3, 1, '2024-07-01'),
+    ])
+    
+    assert snapshot.lookup(7, date(2023, 12, 31)) is None
+    assert snapshot.lookup(7, date(2024, 6, 30))['id'] == 1
+    assert snapshot.lookup(7, date(2024, 7, 1))['id'] == 3
+    assert snapshot.lookup(7, date(2030, 1, 1))['id'] == 3
+    assert snapshot.lookup(8, date(2024, 7, 1)) is None
+    
+    snapshot = FormularySnapshot([entry(1, 2, '2024-01-01', '2024-03-31'), entry(2, 1, '2024-06-01')])
+    assert snapshot.lookup(7, date(2024, 3, 31))['id'] == 1
+    assert snapshot.lookup(7, date(2024, 4, 1)) is None
+    assert snapshot.lookup(7, date(2024, 6, 1))['id'] == 2
+
+
+def test_adjudication_pricing_caps_member_share():
+    """Test deductible, copay and coinsurance are applied in order and capped at cost"""
+    entry = {'cost_sharing': {'copay_retail': 10.0, 'copay_mail_order': 20.0, 'coinsurance_rate': 0.2}}
+    
+    claim = SimpleNamespace(total_cost=Decimal('100.00'), deductible_applied=Decimal('30.00'))
+    assert AdjudicationService.price(claim, entry, mail_order=False) == {
+        'plan_paid_amount': Decimal('48.00'),
+        'member_copay': Decimal('10'),
+        'member_coinsurance': Decimal('12.00'),
+        'deductible_applied': Decimal('30.00')
+    }
+    
+    claim = SimpleNamespace(total_cost=Decimal('15.00'), deductible_applied=None)
+    priced = AdjudicationService.price(claim, entry, mail_order=True)
+    assert priced['member_copay'] == Decimal('15.00')
+    assert priced['plan_paid_amount'] == 0
+
+
+def test_adjudicate_all_records_approved_fills_from_batch_rows():
+    """Test batch rows carry days_supply so an approval blocks a too-early refill later in the batch"""
+    # claim_batch returns Rows with only BATCH_COLUMNS as attributes
+    BatchRow = namedtuple('BatchRow', BATCH_COLUMNS)
+    
+    def row(claim_id, fill_date):
+        return BatchRow(id=claim_id, member_id=1, drug_id=7, pharmacy_id=3, fill_date=fill_date, quantity=30,
+                        days_supply=30, status='pending', total_cost=Decimal('40.00'), plan_paid_amount=None,
+                        member_copay=None, member_coinsurance=None, deductible_applied=None)
+    
+    context = CoverageContext(
+        {1: SimpleNamespace(is_active=True, effective_date=None, termination_date=None)},
+        {3: SimpleNamespace(is_active=True, in_network=True, pharmacy_type='retail')},
+        {7: SimpleNamespace(id=7, is_active=True)},
+        FormularySnapshot([{
+            'id': 1, 'drug_id': 7, 'effective_date': '2024-01-01', 'termination_date': None,
+            'is_covered': True, 'requires_prior_auth': False, 'requires_step_therapy': False,
+            'quantity_limit': None,
+            'cost_sharing': {'copay_retail': 10.0, 'copay_mail_order': 5.0, 'coinsurance_rate': 0}
+        }])
+    )
+    claims = [row(1, date(2024, 1, 1)), row(2, date(2024, 1, 11)), row(3, date(2024, 1, 24))]
+    
+    with Flask(__name__).app_context():
+        results = AdjudicationService.adjudicate_all(claims, context, SupplyTimeline.empty())
+    
+    assert [result['status'] for result in results] == ['approved', 'denied', 'approved']
+    assert results[1]['rejection_code'] == '79'
+    assert 'refill allowed from 2024-01-24' in results[1]['rejection_reason']
+    assert results[2]['plan_paid_amount'] == Decimal('30.00')
+
+
+def test_parse_record_enforces_column_limits():
+    """Test values too long or too large for their column are rejected per record"""
+    raw = {'claim_number': 'CLM1', 'member_id': '1', 'drug_id': '2', 'pharmacy_id': '3',
+           'fill_date': '2024-01-01', 'quantity': '30', 'days_supply': '30', 'total_cost': '99999999.99'}
+    assert ClaimIngestService._parse_record(raw, datetime.utcnow())['total_cost'] == Decimal('99999999.99')
+    
+    for field, value, message in (('total_cost', '99999999.995', 'total_cost must be less than'),
+                                  ('prescriber_npi', '12345678901', 'prescriber_npi exceeds 10'),
+                                  ('rejection_code', 'X' * 11, 'rejection_code exceeds 10'),
+                                  ('days_supply', str(2 ** 31), 'days_supply is out of range')):
+        with pytest.raises(ValueError, match=message):
+            ClaimIngestService._parse_record(dict(raw, **{field: value}), datetime.utcnow())
+
+
+def test_partition_month_arithmetic():
+    """Test monthly partition names and month stepping across year ends"""
+    assert partition_name('claims', date(2024, 3, 1)) == 'claims_y2024m03'
+    assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+    assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+    assert add_months(date(2024, 12, 1), 0) == date(2024, 12, 1)
+
+
+def test_supply_timeline_carries_early_refills_forward():
+    """Test supply on hand shifts early refills forward and flags refills too soon"""
+    # member 1 / drug 7: 30 days on day 0, refilled early on day 20, then day 70
+    timeline = SupplyTimeline(
+        np.array([1, 2, 3, 4]), np.array([1, 1, 1, 2]), np.array([7, 7, 7, 7]),
+        np.array([0, 20, 70, 5]), np.array([30, 30, 30, 90])
+    )
+    assert timeline.supply_end.tolist() == [30, 60, 100, 95]
+    assert timeline.days_remaining(1, 7, 25) == 35
+    assert timeline.days_remaining(1, 7, 65) == 0
+    assert timeline.days_remaining(1, 8, 25) == 0
+    assert timeline.last_fill(1, 7, -1) is None
+    
+    # 75% of the 30-day fill used: allowed 7 days before the supply runs out
+    assert timeline.refill_check(1, 7, 52, 0.75) == (True, 8, 53)
+    assert timeline.refill_check(1, 7, 53, 0.75) == (False, 7, 53)
+    
+    timeline.record(1, 7, 53, 30)
+    assert timeline.days_remaining(1, 7, 60) == 30
+    
+    overlap_days, too_soon, _ = timeline.overlaps(0.75)
+    assert overlap_days.tolist() == [0, 10, 0, 0]
+    assert too_soon.tolist() == [False, True, False, False]
+
+
+def test_supply_timeline_replays_recorded_fills_in_fill_order():
+    """Test a fill recorded out of order is replayed before later fills on file"""
+    timeline = SupplyTimeline(np.array([1]), np.array([1]), np.array([7]), np.array([60]), np.array([30]))
+    timeline.record(1, 7, 20, 90)
+    
+    # day 20 covers through 109, so the 30-day fill on day 60 runs to 140
+    assert timeline.last_fill(1, 7, 100) == (140, 30)
+    assert timeline.last_fill(1, 7, 40) == (110, 90)
+    assert timeline.refill_check(1, 7, 133, 0.75) == (False, 7, 133)
+
+
+def test_sort_order_matches_lexsort():
+    """Test the packed single-key sort agrees with np.lexsort, ties included"""
+    member_id = np.array([2, 1, 2, 1, 1])
+    fill_day = np.array([5, 9, 5, 3, 9])
+    claim_id = np.array([40, 30, 10, 20, 5])
+    expected = np.lexsort((claim_id, fill_day, member_id)).tolist()
+    assert sort_order((member_id, fill_day), tiebreak=claim_id).tolist() == expected
+    # Ranges too wide to pack fall back to np.lexsort
+    assert sort_order((member_id << 40, fill_day << 30), tiebreak=claim_id).tolist() == expected
+
+
+def test_proportion_of_days_covered_merges_class_intervals():
+    """Test PDC shifts same-drug overlaps forward and counts class overlaps once"""
+    # member 1: drug 7 on days 0 and 20 (shifted to 30), drug 8 of the same class on day 45
+    # member 2: drug 7 on days 0 and 90; member 3: a single fill, not measured
+    member_id, class_code, fills, index_day, covered, period_days = proportion_of_days_covered(
+        np.array([1, 1, 1, 2, 2, 3]), np.array([0, 0, 0, 0, 0, 0]), np.array([7, 7, 8, 7, 7, 7]),
+        np.array([0, 20, 45, 10, 90, 5]), np.array([30, 30, 30, 30, 30, 30]), 0, 99
+    )
+    assert member_id.tolist() == [1, 2]
+    assert class_code.tolist() == [0, 0]
+    assert fills.tolist() == [3, 2]
+    assert index_day.tolist() == [0, 10]
+    assert covered.tolist() == [75, 40]
+    assert period_days.tolist() == [100, 90]
@@ -0,0 +1,102 @@
+"""
+Pending-claim adjudication workers
+Run with: python worker.py [--workers N] [--batch-size 500] [--poll-interval 2] [--once]
+
+Each worker process claims batches of pending claims with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers (on any number of
+hosts) can drain the queue without waiting on each other's rows. Worker 0
+also creates upcoming monthly claims partitions every
+CLAIM_PARTITION_MAINTENANCE_INTERVAL seconds.
+"""
+
+import argparse
+import multiprocessing
+import signal
+import time
+
+
+def run_worker(worker_id, batch_size, poll_interval, once):
+    # Build the app inside the child so no database connection crosses a fork
+    from app import create_app, db
+    from app.services.adjudication_service import AdjudicationService
+    from app.services.claim_partition_service import ClaimPartitionService
+
+    app = create_app()
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    with app.app_context():
+        batch_size = batch_size or app.config.get('ADJUDICATION_BATCH_SIZE', 500)
+        poll_interval = poll_interval if poll_interval is not None else app.config.get('ADJUDICATION_POLL_INTERVAL', 2)
+        totals = {'claimed': 0, 'approved': 0, 'denied': 0}
+        maintenance_interval = app.config.get('CLAIM_PARTITION_MAINTENANCE_INTERVAL', 3600)
+        next_maintenance = time.monotonic() if worker_id == 0 else None
+
+        while not stopping:
+            if next_maintenance is not None and time.monotonic() >= next_maintenance:
+                next_maintenance = time.monotonic() + maintenance_interval
+                try:
+                    for name in ClaimPartitionService.maintain():
+                        print(f"worker {worker_id}: created partition {name}", flush=True)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception(f'worker {worker_id}: claim partition maintenance failed')
+
+            try:
+                result = AdjudicationService.process_batch(batch_size)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception(f'worker {worker_id}: adjudication batch failed')
+                time.sleep(poll_interval)
+                continue
+
+            for key in totals:
+                totals[key] += result[key]
+            if result['claimed']:
+                print(f"worker {worker_id}: {result['claimed']} claims "
+                      f"({result['approved']} approved, {result['denied']} denied)", flush=True)
+            elif once:
+                break
+            else:
+                time.sleep(poll_interval)
+
+        db.session.remove()
+        print(f"worker {worker_id}: stopped after {totals['claimed']} claims", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Adjudicate pending claims')
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(), help='worker processes')
+    parser.add_argument('--batch-size', type=int, help='claims locked per transaction (ADJUDICATION_BATCH_SIZE)')
+    parser.add_argument('--poll-interval', type=float, help='seconds to sleep when the queue is empty')
+    parser.add_argument('--once', action='store_true', help='exit once the queue is drained')
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(0, args.batch_size, args.poll_interval, args.once)
+        return
+
+    ctx = multiprocessing.get_context('spawn')
+    processes = [
+        ctx.Process(target=run_worker, args=(i, args.batch_size, args.poll_interval, args.once),
+                    name=f'adjudication-worker-{i}')
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Children get SIGINT from the terminal themselves; forward SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: [p.terminate() for p in processes])
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()